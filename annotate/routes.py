@@ -1,13 +1,15 @@
-from flask import Blueprint, render_template, request, jsonify
-from app import client
-from .utils import new_mapping_id
-from foundry_sdk_runtime.types import BatchActionConfig, ReturnEditsMode
-from mr_split_sdk.ontology.action_types import CreateResponsibilityMappingBatchRequest, DeleteResponsibilityMappingBatchRequest
-from typing import Iterator
-from mr_split_sdk.ontology.objects import ResponsibilityMapping
+from flask import Blueprint, render_template, stream_template, request, jsonify, url_for, abort
+from .utils import user_ids_by_name
+from common import queries
+from common.loader import load_concurrently, read_all
+from common.request_store import get_store
+from common.write_queue import write_queue
 
 annotate_bp = Blueprint('annotate', __name__, url_prefix='/annotate')
 
+# "delta" only adds/removes what changed; "replace" recreates every mapping of the line
+SAVE_MODES = ("delta", "replace")
+
 @annotate_bp.route("/", methods=["GET"])
 def list_items():
     # Get receipt_id from query parameters, default to None meaning show all
@@ -18,116 +20,203 @@ def list_items():
         receipt_id = ""
     active_line_id = request.args.get("active_line_id", type=int)
 
-    # Get all distinct receipt IDs for dropdown options
-    all_items = list(client.ontology.objects.PurchasedItem.iterate())
-    receipt_ids = sorted({item.receipt_id for item in all_items if item.receipt_id})
-
-    # Filter items if receipt_id specified
-    if receipt_id:
-        filtered_items = [item for item in all_items if item.receipt_id == receipt_id]
-    else:
-        filtered_items = all_items
-
-    items_dicts = [{
-        "line_id": item.line_id,
-        "receipt_id": item.receipt_id,
-        "store_name": item.store_name,
-        "purchase_date": item.purchase_date,
-        "item_name": item.item_name,
-        "price": item.price,
-        "paid_by": item.paid_by
-    } for item in filtered_items]
+    query = queries.parse_item_query(request.args)
+    streaming = request.args.get("stream") == "1"
 
-    # If no active_line_id specified, default to first item's line_id if exists
-    if not active_line_id and items_dicts:
-        active_line_id = items_dicts[0]["line_id"]
+    # Receipt IDs for the dropdown (aggregated server-side), the page of items
+    # to show and the user names are independent reads, so issue them concurrently.
+    def page():
+        try:
+            return queries.page_items(query)
+        except ValueError:
+            abort(400, "Invalid page_token")
+
+    data = load_concurrently(
+        receipt_ids=queries.receipt_ids,
+        page=(lambda: (None, None)) if streaming else page,
+        users=read_all("Users"),
+    )
+    receipt_ids = data.receipt_ids
+    user_names = [user.full_name for user in data.users if user.full_name]
+
+    if streaming:
+        # Rows are rendered as they are fetched; annotate.js picks the first row
+        # as active when none is given.
+        return stream_template(
+            "annotate.html",
+            items=queries.iter_items(query),
+            receipt_ids=receipt_ids,
+            selected_receipt=receipt_id,
+            active_line_id=active_line_id,
+            user_names=user_names,
+            next_page_url=None
+        )
 
+    # Items are compact records already; the template reads them directly
+    items, next_token = data.page
 
-    users_iterator = client.ontology.objects.Users.iterate()
-    users = list(users_iterator)
-    user_names = [user.full_name for user in users if user.full_name]
+    # If no active_line_id specified, default to first item's line_id if exists
+    if not active_line_id and items:
+        active_line_id = items[0].line_id
 
+    next_page_url = None
+    if next_token:
+        args = {k: v for k, v in request.args.items() if k not in ("page_token", "active_line_id")}
+        next_page_url = url_for("annotate.list_items", **args, page_token=next_token)
 
     return render_template(
         "annotate.html",
-        items=items_dicts,
+        items=items,
         receipt_ids=receipt_ids,
         selected_receipt=receipt_id,
         active_line_id=active_line_id,
-        user_names=user_names
+        user_names=user_names,
+        next_page_url=next_page_url
     )
 
+def _to_int(x):
+    try:
+        if isinstance(x, int): return x
+        if isinstance(x, float): return int(x)
+        return int(str(x).strip())
+    except Exception:
+        return None
+
+def _is_name_list(x):
+    return isinstance(x, list) and all(isinstance(name, str) for name in x)
+
 @annotate_bp.route("/save-responsibility", methods=["POST"])
 def save_responsibility():
-    def _to_int(x):
-        try:
-            if isinstance(x, int): return x
-            if isinstance(x, float): return int(x)
-            return int(str(x).strip())
-        except Exception:
-            return None
-
     data = request.get_json()
     line_id = _to_int(data.get("line_id"))
     user_names = data.get("user_names")  # List[str]
 
     if not line_id or not user_names:
         return jsonify({"status": "error", "message": "line_id and user_names are required"}), 400
+    if not _is_name_list(user_names):
+        return jsonify({"status": "error", "message": "user_names must be a list of strings"}), 400
 
-    # Map names -> IDs
-    users = list(client.ontology.objects.Users.iterate())
-    name_to_id = {u.full_name: u.user_id for u in users if u.full_name is not None}
+    mode = data.get("mode", "delta")
+    if mode not in SAVE_MODES:
+        return jsonify({"status": "error", "message": "mode must be 'delta' or 'replace'"}), 400
+
+    # Map names -> IDs (index cached with the Users snapshot)
+    name_to_id = user_ids_by_name()
 
     user_ids = [_to_int(name_to_id.get(name)) for name in user_names if name in name_to_id]
     user_ids = [uid for uid in user_ids if uid is not None]
     if not user_ids:
         return jsonify({"status": "error", "message": "No valid user IDs found for given names"}), 400
 
-    # Load the purchased item to find the payer
-    # (You can also use .where(...) if you prefer)
-    item = next(
-        (it for it in client.ontology.objects.PurchasedItem.iterate() if _to_int(it.line_id) == line_id),
-        None
-    )
-    paid_by = _to_int(getattr(item, "paid_by", None)) if item else None
-
-    # Delete existing mappings for this line
-    existing = list(
-        client.ontology.objects.ResponsibilityMapping.where(
-            ResponsibilityMapping.object_type.line_id == line_id
-        ).iterate()
-    )
-    delete_requests = []
-    for rm in existing:
-        if getattr(rm, "mapping_id", None) is not None:
-            delete_requests.append(
-                DeleteResponsibilityMappingBatchRequest(
-                    responsibility_mapping=rm.mapping_id
-                )
-            )
-    if delete_requests:
-        client.ontology.batch_actions.delete_responsibility_mapping(
-            batch_action_config=BatchActionConfig(return_edits=ReturnEditsMode.ALL),
-            requests=delete_requests
-        )
-
-    # Create new mappings; mark as "paid" if user == payer
-    batch_requests = []
-    base_id = new_mapping_id()
-    for idx, uid in enumerate(user_ids):
-        status_val = "paid" if (paid_by is not None and uid == paid_by) else "unpaid"
-        batch_requests.append(
-            CreateResponsibilityMappingBatchRequest(
-                mapping_id=base_id + idx,
-                line_id=line_id,
-                user_id=uid,
-                status=status_val
-            )
-        )
-
-    client.ontology.batch_actions.create_responsibility_mapping(
-        batch_action_config=BatchActionConfig(return_edits=ReturnEditsMode.ALL),
-        requests=batch_requests
-    )
-
-    return jsonify({"status": "success"})
+    # Accepted now, written by the write queue; a newer edit of the line replaces this one while it waits
+    if write_queue.submit("assignment", {"line_id": line_id, "user_ids": user_ids, "mode": mode}, key=line_id):
+        return jsonify({"status": "queued", "line_id": line_id}), 202
+    return jsonify({"status": "success", "line_id": line_id})
+
+@annotate_bp.route("/save-responsibility/bulk", methods=["POST"])
+def save_responsibility_bulk():
+    """
+    Assign users to many lines in one request:
+
+        {"assignments": [{"line_id": 1, "user_names": [...]}, ...],
+         "apply": {"user_names": [...], "receipt_id": "TXN001", "only_unassigned": false},
+         "mode": "delta"}
+
+    "apply" targets every line of a receipt, or every unassigned line (of the
+    receipt, or of all receipts when none is given); explicit assignments take
+    precedence over it. Everything is validated before anything is queued.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Expected a JSON object"}), 400
+    mode = data.get("mode", "delta")
+    store = get_store()
+    errors = []
+    if mode not in SAVE_MODES:
+        errors.append("mode must be 'delta' or 'replace'")
+
+    wanted = {}  # line_id -> user names; the last assignment for a line wins
+    for n, assignment in enumerate(data.get("assignments") or []):
+        if not isinstance(assignment, dict):
+            errors.append(f"assignments[{n}]: must be an object")
+            continue
+        line_id = _to_int(assignment.get("line_id"))
+        user_names = assignment.get("user_names")
+        if not line_id or not user_names:
+            errors.append(f"assignments[{n}]: line_id and user_names are required")
+            continue
+        if not _is_name_list(user_names):
+            errors.append(f"assignments[{n}]: user_names must be a list of strings")
+            continue
+        wanted[line_id] = user_names
+
+    apply = data.get("apply")
+    if apply and not isinstance(apply, dict):
+        errors.append("apply: must be an object")
+        apply = None
+    if apply:
+        receipt_id = apply.get("receipt_id")
+        only_unassigned = bool(apply.get("only_unassigned"))
+        if not apply.get("user_names") or not (receipt_id or only_unassigned):
+            errors.append("apply: user_names and either receipt_id or only_unassigned are required")
+        elif not _is_name_list(apply["user_names"]):
+            errors.append("apply: user_names must be a list of strings")
+        else:
+            if receipt_id:
+                items = store.query(("items_for_receipt", receipt_id), lambda: queries.items_for_receipt(receipt_id))
+            else:
+                items = store.all("PurchasedItem")
+            targets = [it.line_id for it in items if it.line_id]
+            if only_unassigned:
+                if receipt_id:
+                    existing = queries.mappings_for_lines(targets)
+                else:
+                    existing = store.all("ResponsibilityMapping")
+                assigned = {rm.line_id for rm in existing}
+                # lines whose assignment is still waiting in the write queue count as assigned too
+                queued = write_queue.status("assignment", targets)["entries"]
+                assigned.update(int(lid) for lid, entry in queued.items() if entry["state"] != "failed")
+                targets = [lid for lid in targets if lid not in assigned]
+            for lid in targets:
+                wanted.setdefault(lid, apply["user_names"])
+
+    if not wanted and not apply and not errors:
+        errors.append("assignments or apply is required")
+
+    # Validate names and lines together before queueing anything
+    name_to_id = user_ids_by_name()
+    unknown_names = sorted({name for names in wanted.values() for name in names if name not in name_to_id})
+    if unknown_names:
+        errors.append("Unknown users: " + ", ".join(unknown_names))
+
+    items = store.get_many("PurchasedItem", "line_id", wanted)
+    unknown_lines = sorted(lid for lid in wanted if lid not in items)
+    if unknown_lines:
+        errors.append("Unknown line_ids: " + ", ".join(str(lid) for lid in unknown_lines))
+
+    if errors:
+        return jsonify({"status": "error", "message": errors[0], "errors": errors}), 400
+
+    entries = []
+    for line_id, user_names in wanted.items():
+        user_ids = [_to_int(name_to_id[name]) for name in user_names]
+        user_ids = [uid for uid in user_ids if uid is not None]
+        entries.append((line_id, {"line_id": line_id, "user_ids": user_ids, "mode": mode}))
+    queued = write_queue.submit_many("assignment", entries)
+
+    return jsonify({"status": "queued" if queued else "success", "lines": len(wanted)}), 202 if queued else 200
+
+@annotate_bp.route("/save-status", methods=["GET"])
+def save_status():
+    """
+    Where queued edits stand: ?line_ids=1,2,3 lists those lines that are still
+    "pending"/"inflight" or have "failed"; lines not listed have been saved.
+    """
+    line_ids = [lid for lid in (_to_int(x) for x in request.args.get("line_ids", "").split(",")) if lid]
+    status = write_queue.status("assignment", line_ids)
+    return jsonify({
+        "pending": status["pending"],
+        "failed": status["failed"],
+        "oldest_age_seconds": status["oldest_age_seconds"],
+        "lines": status["entries"],
+    })
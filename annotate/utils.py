@@ -1,16 +1,143 @@
-from mr_split_sdk.ontology.objects import ResponsibilityMapping
+from common import object_types as ontology_objects
 from app import client
+from common import action_types, queries
+from common.ids import id_allocator
+from common.request_store import get_store
+from common.write_queue import write_queue
 
-def new_mapping_id() -> int:
-    # Query for the user with the highest user_id
+def _next_mapping_id_from_ontology() -> int:
+    # Query for the mapping with the highest mapping_id
     highest_mapping = next(
         client.ontology.objects.ResponsibilityMapping
-        .order_by(ResponsibilityMapping.object_type.mapping_id.desc())
+        .order_by(ontology_objects.ResponsibilityMapping.object_type.mapping_id.desc())
         .iterate(),
         None  # default if none found
     )
 
     if highest_mapping is None or highest_mapping.mapping_id is None:
-        return 1  # no users, start at 1
+        return 1  # no mappings, start at 1
+
+    return highest_mapping.mapping_id + 1
+
+def new_mapping_ids(count: int) -> list:
+    return id_allocator.allocate("ResponsibilityMapping", count, seed=_next_mapping_id_from_ontology)
+
+def new_mapping_id() -> int:
+    return new_mapping_ids(1)[0]
+
+def user_ids_by_name() -> dict:
+    # Rebuilt only when the cached Users snapshot changes
+    return client.ontology.objects.Users.derive(
+        "user_ids_by_name",
+        lambda users: {u.full_name: u.user_id for u in users if u.full_name is not None}
+    )
+
+def cached_payer(line_id: int):
+    """
+    (found, paid_by) for a line from the cached PurchasedItem snapshot, without
+    a round trip; found is False when items aren't cached or the line is unknown.
+    """
+    payers = client.ontology.objects.PurchasedItem.derive(
+        "paid_by_by_line",
+        lambda items: {it.line_id: it.paid_by for it in items if it.line_id},
+        cached_only=True
+    )
+    if payers is None or line_id not in payers:
+        return False, None
+    return True, payers[line_id]
+
+def diff_mappings(user_ids, paid_by, existing):
+    """
+    Compare the requested users of a line with its existing mappings.
+    Returns (creates, deletes): (user_id, status) pairs to add and mapping_ids
+    to remove. Mappings that stay keep their current status.
+    """
+    wanted = list(dict.fromkeys(user_ids))  # dedupe, keep order
+    kept = set()
+    deletes = []
+    for rm in existing:
+        if rm.mapping_id is None:
+            continue
+        if rm.user_id in wanted and rm.user_id not in kept:
+            kept.add(rm.user_id)
+        else:
+            deletes.append(rm.mapping_id)  # user no longer responsible, or a duplicate
+    creates = [
+        (uid, "paid" if (paid_by is not None and uid == paid_by) else "unpaid")
+        for uid in wanted if uid not in kept
+    ]
+    return creates, deletes
+
+def submit_mapping_changes(creates, deletes):
+    """
+    Apply (line_id, user_id, status) creates and mapping_id deletes as at most
+    one create batch and one delete batch. Creates go first, so a failure never
+    leaves a line with nobody responsible.
+    """
+
+    if creates:
+        client.ontology.batch_actions.create_responsibility_mapping(
+            batch_action_config=action_types.BatchActionConfig(return_edits=action_types.ReturnEditsMode.NONE),
+            requests=[
+                action_types.CreateResponsibilityMappingBatchRequest(
+                    mapping_id=mapping_id,
+                    line_id=line_id,
+                    user_id=uid,
+                    status=status_val
+                )
+                for mapping_id, (line_id, uid, status_val) in zip(new_mapping_ids(len(creates)), creates)
+            ]
+        )
+
+    if deletes:
+        client.ontology.batch_actions.delete_responsibility_mapping(
+            batch_action_config=action_types.BatchActionConfig(return_edits=action_types.ReturnEditsMode.NONE),
+            requests=[
+                action_types.DeleteResponsibilityMappingBatchRequest(responsibility_mapping=mapping_id)
+                for mapping_id in deletes
+            ]
+        )
+
+def apply_assignments(assignments):
+    """
+    Write queued line assignments, {"line_id", "user_ids", "mode"} each, as one
+    create batch and one delete batch. Mappings are diffed against what the
+    ontology holds now, so an assignment that was already written is a no-op.
+    """
+    store = get_store()
+    line_ids = [a["line_id"] for a in assignments]
+
+    payers = {}
+    for line_id in line_ids:
+        found, paid_by = cached_payer(line_id)
+        if found:
+            payers[line_id] = paid_by
+    missing = [line_id for line_id in line_ids if line_id not in payers]
+    if missing:
+        items = store.get_many("PurchasedItem", "line_id", missing)
+        payers.update({line_id: getattr(items.get(line_id), "paid_by", None) for line_id in missing})
+
+    by_line = {}
+    for rm in queries.mappings_for_lines(line_ids):
+        by_line.setdefault(rm.line_id, []).append(rm)
+
+    creates, deletes = [], []
+    for a in assignments:
+        line_id = a["line_id"]
+        line_mappings = by_line.get(line_id, [])
+        if a.get("mode") == "replace":
+            line_creates, _ = diff_mappings(a["user_ids"], payers[line_id], [])
+            deletes.extend(rm.mapping_id for rm in line_mappings if rm.mapping_id is not None)
+        else:
+            line_creates, line_deletes = diff_mappings(a["user_ids"], payers[line_id], line_mappings)
+            deletes.extend(line_deletes)
+        creates.extend((line_id, uid, status_val) for uid, status_val in line_creates)
+
+    submit_mapping_changes(creates, deletes)
+    return creates, deletes
+
+def _merge_assignments(old, new):
+    # the newest users win; a waiting "replace" still recreates the line's mappings
+    return {**new, "mode": "replace" if "replace" in (old.get("mode"), new.get("mode")) else new.get("mode")}
 
-    return highest_mapping.mapping_id + 1
\ No newline at end of file
+write_queue.register("assignment", apply_assignments, merge=_merge_assignments)
@@ -1,16 +1,66 @@
 import os
 from flask import Flask, render_template
-from mr_split_sdk import FoundryClient, UserTokenAuth
+from common.cache import CachedClient, ObjectCache
+from common.transport import Transport, TransportSettings, client_kwargs
 
 
-# Initialize Foundry client once
-auth = UserTokenAuth(token=os.environ["FOUNDRY_TOKEN"])
-client = FoundryClient(auth=auth, hostname="https://roshan-built-this.usw-18.palantirfoundry.com")
+# "foundry" (default) or "local" (SQLite stand-in seeded from raw_data/, no token or network needed)
+BACKEND = os.environ.get("MR_SPLIT_BACKEND", "foundry")
+
+# Retries, read coalescing and HTTP pool sizing (MR_SPLIT_HTTP_*, MR_SPLIT_COALESCE_READS)
+transport_settings = TransportSettings.from_env()
+
+
+def build_backend_client():
+    """The ontology client for BACKEND; called on first use, not at import."""
+    if BACKEND == "local":
+        from local_backend.client import LocalClient
+        return LocalClient(
+            path=os.environ.get("MR_SPLIT_LOCAL_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "local_ontology.sqlite3")),
+            seed_dir=os.environ.get("MR_SPLIT_SEED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "raw_data")),
+        )
+    from mr_split_sdk import FoundryClient, UserTokenAuth
+    auth = UserTokenAuth(token=os.environ["FOUNDRY_TOKEN"])
+    return FoundryClient(auth=auth, hostname="https://roshan-built-this.usw-18.palantirfoundry.com",
+                         **client_kwargs(FoundryClient, transport_settings))
+
+
+# Full object-set reads are cached process-wide; actions invalidate what they write.
+object_cache = ObjectCache(
+    ttl=float(os.environ.get("MR_SPLIT_CACHE_TTL", "30")),
+    max_objects=int(os.environ.get("MR_SPLIT_CACHE_MAX_OBJECTS", "100000")),
+)
+# Created lazily: the SDK is imported and the backend connected on the first ontology call
+client = CachedClient(build_backend_client, object_cache, Transport(transport_settings))
 
 
 def create_app():
     app = Flask(__name__)
     app.secret_key = "asdf"  # Use a strong secret in production
+    # "ledger" (incremental), "python" (compute_balances) or "pandas" (columnar)
+    app.config["BALANCE_ENGINE"] = os.environ.get("MR_SPLIT_BALANCE_ENGINE", "ledger")
+    # Serve the balances page from background-refreshed snapshots
+    app.config["BALANCE_SNAPSHOTS"] = os.environ.get("MR_SPLIT_BALANCE_SNAPSHOTS", "1") == "1"
+
+    # Per-route timings at /metrics; ?profile=1 dumps are opt-in
+    app.config["METRICS_ENABLED"] = os.environ.get("MR_SPLIT_METRICS", "1") == "1"
+    app.config["PROFILING_ENABLED"] = os.environ.get("MR_SPLIT_PROFILING", "0") == "1"
+
+    # Comma-separated ledger groups this worker serves (empty: all)
+    app.config["SERVED_GROUPS"] = os.environ.get("MR_SPLIT_SERVED_GROUPS", "")
+
+    # Build the ontology client while the app starts instead of on first use
+    app.config["ONTOLOGY_CONNECT_ON_START"] = os.environ.get("MR_SPLIT_CONNECT_ON_START", "0") == "1"
+
+    # Accept annotation and settlement edits into a durable local queue and write them in the background
+    app.config["WRITE_QUEUE"] = os.environ.get("MR_SPLIT_WRITE_QUEUE", "1") == "1"
+
+    from common import request_store, metrics, groups, write_queue
+    client.init_app(app)
+    groups.init_app(app)
+    request_store.init_app(app)
+    metrics.init_app(app)
+    write_queue.init_app(app)
 
     # Register blueprints
     from users.routes import users_bp
@@ -28,6 +78,12 @@ def create_app():
     from line_items.routes import line_items_bp
     app.register_blueprint(line_items_bp)
 
+    from imports.routes import imports_bp
+    app.register_blueprint(imports_bp)
+
+    from exports.routes import exports_bp
+    app.register_blueprint(exports_bp)
+
     return app
 
 
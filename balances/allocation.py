@@ -0,0 +1,77 @@
+from collections import defaultdict
+from balances.utils import LedgerIndex
+
+
+# Settlement allocation: which line shares a pair's settlements have covered.
+#
+# Settlements from a debtor to a creditor are handed to the debtor's shares of
+# the creditor's lines oldest first, so at most one share per direction is
+# partially covered. The other direction is only covered by settlements made
+# the other way: a settlement never marks what it was paid to as paid. What is
+# left in the two directions nets to the pairwise amount compute_balances
+# reports (each direction minus its settlements, clamped, then netted).
+
+class Share:
+    __slots__ = ("mapping_id", "line_id", "debtor", "creditor", "cents", "order", "status")
+
+    def __init__(self, mapping, item, cents):
+        self.mapping_id = mapping.mapping_id
+        self.line_id = mapping.line_id
+        self.debtor = mapping.user_id
+        self.creditor = item.paid_by
+        self.cents = cents
+        self.status = mapping.status
+        self.order = (str(item.purchase_date or ""), mapping.line_id, mapping.mapping_id or 0)
+
+
+class ShareIndex:
+    """Open (non-zero) line shares keyed by (debtor, creditor), oldest first."""
+
+    def __init__(self, responsibility_mappings, purchased_items, index=None):
+        index = index or LedgerIndex(responsibility_mappings, purchased_items)
+        self.by_pair = defaultdict(list)
+        for m in responsibility_mappings:
+            if not m.line_id or not m.user_id or m.mapping_id is None:
+                continue
+            item = index.line_to_item.get(m.line_id)
+            if not item or item.paid_by is None or item.price is None:
+                continue
+            cents = index.owed_cents(m.line_id, m.user_id)
+            if cents > 0:
+                self.by_pair[(m.user_id, item.paid_by)].append(Share(m, item, cents))
+        for shares in self.by_pair.values():
+            shares.sort(key=lambda s: s.order)
+
+    def shares(self, debtor, creditor) -> list:
+        return self.by_pair.get((debtor, creditor), [])
+
+
+def _settled_by_direction(settlements):
+    paid = defaultdict(int)
+    for s in settlements:
+        paid[(s.from_user_id, s.to_user_id)] += s.amount_cents
+    return paid
+
+
+def _allocate_direction(shares, covered, remaining):
+    for s in shares:
+        applied = min(covered, s.cents)
+        covered -= applied
+        remaining[s.mapping_id] = s.cents - applied
+
+
+def allocate_pair(share_index, debtor, creditor, settlements) -> dict:
+    """Remaining cents per mapping_id for what `debtor` owes `creditor`."""
+    remaining = {}
+    covered = _settled_by_direction(settlements).get((debtor, creditor), 0)
+    _allocate_direction(share_index.shares(debtor, creditor), covered, remaining)
+    return remaining
+
+
+def allocate(share_index, settlements) -> dict:
+    """Remaining cents per mapping_id for every open share."""
+    paid = _settled_by_direction(settlements)
+    remaining = {}
+    for direction, shares in share_index.by_pair.items():
+        _allocate_direction(shares, paid.get(direction, 0), remaining)
+    return remaining
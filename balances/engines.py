@@ -0,0 +1,31 @@
+from flask import current_app
+from balances.utils import compute_balances
+from balances.ledger import shared_ledger
+from common.groups import current_group
+
+
+def _ledger(responsibility_mappings, purchased_items, settlements, index=None):
+    return shared_ledger(current_group()).sync(responsibility_mappings, purchased_items, settlements, index=index)
+
+
+def _vectorized(responsibility_mappings, purchased_items, settlements, index=None):
+    # pandas is only imported when the columnar engine is actually selected
+    from balances.vectorized import compute_balances_vectorized
+    return compute_balances_vectorized(responsibility_mappings, purchased_items, settlements)
+
+
+# All engines return identical (pairwise, per_user) cents; pick with BALANCE_ENGINE.
+BALANCE_ENGINES = {
+    "ledger": _ledger,
+    "python": compute_balances,
+    "pandas": _vectorized,
+}
+
+
+def compute_configured_balances(responsibility_mappings, purchased_items, settlements, index=None):
+    """`index` is a LedgerIndex the caller already built; engines that can reuse it do."""
+    name = current_app.config.get("BALANCE_ENGINE", "ledger")
+    engine = BALANCE_ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown BALANCE_ENGINE {name!r}; expected one of {', '.join(BALANCE_ENGINES)}")
+    return engine(responsibility_mappings, purchased_items, settlements, index=index)
@@ -0,0 +1,189 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+
+from app import client
+from balances.utils import LedgerIndex, net_balances
+from common.groups import current_group
+from common.loader import load_concurrently, read_all
+
+
+# Balances at a point in time, or over a date range, without replaying all of
+# history. Line shares are dated by the item's purchase_date and settlements by
+# created_at; raw debts and settled amounts are both plain sums, so the state at
+# any day is a monthly checkpoint of the two matrices plus at most a month of
+# events, and a range is the difference of two such states. The clamping and
+# netting of compute_balances is applied to the result, so a query gives the
+# same cents as compute_balances over just the objects in the window.
+#
+# When the objects change, a new history reuses the previous one's months (and
+# their checkpoints) up to the first month whose events differ; only that month
+# and the ones after it are sorted and replayed again.
+
+_UNDATED = date.min  # objects without a date count from the beginning of time
+
+
+def to_day(value):
+    if value is None:
+        return _UNDATED
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class _Checkpoint:
+    __slots__ = ("month", "position", "debts", "paid")
+
+    def __init__(self, month, position, debts, paid):
+        self.month = month
+        self.position = position  # events before this index are included
+        self.debts = debts
+        self.paid = paid
+
+
+def _month(day):
+    return day.year, day.month
+
+
+class BalanceHistory:
+    def __init__(self, responsibility_mappings, purchased_items, settlements, index=None, previous=None):
+        index = index or LedgerIndex(responsibility_mappings, purchased_items)
+
+        # month -> [(day, is_settlement, (from, to), cents), ...] in the order the objects came in
+        months = defaultdict(list)
+        for line_id, users in index.line_to_users.items():
+            item = index.line_to_item.get(line_id)
+            if not item or item.paid_by is None or item.price is None:
+                continue
+            price_cents = index.price_cents(line_id)
+            if price_cents <= 0:
+                continue
+            day = to_day(item.purchase_date)
+            base = price_cents // len(users)
+            for u in users:
+                if u != item.paid_by and base > 0:
+                    months[_month(day)].append((day, False, (u, item.paid_by), base))
+        for s in settlements or []:
+            day = to_day(s.created_at)
+            months[_month(day)].append((day, True, (s.from_user_id, s.to_user_id), s.amount_cents))
+
+        # events in day order, with a checkpoint at the start of each month
+        self._months = months
+        self._events = []
+        self._checkpoints = []
+        self.rebuilt_months = 0
+        reusable = previous._checkpoints_by_month() if previous is not None else {}
+        debts = paid = None  # running totals, from the first month that isn't reused
+        for month in sorted(months.keys() | reusable.keys()):
+            position = len(self._events)
+            if debts is None:
+                cp = reusable.get(month)
+                if cp is not None and cp.position == position and previous._months.get(month) == months.get(month):
+                    self._checkpoints.append(cp)
+                    self._events.extend(previous._events[cp.position:previous._month_end(cp)])
+                    continue
+                # everything before this month is unchanged: start from the previous state there
+                debts, paid = previous._state(position)[:2] if previous is not None else (defaultdict(int), defaultdict(int))
+            if month not in months:
+                continue
+            self.rebuilt_months += 1
+            bucket = sorted(months[month], key=lambda e: e[0])
+            self._checkpoints.append(_Checkpoint(month, position, dict(debts), dict(paid)))
+            for _, is_settlement, key, cents in bucket:
+                (paid if is_settlement else debts)[key] += cents
+            self._events.extend(bucket)
+        self._days = [e[0] for e in self._events]
+        self._positions = [cp.position for cp in self._checkpoints]
+
+    @property
+    def checkpoints(self) -> int:
+        return len(self._checkpoints)
+
+    def _checkpoints_by_month(self) -> dict:
+        return {cp.month: cp for cp in self._checkpoints}
+
+    def _month_end(self, checkpoint) -> int:
+        i = bisect_right(self._positions, checkpoint.position)
+        return self._positions[i] if i < len(self._positions) else len(self._events)
+
+    def _state(self, position):
+        """(debts, paid, replayed) for the first `position` events."""
+        debts, paid, start = defaultdict(int), defaultdict(int), 0
+        i = bisect_right(self._positions, position) - 1
+        if i >= 0:
+            cp = self._checkpoints[i]
+            debts.update(cp.debts)
+            paid.update(cp.paid)
+            start = cp.position
+        for _, is_settlement, key, cents in self._events[start:position]:
+            (paid if is_settlement else debts)[key] += cents
+        return debts, paid, position - start
+
+    def balances(self, start=None, end=None):
+        """
+        (pairwise, per_user, replayed events) for everything dated in
+        [start, end]; either bound may be None (open).
+        """
+        end_pos = len(self._events) if end is None else bisect_right(self._days, end)
+        debts, paid, replayed = self._state(end_pos)
+        if start is not None:
+            before_debts, before_paid, more = self._state(bisect_left(self._days, start))
+            replayed += more
+            for key, cents in before_debts.items():
+                debts[key] -= cents
+            for key, cents in before_paid.items():
+                paid[key] -= cents
+        pairwise, per_user = net_balances(debts, paid)
+        return sorted(pairwise), per_user, replayed
+
+
+_TYPES = ("ResponsibilityMapping", "PurchasedItem", "Settlements")
+_histories = {}  # group -> (snapshots it was built from, BalanceHistory)
+_histories_lock = threading.Lock()
+
+
+def parse_window(args):
+    """(start, end) dates from ?as_of= or ?from=&to=, or None when no window is asked for."""
+    if not any(args.get(k) for k in ("as_of", "from", "to")):
+        return None
+    start = args.get("from") or None
+    end = args.get("to") or args.get("as_of") or None
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    if start and end and start > end:
+        raise ValueError("'from' is after 'to'")
+    return start, end
+
+
+def load_history():
+    """(objects, history) for the current ledger group, reading through the request store."""
+    data = load_concurrently(
+        responsibility_mappings=read_all("ResponsibilityMapping"),
+        users=read_all("Users"),
+        purchased_items=read_all("PurchasedItem"),
+        settlements=read_all("Settlements"),
+    )
+    history = balance_history(data.responsibility_mappings, data.purchased_items, data.settlements,
+                              current_group())
+    return data, history
+
+
+def balance_history(responsibility_mappings, purchased_items, settlements, group=None) -> BalanceHistory:
+    """
+    The history for these objects, reused while the cached snapshots they came
+    from (the whole deployment's, or one group's) are unchanged. After a change
+    it is rebuilt from the previous one, from the earliest changed month on.
+    """
+    snapshots = tuple(client.cache.peek(t if group is None else f"{t}@{group}") for t in _TYPES)
+    with _histories_lock:
+        built = _histories.get(group)
+    if built is not None and None not in snapshots and all(a is b for a, b in zip(built[0], snapshots)):
+        return built[1]
+    history = BalanceHistory(responsibility_mappings, purchased_items, settlements,
+                             previous=built[1] if built is not None else None)
+    with _histories_lock:
+        _histories[group] = (snapshots, history)
+    return history
@@ -0,0 +1,220 @@
+import threading
+from collections import defaultdict
+
+from balances.utils import dollars_to_cents
+
+
+class Ledger:
+    """
+    Stateful balance engine.
+
+    Holds the raw per-pair debt matrix, settlement totals and pairwise nets, and
+    applies deltas (mapping added/removed, item added/changed/removed, settlement
+    recorded/removed) touching only the affected line or user pair. `balances()`
+    returns the same cents as `compute_balances` over the same objects.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._items = {}                      # line_id -> (payer, price_cents)
+        self._line_users = defaultdict(list)  # line_id -> [user_id, ...]
+        self._line_debts = {}                 # line_id -> {(debtor, payer): cents}
+        self._raw = defaultdict(int)          # (debtor, creditor) -> cents before settlements
+        self._paid = defaultdict(int)         # (from, to) -> cents settled
+        self._net = {}                        # (a, b) with a < b -> signed cents, a owes b if > 0
+        self._per_user = defaultdict(int)
+        self._pair_count = defaultdict(int)   # user_id -> number of non-zero pairs
+        # Object snapshots last seen by sync(), keyed by primary key.
+        self._seen_items = {}
+        self._seen_mappings = {}
+        self._seen_settlements = {}
+
+    @classmethod
+    def from_objects(cls, responsibility_mappings, purchased_items, settlements=None):
+        ledger = cls()
+        ledger.sync(responsibility_mappings, purchased_items, settlements or [])
+        return ledger
+
+    # ---- deltas ----
+
+    def set_item(self, line_id, paid_by, price, price_cents=None):
+        """Add a line item or change its payer/price (price in dollars, or already in cents)."""
+        if not line_id:
+            return
+        with self._lock:
+            if paid_by is None or price is None:
+                self._items.pop(line_id, None)
+            else:
+                self._items[line_id] = (paid_by, dollars_to_cents(price) if price_cents is None else price_cents)
+            self._refresh_line(line_id)
+
+    def remove_item(self, line_id):
+        with self._lock:
+            if self._items.pop(line_id, None) is not None:
+                self._refresh_line(line_id)
+
+    def add_mapping(self, line_id, user_id):
+        if not line_id or not user_id:
+            return
+        with self._lock:
+            self._line_users[line_id].append(user_id)
+            self._refresh_line(line_id)
+
+    def remove_mapping(self, line_id, user_id):
+        with self._lock:
+            users = self._line_users.get(line_id)
+            if not users or user_id not in users:
+                return
+            users.remove(user_id)
+            if not users:
+                del self._line_users[line_id]
+            self._refresh_line(line_id)
+
+    def add_settlement(self, from_user_id, to_user_id, amount_cents):
+        with self._lock:
+            self._paid[(from_user_id, to_user_id)] += amount_cents
+            self._refresh_pair(from_user_id, to_user_id)
+
+    def remove_settlement(self, from_user_id, to_user_id, amount_cents):
+        self.add_settlement(from_user_id, to_user_id, -amount_cents)
+
+    # ---- reads ----
+
+    def balances(self):
+        """Return `(pairwise, per_user)` in the same shape as `compute_balances`."""
+        with self._lock:
+            pairwise = []
+            for (a, b), signed in sorted(self._net.items()):
+                if signed > 0:   pairwise.append((a, b, signed))     # a owes b
+                elif signed < 0: pairwise.append((b, a, -signed))    # b owes a
+            per_user = defaultdict(int)
+            for uid, cents in self._per_user.items():
+                if self._pair_count[uid] > 0:
+                    per_user[uid] = cents
+            return pairwise, per_user
+
+    # ---- snapshot diffing ----
+
+    def sync(self, responsibility_mappings, purchased_items, settlements, index=None):
+        """
+        Bring the ledger in line with a fresh set of ontology objects, applying
+        deltas only for objects that were added, removed or changed since the
+        previous sync. Prices of changed items come from `index` (a LedgerIndex
+        over the same objects) when given.
+        """
+        with self._lock:
+            items = {}
+            for it in purchased_items:
+                if it.line_id:
+                    items[it.line_id] = (it.paid_by, it.price)
+            for line_id in self._seen_items.keys() - items.keys():
+                self.remove_item(line_id)
+            for line_id, (paid_by, price) in items.items():
+                if self._seen_items.get(line_id) != (paid_by, price):
+                    cents = index.price_cents(line_id) if index is not None and price is not None else None
+                    self.set_item(line_id, paid_by, price, price_cents=cents)
+            self._seen_items = items
+
+            mappings = _keyed(responsibility_mappings, "mapping_id", lambda m: (m.line_id, m.user_id))
+            for key in self._seen_mappings.keys() - mappings.keys():
+                self.remove_mapping(*self._seen_mappings[key])
+            for key, value in mappings.items():
+                old = self._seen_mappings.get(key)
+                if old != value:
+                    if old is not None:
+                        self.remove_mapping(*old)
+                    self.add_mapping(*value)
+            self._seen_mappings = mappings
+
+            rows = _keyed(settlements, "settlement_id",
+                          lambda s: (s.from_user_id, s.to_user_id, s.amount_cents))
+            for key in self._seen_settlements.keys() - rows.keys():
+                self.remove_settlement(*self._seen_settlements[key])
+            for key, value in rows.items():
+                old = self._seen_settlements.get(key)
+                if old != value:
+                    if old is not None:
+                        self.remove_settlement(*old)
+                    self.add_settlement(*value)
+            self._seen_settlements = rows
+
+            return self.balances()
+
+    # ---- internals ----
+
+    def _refresh_line(self, line_id):
+        new = {}
+        item = self._items.get(line_id)
+        users = self._line_users.get(line_id, [])
+        if item and users:
+            payer, price_cents = item
+            n = len(users)
+            if price_cents > 0:
+                base = price_cents // n
+                residue = price_cents - base * n
+                for u in users:
+                    share = base + (residue if u == payer else 0)
+                    if u != payer and share > 0:
+                        new[(u, payer)] = new.get((u, payer), 0) + share
+
+        old = self._line_debts.pop(line_id, {})
+        if new:
+            self._line_debts[line_id] = new
+        for key in old.keys() | new.keys():
+            delta = new.get(key, 0) - old.get(key, 0)
+            if delta:
+                self._raw[key] += delta
+                self._refresh_pair(*key)
+
+    def _refresh_pair(self, u, v):
+        if u is None or v is None or u == v:
+            return
+        a, b = (u, v) if u < v else (v, u)
+        signed = self._effective(a, b) - self._effective(b, a)
+        old = self._net.get((a, b), 0)
+        if signed == old:
+            return
+        if signed:
+            self._net[(a, b)] = signed
+        else:
+            self._net.pop((a, b), None)
+        if not old:
+            self._pair_count[a] += 1
+            self._pair_count[b] += 1
+        elif not signed:
+            self._pair_count[a] -= 1
+            self._pair_count[b] -= 1
+        self._per_user[a] -= signed - old
+        self._per_user[b] += signed - old
+
+    def _effective(self, frm, to):
+        return max(self._raw.get((frm, to), 0) - self._paid.get((frm, to), 0), 0)
+
+
+def _keyed(objects, pk_name, value_of):
+    # Objects without a primary key are keyed by their value and occurrence.
+    keyed = {}
+    seen = defaultdict(int)
+    for obj in objects:
+        pk = getattr(obj, pk_name, None)
+        value = value_of(obj)
+        if pk is None:
+            seen[value] += 1
+            pk = ("no-pk", value, seen[value])
+        keyed[pk] = value
+    return keyed
+
+
+# Process-wide ledgers used by the balances page, one per ledger group (None is
+# the whole deployment); each view syncs its group's ledger with the current
+# objects so only what changed since the last view is recomputed.
+_shared_ledgers = {}
+_shared_lock = threading.Lock()
+
+
+def shared_ledger(group=None) -> Ledger:
+    with _shared_lock:
+        ledger = _shared_ledgers.get(group)
+        if ledger is None:
+            ledger = _shared_ledgers[group] = Ledger()
+        return ledger
@@ -0,0 +1,99 @@
+import functools
+import heapq
+
+
+# Groups with at most this many non-zero balances are planned exactly.
+EXACT_LIMIT = 14
+
+
+def plan_settlements(per_user, exact_limit: int = EXACT_LIMIT):
+    """
+    Turn per-user nets (cents, positive = is owed) into a short list of
+    `(from_user, to_user, cents)` transfers that zeroes everyone out.
+
+    Small groups get a minimum-count plan: the users are split into as many
+    zero-sum subgroups as possible, and each subgroup of k people settles in
+    k - 1 transfers. Larger groups use the greedy max-debtor -> max-creditor
+    match, which needs at most n - 1 transfers.
+    """
+    balances = tuple(sorted((uid, cents) for uid, cents in per_user.items() if cents))
+    if sum(cents for _, cents in balances) != 0:
+        raise ValueError("per-user balances must sum to zero")
+    return list(_plan(balances, exact_limit))
+
+
+# The exact plan is a 2^n * n search (about 13 ms for 14 users, on every build
+# of the balances page); pages built from unchanged balances reuse it.
+@functools.lru_cache(maxsize=64)
+def _plan(balances, exact_limit) -> tuple:
+    if len(balances) <= exact_limit:
+        groups = _zero_sum_groups(balances)
+    else:
+        groups = [balances]
+
+    transfers = []
+    for group in groups:
+        transfers.extend(_greedy(group))
+    return tuple(transfers)
+
+
+def _greedy(balances):
+    # max-heaps keyed by amount, ties broken by user id so plans are deterministic
+    creditors = [(-cents, uid) for uid, cents in balances if cents > 0]
+    debtors = [(cents, uid) for uid, cents in balances if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def _zero_sum_groups(balances):
+    """Partition balances into the maximum number of zero-sum groups (bitmask DP)."""
+    n = len(balances)
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + balances[low.bit_length() - 1][1]
+
+    # best[mask] = most zero-sum prefixes on any order of removing mask's members
+    best = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        top = 0
+        rest = mask
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            if best[mask ^ low] > top:
+                top = best[mask ^ low]
+        best[mask] = top + (1 if sums[mask] == 0 else 0)
+
+    # Walk back from the full set; every time the remaining set sums to zero,
+    # the members removed since the previous such point form a group.
+    groups = []
+    current = []
+    mask = full
+    while mask:
+        rest = mask
+        choice = None
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            if choice is None or best[mask ^ low] > best[mask ^ choice]:
+                choice = low
+        current.append(balances[choice.bit_length() - 1])
+        mask ^= choice
+        if sums[mask] == 0:
+            groups.append(current)
+            current = []
+    return groups
@@ -0,0 +1,116 @@
+import threading
+from datetime import date
+
+from app import client
+from balances.allocation import ShareIndex, allocate_pair
+from balances.summary import is_paid
+from common import action_types, queries
+from common.groups import read_group
+from common.request_store import get_store
+from common.write_queue import write_queue
+
+
+# Share indexes over the cached snapshots, one per ledger group (None is the
+# whole deployment). Each is built once per snapshot, the one the balances page
+# reads, so a settlement only walks the shares between its two users.
+_share_indexes = {}
+_share_indexes_lock = threading.Lock()
+
+
+def share_index(group=None) -> ShareIndex:
+    if group is None:
+        objects = client.ontology.objects
+        snapshots = (objects.ResponsibilityMapping.snapshot(), objects.PurchasedItem.snapshot())
+    else:
+        snapshots = (read_group("ResponsibilityMapping", group), read_group("PurchasedItem", group))
+    with _share_indexes_lock:
+        built = _share_indexes.get(group)
+    if built is not None and all(a is b for a, b in zip(built[0], snapshots)):
+        return built[1]
+    shares = ShareIndex(*snapshots)
+    with _share_indexes_lock:
+        _share_indexes[group] = (snapshots, shares)
+    return shares
+
+
+def _owed(shares, debtor, creditor, settlements) -> int:
+    return sum(allocate_pair(shares, debtor, creditor, settlements).values())
+
+
+def outstanding_cents(debtor: int, creditor: int, pending=(), group=None) -> int:
+    """
+    What `debtor` owes `creditor` on balance (the pairwise amount of the
+    balances page, within `group` when one is given), counting `pending`
+    settlements (not written yet) as already made. The pair's settlements are
+    read live, so one that was just recorded is always counted.
+    """
+    shares = share_index(group)
+    settlements = queries.settlements_between(debtor, creditor) + list(pending)
+    return max(_owed(shares, debtor, creditor, settlements) - _owed(shares, creditor, debtor, settlements), 0)
+
+
+def record_settlement(settlement):
+    """
+    Create one settlement ({"settlement_id", "from_user_id", "to_user_id",
+    "amount_cents", "created_at", "note"}, plus the "group" it was made in) and
+    mark the mappings it fully covers as paid. Safe to repeat: a settlement that already exists isn't created again,
+    and only mappings that aren't paid yet are edited.
+
+    A new settlement larger than what is still owed is refused (ValueError).
+    Writes are applied one at a time by the write queue, so two Resolve clicks
+    on the same debt (from any worker) can't both be recorded.
+    """
+
+    store = get_store()
+    if store.get("Settlements", "settlement_id", settlement["settlement_id"]) is None:
+        owed = outstanding_cents(settlement["from_user_id"], settlement["to_user_id"],
+                                 group=settlement.get("group"))
+        if settlement["amount_cents"] > owed:
+            raise ValueError(f"Settlement of {settlement['amount_cents']} cents exceeds the {owed} cents "
+                             f"still owed.")
+        response = client.ontology.actions.create_settlements(
+            action_config=action_types.ActionConfig(
+                mode=action_types.ActionMode.VALIDATE_AND_EXECUTE,
+                return_edits=action_types.ReturnEditsMode.NONE
+            ),
+            settlement_id=settlement["settlement_id"],
+            from_user_id=settlement["from_user_id"],
+            to_user_id=settlement["to_user_id"],
+            amount_cents=settlement["amount_cents"],
+            created_at=date.fromisoformat(settlement["created_at"]),
+            note=settlement["note"]
+        )
+        if response.validation.result != "VALID":
+            raise RuntimeError("Settlement validation failed.")
+
+    # Allocate the settlements from debtor to creditor to the debtor's shares
+    # (oldest first) and mark only the mappings that are now fully covered as 'paid'.
+    debtor, creditor = settlement["from_user_id"], settlement["to_user_id"]
+    shares = share_index(settlement.get("group"))
+    remaining = allocate_pair(shares, debtor, creditor, queries.settlements_between(debtor, creditor))
+
+    edits = [
+        action_types.EditResponsibilityMappingBatchRequest(
+            responsibility_mapping=share.mapping_id,
+            line_id=share.line_id,
+            user_id=share.debtor,
+            status="paid"
+        )
+        for share in shares.shares(debtor, creditor)
+        if remaining.get(share.mapping_id) == 0 and not is_paid(share.status)
+    ]
+
+    if edits:
+        client.ontology.batch_actions.edit_responsibility_mapping(
+            batch_action_config=action_types.BatchActionConfig(return_edits=action_types.ReturnEditsMode.NONE),
+            requests=edits
+        )
+
+
+def record_settlements(settlements):
+    # in the order they were made: each one's allocation sees the ones before it
+    for settlement in settlements:
+        record_settlement(settlement)
+
+
+write_queue.register("settlement", record_settlements)
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+from flask import current_app, g
+
+from common.cache import add_call_listener, CACHED_TYPES
+from common.groups import current_group
+from common.loader import load_concurrently, read_all
+from balances.summary import build_summary
+
+
+class Snapshot:
+    def __init__(self, version: int, built_at: float, summary: dict, writes: int = 0):
+        self.version = version
+        self.built_at = built_at
+        self.summary = summary
+        self.writes = writes  # writes this process had seen when the build started
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+
+class SnapshotStore:
+    """
+    Versioned, precomputed balance summaries, one per ledger group (None is the
+    whole deployment).
+
+    A background thread rebuilds the summaries whenever a write marks the store
+    dirty, and at least every `interval` seconds (which picks up writes made by
+    other workers). Only groups that have been viewed are kept up to date.
+    Readers always get the latest finished snapshot immediately; only the first
+    read of a group in a process waits for a build.
+
+    Writes are counted per process: a snapshot is stale until one built after
+    the last write this process saw is published. Writes made by other workers
+    only show up at the next periodic rebuild, so settling a debt is checked
+    against the ontology (balances.settle) rather than trusted to a snapshot.
+    """
+
+    def __init__(self, interval: float = 60.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._snapshots = {}  # group -> Snapshot
+        self._writes = 0
+        self._writes_lock = threading.Lock()  # not _lock: a write shouldn't wait for a rebuild
+        self._app = None
+        self._pid = None
+
+    def get(self, app, group=None) -> Snapshot:
+        self._ensure_worker(app)
+        snapshot = self._snapshots.get(group)
+        if snapshot is None:
+            with self._lock:
+                if group not in self._snapshots:
+                    self._rebuild(group)
+                snapshot = self._snapshots[group]
+        return snapshot
+
+    def is_stale(self, snapshot: Snapshot) -> bool:
+        """True while a write this process made isn't reflected in `snapshot` yet."""
+        return snapshot.writes < self._writes
+
+    def mark_dirty(self):
+        with self._writes_lock:
+            self._writes += 1
+        self._wake.set()
+
+    def _ensure_worker(self, app):
+        # started lazily, once per process, so forked workers each get their own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._app = app
+            self._pid = os.getpid()
+            self._snapshots = {}
+            threading.Thread(target=self._run, name="balance-snapshots", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            for group in list(self._snapshots):
+                try:
+                    with self._lock:
+                        self._rebuild(group)
+                except Exception:
+                    self._app.logger.exception("balance snapshot refresh failed for group %s", group)
+
+    def _rebuild(self, group):
+        # read before loading: a write that lands mid-build leaves the new snapshot stale
+        writes = self._writes
+        with self._app.app_context():
+            g.ledger_group = group
+            data = load_concurrently(
+                responsibility_mappings=read_all("ResponsibilityMapping"),
+                users=read_all("Users"),
+                purchased_items=read_all("PurchasedItem"),
+                settlements=read_all("Settlements"),
+            )
+            summary = build_summary(data.responsibility_mappings, data.purchased_items,
+                                    data.settlements, data.users)
+        previous = self._snapshots.get(group)
+        self._snapshots[group] = Snapshot(previous.version + 1 if previous else 1, time.time(), summary, writes)
+
+
+balance_snapshots = SnapshotStore(interval=float(os.environ.get("MR_SPLIT_SNAPSHOT_INTERVAL", "60")))
+
+
+def _on_backend_call(kind, type_name, objects, seconds):
+    if kind == "action" and type_name in CACHED_TYPES:
+        balance_snapshots.mark_dirty()
+
+
+add_call_listener(_on_backend_call)
+
+
+def current_summary():
+    """Return (summary, snapshot or None) using a precomputed snapshot when enabled."""
+    if current_app.config.get("BALANCE_SNAPSHOTS"):
+        snapshot = balance_snapshots.get(current_app._get_current_object(), current_group())
+        return snapshot.summary, snapshot
+
+    # None of these reads depend on each other, so fetch them concurrently
+    data = load_concurrently(
+        responsibility_mappings=read_all("ResponsibilityMapping"),
+        users=read_all("Users"),
+        purchased_items=read_all("PurchasedItem"),
+        settlements=read_all("Settlements"),
+    )
+    return build_summary(data.responsibility_mappings, data.purchased_items, data.settlements, data.users), None
@@ -0,0 +1,91 @@
+from balances.utils import LedgerIndex
+from balances.allocation import ShareIndex, allocate
+from balances.engines import compute_configured_balances
+from balances.planner import plan_settlements
+from common.metrics import span
+
+
+def fmt_cents(c): return f"${c/100:.2f}"
+
+def is_paid(status) -> bool:
+    return (status or "").strip().lower() == "paid"
+
+
+def build_summary(responsibility_mappings, purchased_items, settlements, users, balances=None) -> dict:
+    """
+    Everything the balances page shows: unpaid shares, pairwise debts, per-user
+    nets and the settle-up plan. `balances` is an already computed
+    (pairwise, per_user) for these objects, e.g. from the balance history.
+    """
+    user_id_to_name = {u.user_id: u.full_name for u in users if u.user_id and u.full_name}
+
+    # One index (items, participants and cents per line) feeds both the table and the engine
+    index = LedgerIndex(responsibility_mappings, purchased_items)
+    line_id_to_item = index.line_to_item
+
+    # ---- display table (UNPAID only) ----
+    # Settlements are allocated to shares oldest first, so what is left on the
+    # rows, netted per pair, is the pairwise balances below.
+    shares = ShareIndex(responsibility_mappings, purchased_items, index=index)
+    remaining = allocate(shares, settlements)
+
+    mappings_expanded = []
+    for (debtor, creditor), open_shares in shares.by_pair.items():
+        for share in open_shares:
+            left = remaining.get(share.mapping_id, share.cents)
+            # hide shares the settlements already cover
+            if left <= 0:
+                continue
+
+            item = line_id_to_item[share.line_id]
+            mappings_expanded.append({
+                "line_id": share.line_id,
+                "receipt_id": item.receipt_id,
+                "item_name": item.item_name,
+                "share": fmt_cents(share.cents),
+                "remaining": fmt_cents(left),
+                "user_name": user_id_to_name.get(debtor, f"User ID {debtor}"),
+                "status": share.status,
+                "paid_by": user_id_to_name.get(creditor, f"User ID {creditor}")
+            })
+
+    mappings_expanded.sort(key=lambda x: (x["line_id"], x["user_name"]))
+
+    # balances come from the configured engine (all give the same cents as compute_balances)
+    if balances is not None:
+        pairwise, per_user = balances
+    else:
+        with span("compute", "balances"):
+            pairwise, per_user = compute_configured_balances(responsibility_mappings, purchased_items, settlements,
+                                                             index=index)
+
+    pairwise_display = [{
+        "from_id": frm,
+        "to_id":   to,
+        "from":    user_id_to_name.get(frm, f"User ID {frm}"),
+        "to":      user_id_to_name.get(to,  f"User ID {to}"),
+        "amount_cents": amt,
+        "amount": fmt_cents(amt),
+    } for (frm, to, amt) in pairwise]
+
+    per_user_display = [{
+        "user":  user_id_to_name.get(uid, f"User ID {uid}"),
+        "net":   fmt_cents(cents),
+        "status": "is owed" if cents > 0 else ("owes" if cents < 0 else "settled")
+    } for uid, cents in sorted(per_user.items(), key=lambda kv: user_id_to_name.get(kv[0], str(kv[0])) or "")]
+
+    transfers = [{
+        "from_id": frm,
+        "to_id":   to,
+        "from":    user_id_to_name.get(frm, f"User ID {frm}"),
+        "to":      user_id_to_name.get(to,  f"User ID {to}"),
+        "amount_cents": amt,
+        "amount": fmt_cents(amt),
+    } for (frm, to, amt) in plan_settlements(per_user)]
+
+    return {
+        "mappings": mappings_expanded,   # unpaid rows only
+        "pairwise": pairwise_display,
+        "per_user": per_user_display,
+        "plan": transfers,
+    }
@@ -1,35 +1,67 @@
-from mr_split_sdk.ontology.objects import Users, Settlements
+from common import object_types as ontology_objects
 from app import client
+from common.ids import id_allocator
+from common.records import dollars_to_cents
 from collections import defaultdict
-from decimal import Decimal
-from datetime import datetime
 
 
-def new_settlement_id() -> int:
-    # Query for the user with the highest settlement_id
+def _next_settlement_id_from_ontology() -> int:
+    # Query for the settlement with the highest settlement_id
     highest_settlement = next(
         client.ontology.objects.Settlements
-        .order_by(Settlements.object_type.settlement_id.desc())
+        .order_by(ontology_objects.Settlements.object_type.settlement_id.desc())
         .iterate(),
         None  # default if none found
     )
 
     if highest_settlement is None or highest_settlement.settlement_id is None:
-        return 1  # no users, start at 1
+        return 1  # no settlements, start at 1
 
     return highest_settlement.settlement_id + 1
 
-def dollars_to_cents(val) -> int:
-    if val is None: return 0
-    return int((Decimal(str(val)) * 100).quantize(Decimal("1")))
+def new_settlement_id() -> int:
+    return id_allocator.allocate("Settlements", seed=_next_settlement_id_from_ontology)[0]
+
+class LedgerIndex:
+    """
+    Per-line index shared by the balances display table and `compute_balances`:
+    items by line, participants by line and each line's price in cents, built in
+    one pass over mappings with every price converted once.
+    """
+
+    def __init__(self, responsibility_mappings, purchased_items):
+        self.line_to_item = {it.line_id: it for it in purchased_items if it.line_id}
+        self.line_to_users = defaultdict(list)
+        for m in responsibility_mappings:
+            if m.line_id and m.user_id:
+                self.line_to_users[m.line_id].append(m.user_id)
+        self._price_cents = {}
+
+    def price_cents(self, line_id) -> int:
+        cents = self._price_cents.get(line_id)
+        if cents is None:
+            item = self.line_to_item[line_id]
+            # records already carry integer cents; raw SDK objects are converted once
+            cents = getattr(item, "price_cents", None)
+            if cents is None:
+                cents = dollars_to_cents(item.price)
+            self._price_cents[line_id] = cents
+        return cents
 
-def compute_balances(responsibility_mappings, purchased_items, settlements=None):
+    def owed_cents(self, line_id, user_id) -> int:
+        """What `user_id` owes the payer for their share of the line (0 for the payer)."""
+        if user_id == self.line_to_item[line_id].paid_by:
+            return 0
+        # the residue cent(s) go to the payer, so everyone else owes the base share
+        n = len(self.line_to_users.get(line_id, ())) or 1
+        return self.price_cents(line_id) // n
+
+
+def compute_balances(responsibility_mappings, purchased_items, settlements=None, index=None):
     settlements = settlements or []
-    line_to_item = {it.line_id: it for it in purchased_items if it.line_id}
-    line_to_users = defaultdict(list)
-    for m in responsibility_mappings:
-        if m.line_id and m.user_id:
-            line_to_users[m.line_id].append(m.user_id)
+    index = index or LedgerIndex(responsibility_mappings, purchased_items)
+    line_to_item = index.line_to_item
+    line_to_users = index.line_to_users
 
     # raw debts (u -> payer) before settlements
     debts = defaultdict(int)
@@ -39,7 +71,7 @@ def compute_balances(responsibility_mappings, purchased_items, settlements=None)
         if not item or item.paid_by is None or item.price is None: 
             continue
         payer = item.paid_by
-        price_cents = dollars_to_cents(item.price)
+        price_cents = index.price_cents(line_id)
         n = len(users)
         if n <= 0 or price_cents <= 0:
             continue
@@ -55,6 +87,16 @@ def compute_balances(responsibility_mappings, purchased_items, settlements=None)
     for s in settlements:
         paid[(s.from_user_id, s.to_user_id)] += s.amount_cents
 
+    return net_balances(debts, paid)
+
+
+def net_balances(debts, paid):
+    """
+    Pairwise and per-user balances from raw (debtor, payer) -> cents debts and
+    (from, to) -> cents settled: each direction is reduced by its settlements
+    (never below zero), then the two directions of a pair are netted.
+    """
+    debts = defaultdict(int, debts)
     for key, amt_paid in paid.items():
         owed = debts.get(key, 0)
         if amt_paid >= owed:
@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from balances.utils import dollars_to_cents
+
+
+def compute_balances_vectorized(responsibility_mappings, purchased_items, settlements=None):
+    """
+    Columnar version of `compute_balances`.
+
+    Shares, settlement subtraction and pairwise netting are done as array and
+    group-by operations. Returns the same `(pairwise, per_user)` values, in the
+    same order, as the pure-Python engine.
+    """
+    settlements = settlements or []
+
+    # line_id -> item, last one wins (same as the dict comprehension in compute_balances)
+    items = pd.DataFrame(
+        [(it.line_id, it.paid_by, it.price) for it in purchased_items if it.line_id],
+        columns=["line_id", "payer", "price"], dtype=object,
+    ).drop_duplicates("line_id", keep="last")
+    items = items[items["payer"].notna() & items["price"].notna()].astype({"line_id": np.int64, "payer": np.int64})
+
+    mappings = pd.DataFrame(
+        [(m.line_id, m.user_id) for m in responsibility_mappings if m.line_id and m.user_id],
+        columns=["line_id", "user_id"], dtype=object,
+    ).astype(np.int64)
+
+    pairwise = []
+    if not items.empty and not mappings.empty:
+        # Prices repeat a lot; convert each distinct value once with the exact Decimal rule.
+        cents = {p: dollars_to_cents(p) for p in items["price"].unique()}
+        items = items.assign(price_cents=items["price"].map(cents).astype(np.int64))
+
+        # Group mappings by line in first-appearance order, like line_to_users.
+        mappings["line_rank"] = pd.factorize(mappings["line_id"])[0]
+        mappings = mappings.sort_values("line_rank", kind="stable")
+        mappings["n"] = mappings.groupby("line_id")["user_id"].transform("size")
+
+        shares = mappings.merge(items[["line_id", "payer", "price_cents"]], on="line_id", how="inner", sort=False)
+        shares = shares[shares["price_cents"] > 0]
+        # Residue goes to the payer, who never owes themself, so debtors owe the base share.
+        shares = shares.assign(share=shares["price_cents"].to_numpy() // shares["n"].to_numpy().astype(np.int64))
+        shares = shares[(shares["user_id"] != shares["payer"]) & (shares["share"] > 0)]
+
+        debts = shares.groupby(["user_id", "payer"], sort=False)["share"].sum().reset_index()
+        debts.columns = ["frm", "to", "owed"]
+
+        if settlements:
+            paid = pd.DataFrame(
+                [(s.from_user_id, s.to_user_id, s.amount_cents) for s in settlements],
+                columns=["frm", "to", "paid"], dtype=object,
+            ).astype(np.int64).groupby(["frm", "to"], sort=False)["paid"].sum().reset_index()
+            debts = debts.merge(paid, on=["frm", "to"], how="left", sort=False)
+            paid_cents = debts["paid"].fillna(0).to_numpy(np.int64)
+            debts["owed"] = np.maximum(debts["owed"].to_numpy(np.int64) - paid_cents, 0)
+            debts = debts[debts["owed"] != 0]
+
+        if not debts.empty:
+            frm = debts["frm"].to_numpy()
+            to = debts["to"].to_numpy()
+            forward = frm < to
+            net = pd.DataFrame({
+                "a": np.where(forward, frm, to),
+                "b": np.where(forward, to, frm),
+                "signed": np.where(forward, 1, -1) * debts["owed"].to_numpy(np.int64),
+            }).groupby(["a", "b"], sort=False)["signed"].sum()
+
+            for (a, b), signed in net.items():
+                if signed > 0:   pairwise.append((int(a), int(b), int(signed)))     # a owes b
+                elif signed < 0: pairwise.append((int(b), int(a), int(-signed)))    # b owes a
+
+    per_user = defaultdict(int)
+    for frm, to, amt in pairwise:
+        per_user[frm] -= amt
+        per_user[to]  += amt
+
+    return pairwise, per_user
@@ -0,0 +1 @@
+#empty... makes the benchmarks folder a package.
\ No newline at end of file
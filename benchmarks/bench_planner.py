@@ -0,0 +1,47 @@
+"""
+How many transfers the settle-up planner saves over pairwise netting.
+
+    python -m benchmarks.bench_planner
+"""
+import random
+import time
+from collections import defaultdict
+
+from balances.planner import plan_settlements
+
+
+def synthetic_pairwise(n_users: int, debts_per_user: int, rnd: random.Random):
+    """Random netted debts, shaped like compute_balances' pairwise output."""
+    net = defaultdict(int)
+    for u in range(1, n_users + 1):
+        for v in rnd.sample(range(1, n_users + 1), min(debts_per_user, n_users)):
+            if u != v:
+                a, b = min(u, v), max(u, v)
+                net[(a, b)] += (1 if u < v else -1) * rnd.randint(1, 20_000)
+    pairwise = [(a, b, s) if s > 0 else (b, a, -s) for (a, b), s in net.items() if s]
+    per_user = defaultdict(int)
+    for frm, to, amt in pairwise:
+        per_user[frm] -= amt
+        per_user[to] += amt
+    return pairwise, per_user
+
+
+def main(sizes=(6, 10, 14, 25, 50, 100, 250, 500), debts_per_user=5, seed=0):
+    rnd = random.Random(seed)
+    # "again ms" is the next page build with unchanged balances, which reuses the plan
+    print(f"{'users':>6} {'pairwise':>9} {'greedy':>7} {'planned':>8} {'saved':>7} {'plan ms':>8} {'again ms':>9}")
+    for n in sizes:
+        pairwise, per_user = synthetic_pairwise(n, debts_per_user, rnd)
+        start = time.perf_counter()
+        plan = plan_settlements(per_user)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        plan_settlements(dict(per_user))
+        again_ms = (time.perf_counter() - start) * 1000
+        greedy = plan_settlements(per_user, exact_limit=0)
+        saved = 1 - len(plan) / len(pairwise) if pairwise else 0.0
+        print(f"{n:>6} {len(pairwise):>9} {len(greedy):>7} {len(plan):>8} {saved:>7.0%} {elapsed_ms:>8.1f} {again_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
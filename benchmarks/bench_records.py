@@ -0,0 +1,79 @@
+"""
+Per-object memory and conversion cost of the compact records in common.records.
+
+    python -m benchmarks.bench_records --scale medium
+
+Objects are read straight from a synthetic local-backend ledger (no cache, no
+app), so the "raw" column is the backend's own object; SDK pydantic objects
+carry more per-instance state than these, so the savings against Foundry are
+a lower bound.
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synth import SCALES, generate_scale
+from common.records import RECORD_TYPES, to_records
+from local_backend.client import LocalClient
+
+
+def _traced_bytes(build):
+    """(result, bytes still allocated once `build` returns)."""
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current - base
+
+
+def measure_type(client, type_name: str) -> dict:
+    object_set = getattr(client.ontology.objects, type_name)
+    raw, raw_bytes = _traced_bytes(lambda: list(object_set.iterate()))
+    n = len(raw) or 1
+
+    started = time.perf_counter()
+    to_records(type_name, raw)
+    convert_s = time.perf_counter() - started
+
+    # records measured on their own: the raw objects (and their strings) are dropped
+    def records_only():
+        objects = list(object_set.iterate())
+        records = to_records(type_name, objects)
+        del objects
+        return records
+
+    records, record_bytes = _traced_bytes(records_only)
+    return {
+        "objects": len(records),
+        "raw_bytes": raw_bytes / n,
+        "record_bytes": record_bytes / n,
+        "convert_us": convert_s / n * 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="medium", choices=SCALES)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.sqlite3")
+        generate_scale(path, args.scale)
+        client = LocalClient(path)
+
+        print(f"{'type':<22} {'objects':>8} {'raw B/obj':>10} {'record B/obj':>13} {'saved':>6} {'convert us/obj':>15}")
+        for type_name in RECORD_TYPES:
+            row = measure_type(client, type_name)
+            saved = 1 - row["record_bytes"] / row["raw_bytes"] if row["raw_bytes"] else 0.0
+            print(f"{type_name:<22} {row['objects']:>8} {row['raw_bytes']:>10.0f} {row['record_bytes']:>13.0f} "
+                  f"{saved:>6.0%} {row['convert_us']:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
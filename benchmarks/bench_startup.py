@@ -0,0 +1,156 @@
+"""
+Worker cold-start cost: wall time and `python -X importtime` breakdown of
+importing the app, building it, and serving the first request.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --save main        # write benchmarks/baselines/startup-main.json
+    python -m benchmarks.bench_startup --compare main     # flag regressions against it
+
+Every stage runs in fresh interpreters (median of --runs), against the backend
+selected by MR_SPLIT_BACKEND (default here: local). Import times come from
+`-X importtime` and are broken down by top-level package.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each stage's script prints the seconds it took, measured inside the process
+STAGES = {
+    "import_app": "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)",
+    "create_app": ("import time; t = time.perf_counter(); from app import create_app; create_app(); "
+                   "print(time.perf_counter() - t)"),
+    "first_request": ("import time; t = time.perf_counter(); from app import create_app; "
+                      "create_app().test_client().get('/'); print(time.perf_counter() - t)"),
+}
+
+# Packages whose import cost is reported on its own (when they are imported at all)
+WATCHED = ("mr_split_sdk", "foundry_sdk_runtime", "flask", "jinja2", "werkzeug", "httpx", "pandas", "numpy")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Microseconds spent importing each top-level package, from `-X importtime`
+    output. A module's cumulative time is charged to its package, minus whatever
+    it spent importing other packages (which are charged to those instead), so
+    the values add up to the total import time.
+    """
+    pending = []  # (depth, package, {package: us}); children are printed before their parent
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        package = name.strip().split(".")[0]
+        charged = {package: int(cumulative)}
+        while pending and pending[-1][0] > depth:
+            _, _, child = pending.pop()
+            for other, us in child.items():
+                if other != package:
+                    charged[other] = charged.get(other, 0) + us
+                    charged[package] -= us
+        pending.append((depth, package, charged))
+
+    packages = {}
+    for _, _, charged in pending:
+        for package, us in charged.items():
+            packages[package] = packages.get(package, 0) + us
+    return packages
+
+
+def run_stage(script: str, env: dict, importtime: bool = False):
+    """One fresh interpreter: its seconds, or {package: microseconds} with `importtime`."""
+    flags = ["-X", "importtime"] if importtime else []
+    proc = subprocess.run([sys.executable, *flags, "-c", script],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup stage failed:\n{proc.stderr[-2000:]}")
+    if importtime:
+        return parse_importtime(proc.stderr)
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(runs: int, env: dict) -> dict:
+    results = {}
+    for stage, script in STAGES.items():
+        # timed without -X importtime, whose bookkeeping slows imports down
+        seconds = [run_stage(script, env) for _ in range(runs)]
+        imports = [run_stage(script, env, importtime=True) for _ in range(runs)]
+        names = set().union(*imports)
+        median_us = {name: statistics.median(p.get(name, 0) for p in imports) for name in names}
+        results[stage] = {
+            "wall_ms": statistics.median(seconds) * 1000,
+            "import_ms": sum(median_us.values()) / 1000,
+            "packages_ms": {name: us / 1000 for name, us in median_us.items()},
+        }
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for stage, res in current.items():
+        base = baseline.get(stage)
+        if base and base["wall_ms"] and res["wall_ms"] > base["wall_ms"] * (1 + threshold):
+            regressions.append(f"{stage}: {base['wall_ms']:.1f} -> {res['wall_ms']:.1f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list per stage")
+    parser.add_argument("--save", metavar="NAME", help="save results as benchmarks/baselines/startup-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with benchmarks/baselines/startup-NAME.json")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault("MR_SPLIT_BACKEND", "local")
+        # keep the checkout's instance/ untouched
+        for var, name in (("MR_SPLIT_LOCAL_DB", "ledger.sqlite3"), ("MR_SPLIT_ID_DB", "ids.sqlite3"),
+                          ("MR_SPLIT_GROUP_DB", "groups.sqlite3"), ("MR_SPLIT_WRITE_DB", "writes.sqlite3")):
+            env.setdefault(var, os.path.join(tmp, name))
+        current = measure(args.runs, env)
+
+    print(f"backend: {env['MR_SPLIT_BACKEND']}, median of {args.runs} runs")
+    print(f"{'stage':<16} {'wall ms':>9} {'imports ms':>11}")
+    for stage, res in current.items():
+        print(f"{stage:<16} {res['wall_ms']:>9.1f} {res['import_ms']:>11.1f}")
+    for stage, res in current.items():
+        slowest = sorted(res["packages_ms"].items(), key=lambda kv: -kv[1])[:args.top]
+        print(f"\n{stage}: slowest imports")
+        for name, ms in slowest:
+            print(f"  {name:<28} {ms:>8.1f} ms")
+    watched = {name: current["first_request"]["packages_ms"].get(name) for name in WATCHED}
+    print("\nwatched packages by first request: " +
+          ", ".join(f"{name} {ms:.1f} ms" if ms else f"{name} -" for name, ms in watched.items()))
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"startup-{args.save}.json"), "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline startup-{args.save}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"startup-{args.compare}.json")) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Benchmark suite for the hot paths, run against the local SQLite backend.
+
+    python -m benchmarks.run --scales small,medium
+    python -m benchmarks.run --scales medium --save main        # write benchmarks/baselines/main.json
+    python -m benchmarks.run --scales medium --compare main     # flag regressions against it
+
+Each scale runs in its own process (the app reads its backend settings at
+import). Every case reports throughput, p50/p99 latency and peak traced memory.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, iterations: int) -> dict:
+    fn()  # warm-up
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+
+    # one extra traced run for memory, so tracing overhead doesn't skew latency
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "ops_per_s": iterations / total if total else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "peak_mem_kb": peak / 1024,
+    }
+
+
+def run_scale(scale: str, iterations: int) -> dict:
+    """Runs inside the per-scale worker process, with the local backend configured."""
+    from benchmarks.synth import generate_scale
+
+    counts = generate_scale(os.environ["MR_SPLIT_LOCAL_DB"], scale)
+
+    from app import create_app, client
+    from balances.utils import compute_balances, dollars_to_cents
+    from balances.ledger import Ledger
+    from balances.vectorized import compute_balances_vectorized
+    from balances.history import BalanceHistory, to_day
+
+    app = create_app()
+    web = app.test_client()
+
+    def load(type_name):
+        return list(getattr(client.ontology.objects, type_name).iterate())
+
+    mappings = load("ResponsibilityMapping")
+    items = load("PurchasedItem")
+    settlements = load("Settlements")
+    users = load("Users")
+    receipt_id = items[len(items) // 2].receipt_id
+    line_id = items[len(items) // 2].line_id
+    names = [u.full_name for u in users[:3]]
+    prices = [it.price for it in items]
+    history = BalanceHistory(mappings, items, settlements)
+    mid_day = sorted(to_day(it.purchase_date) for it in items)[len(items) // 2]
+
+    def get(url):
+        def call():
+            response = web.get(url)
+            b"".join(response.response)  # drain streamed bodies too
+            assert response.status_code == 200, (url, response.status_code)
+        return call
+
+    def post_json(url, payload):
+        def call():
+            response = web.post(url, json=payload)
+            assert response.status_code == 200, (url, response.get_data(as_text=True))
+        return call
+
+    # Settle the largest debt in slices small enough that every run (plus the
+    # warm-up and the traced one) still finds some of it outstanding.
+    debtor, creditor, owed = max(compute_balances(mappings, items, settlements)[0], key=lambda p: p[2])
+    slice_cents = max(1, owed // (iterations + 2))
+
+    def settle():
+        response = web.post("/balances/settle", data={
+            "confirm_text": "CONFIRM", "from_user_id": debtor,
+            "to_user_id": creditor, "amount_cents": str(slice_cents),
+        })
+        assert response.status_code == 302
+        assert "error=" not in response.headers["Location"], response.headers["Location"]
+
+    cases = {
+        "dollars_to_cents": lambda: [dollars_to_cents(p) for p in prices],
+        "compute_balances": lambda: compute_balances(mappings, items, settlements),
+        "ledger_from_objects": lambda: Ledger.from_objects(mappings, items, settlements),
+        "compute_balances_vectorized": lambda: compute_balances_vectorized(mappings, items, settlements),
+        "history_build": lambda: BalanceHistory(mappings, items, settlements),
+        "balances_as_of": lambda: history.balances(None, mid_day),
+        "balances_page": get("/balances/"),
+        "annotate_list_items": get(f"/annotate/?receipt_id={receipt_id}"),
+        "save_responsibility": post_json("/annotate/save-responsibility",
+                                         {"line_id": line_id, "user_names": names}),
+        "settle_debt": settle,
+    }
+    results = {name: measure(fn, iterations) for name, fn in cases.items()}
+    return {"scale": scale, "dataset": counts, "results": results}
+
+
+def _run_worker(scale: str, iterations: int, cache_ttl: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   MR_SPLIT_BACKEND="local",
+                   MR_SPLIT_LOCAL_DB=os.path.join(tmp, "ontology.sqlite3"),
+                   MR_SPLIT_SEED_DIR="",
+                   MR_SPLIT_ID_DB=os.path.join(tmp, "ids.sqlite3"),
+                   MR_SPLIT_GROUP_DB=os.path.join(tmp, "groups.sqlite3"),
+                   MR_SPLIT_WRITE_DB=os.path.join(tmp, "writes.sqlite3"),
+                   # write cases measure the ontology writes themselves, not just queueing them
+                   MR_SPLIT_WRITE_QUEUE="0",
+                   MR_SPLIT_CACHE_TTL=cache_ttl)
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", scale, "--iterations", str(iterations)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Cases whose p50 got slower than baseline by more than `threshold` (0.2 = 20%)."""
+    regressions = []
+    for scale, run in current.items():
+        base = baseline.get(scale)
+        if not base:
+            continue
+        for case, res in run["results"].items():
+            old = base["results"].get(case)
+            if old and res["p50_ms"] > old["p50_ms"] * (1 + threshold):
+                regressions.append(f"{scale}/{case}: p50 {old['p50_ms']:.2f}ms -> {res['p50_ms']:.2f}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--cache-ttl", default="0", help="object cache TTL; 0 makes every read hit the backend")
+    parser.add_argument("--save", metavar="NAME", help="save results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with benchmarks/baselines/NAME.json")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--worker", metavar="SCALE", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scale(args.worker, args.iterations)))
+        return 0
+
+    current = {}
+    for scale in args.scales.split(","):
+        run = current[scale] = _run_worker(scale, args.iterations, args.cache_ttl)
+        print(f"\n== {scale}: {run['dataset']}")
+        print(f"{'case':<30} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10}")
+        for case, res in run["results"].items():
+            print(f"{case:<30} {res['ops_per_s']:>9.1f} {res['p50_ms']:>9.2f} {res['p99_ms']:>9.2f} "
+                  f"{res['peak_mem_kb']:>10.0f}")
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save}.json"), "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline {args.save}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
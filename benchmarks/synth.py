@@ -0,0 +1,87 @@
+"""
+Synthetic ledger generator for benchmarks.
+
+Writes users, receipts (line items), responsibility mappings and settlements
+straight into a local-backend SQLite file, streaming rows so very large ledgers
+don't have to fit in memory.
+"""
+import random
+from datetime import date, timedelta
+
+from local_backend.client import LocalClient, insert_rows
+from local_backend.objects import PurchasedItem, ResponsibilityMapping, Settlements, Users
+
+STORES = ("COSTCO", "TRADER JOES", "SAFEWAY", "WHOLE FOODS", "TARGET", "H MART")
+ITEMS = ("CHK THIGH 2KG", "TP 12PK KIRK", "IC CRM VAN", "KETTLE BBQ CHPS", "EGGS 24CT",
+         "OLIVE OIL 2L", "RICE 25LB", "BANANAS", "COFFEE BEANS", "SPARKLING WATER")
+
+# name -> (users, receipts, lines per receipt, max participants per line, settlements)
+SCALES = {
+    "small":  (10,    50, 10, 3,    20),
+    "medium": (50,   500, 20, 4,   200),
+    "large":  (200, 5000, 20, 5,  2000),
+    "xlarge": (500, 50000, 20, 5, 20000),
+}
+
+
+def generate(path: str, users: int, receipts: int, lines_per_receipt: int,
+             max_participants: int, settlements: int, seed: int = 0) -> dict:
+    """Create a fresh local database at `path` and return row counts."""
+    rnd = random.Random(seed)
+    client = LocalClient(path)
+    conn = client.connection()
+    start = date(2025, 1, 1)
+    user_ids = list(range(1, users + 1))
+
+    insert_rows(conn, Users, ((u, f"User {u}", f"user{u}@example.com") for u in user_ids))
+
+    # receipts -> lines; each receipt has one payer, date and store
+    receipt_meta = [
+        (f"TXN{r:06d}", rnd.choice(STORES), (start + timedelta(days=rnd.randrange(365))).isoformat(),
+         rnd.choice(user_ids))
+        for r in range(1, receipts + 1)
+    ]
+
+    def lines():
+        line_id = 0
+        for receipt_id, store, day, payer in receipt_meta:
+            for _ in range(lines_per_receipt):
+                line_id += 1
+                price = rnd.randrange(50, 5000) / 100
+                yield (line_id, receipt_id, store, day, rnd.choice(ITEMS), price, payer)
+
+    insert_rows(conn, PurchasedItem, lines())
+
+    counts = {"mappings": 0}
+
+    def mappings():
+        mapping_id = 0
+        line_id = 0
+        for _, _, _, payer in receipt_meta:
+            for _ in range(lines_per_receipt):
+                line_id += 1
+                for uid in rnd.sample(user_ids, rnd.randint(1, min(max_participants, users))):
+                    mapping_id += 1
+                    yield (mapping_id, line_id, uid, "paid" if uid == payer else "unpaid")
+        counts["mappings"] = mapping_id
+
+    insert_rows(conn, ResponsibilityMapping, mappings())
+
+    insert_rows(conn, Settlements, (
+        (s, *rnd.sample(user_ids, 2), rnd.randrange(100, 20000),
+         (start + timedelta(days=rnd.randrange(365))).isoformat(), "synthetic")
+        for s in range(1, settlements + 1)
+    ) if users > 1 else ())
+    conn.commit()
+
+    return {
+        "users": users,
+        "receipts": receipts,
+        "line_items": receipts * lines_per_receipt,
+        "mappings": counts["mappings"],
+        "settlements": settlements if users > 1 else 0,
+    }
+
+
+def generate_scale(path: str, scale: str, seed: int = 0) -> dict:
+    return generate(path, *SCALES[scale], seed=seed)
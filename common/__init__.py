@@ -0,0 +1 @@
+#empty... makes the common folder a package.
\ No newline at end of file
@@ -0,0 +1,23 @@
+import importlib
+
+from app import BACKEND
+
+# Action configs (ActionConfig, BatchActionConfig, ActionMode, ReturnEditsMode)
+# and batch request types (e.g. CreateResponsibilityMappingBatchRequest) for
+# the configured backend. Use them as `action_types.<Name>` rather than
+# importing from foundry_sdk_runtime / mr_split_sdk so writes work against the
+# local SQLite backend without the SDK. Like `object_types`, names are
+# resolved on first access, so importing a blueprint doesn't import the SDK.
+_MODULES = (("local_backend.action_types",) if BACKEND == "local"
+            else ("foundry_sdk_runtime.types", "mr_split_sdk.ontology.action_types"))
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    for module_name in _MODULES:
+        value = getattr(importlib.import_module(module_name), name, None)
+        if value is not None:
+            globals()[name] = value
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,388 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from common.records import to_record, to_records
+from common.transport import Transport
+
+
+# Object types whose full snapshots are worth keeping between requests.
+CACHED_TYPES = ("Users", "PurchasedItem", "ResponsibilityMapping", "Settlements")
+
+# Action name suffix -> object type it writes, e.g. create_users -> Users.
+ACTION_SUFFIX_TO_TYPE = {
+    "users": "Users",
+    "purchased_item": "PurchasedItem",
+    "responsibility_mapping": "ResponsibilityMapping",
+    "settlements": "Settlements",
+}
+
+
+# Callables notified of every call that reaches the backend:
+# listener(kind, type_name, objects, seconds). kind is "read" (objects returned)
+# or "action" (objects edited).
+_call_listeners = []
+
+
+def add_call_listener(listener):
+    _call_listeners.append(listener)
+
+
+def _notify(kind, type_name, objects, seconds):
+    for listener in _call_listeners:
+        listener(kind, type_name, objects, seconds)
+
+
+def action_object_type(action_name: str):
+    """Return the object type written by an action such as `edit_responsibility_mapping`."""
+    _, _, suffix = action_name.partition("_")
+    return ACTION_SUFFIX_TO_TYPE.get(suffix)
+
+
+def _base_type(key: str) -> str:
+    # partition snapshots are keyed "<type>@<partition>"
+    return key.partition("@")[0]
+
+
+class ObjectCache:
+    """
+    Process-wide cache of full object-set snapshots keyed by object type (or by
+    "<type>@<partition>" for a filtered slice such as one ledger group).
+
+    Entries expire after `ttl` seconds and the total number of cached objects is
+    bounded by `max_objects` (least recently used snapshots are evicted first).
+    """
+
+    def __init__(self, ttl: float = 30.0, max_objects: int = 100_000):
+        self.ttl = ttl
+        self.max_objects = max_objects
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # type_name -> (expires_at, tuple(objects))
+        self._versions = {}
+        self._derived = {}  # (type_name, name) -> (snapshot it was built from, value)
+        self._hits = {}
+        self._misses = {}
+        self._invalidations = {}
+
+    def get_or_load(self, key: str, loader):
+        type_name = _base_type(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits[type_name] = self._hits.get(type_name, 0) + 1
+                return entry[1]
+            self._misses[type_name] = self._misses.get(type_name, 0) + 1
+            version = self._versions.get(type_name, 0)
+
+        objects = tuple(loader())
+
+        with self._lock:
+            # Don't store a snapshot if a write invalidated the type while we were loading.
+            if self._versions.get(type_name, 0) == version and len(objects) <= self.max_objects:
+                self._entries[key] = (time.monotonic() + self.ttl, objects)
+                self._entries.move_to_end(key)
+                self._evict()
+        return objects
+
+    def peek(self, type_name: str):
+        """The cached snapshot of a type if it is fresh, else None (never loads)."""
+        with self._lock:
+            entry = self._entries.get(type_name)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            return None
+
+    def derive(self, type_name: str, name: str, build, loader=None):
+        """
+        A value computed from a type's snapshot (e.g. a name -> id index), rebuilt
+        only when the snapshot changes. Without `loader` it is only served from an
+        already cached snapshot, and None is returned otherwise.
+        """
+        objects = self.get_or_load(type_name, loader) if loader else self.peek(type_name)
+        if objects is None:
+            return None
+        with self._lock:
+            built = self._derived.get((type_name, name))
+            if built is not None and built[0] is objects:
+                return built[1]
+        value = build(objects)
+        with self._lock:
+            self._derived[(type_name, name)] = (objects, value)
+        return value
+
+    def invalidate(self, type_name: str = None):
+        with self._lock:
+            names = [type_name] if type_name else list({_base_type(key) for key in self._entries})
+            for name in names:
+                for key in [k for k in self._entries if _base_type(k) == name]:
+                    del self._entries[key]
+                for key in [k for k in self._derived if _base_type(k[0]) == name]:
+                    del self._derived[key]
+                self._versions[name] = self._versions.get(name, 0) + 1
+                self._invalidations[name] = self._invalidations.get(name, 0) + 1
+
+    def version(self, type_name: str) -> int:
+        with self._lock:
+            return self._versions.get(type_name, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "cached_objects": sum(len(objs) for _, objs in self._entries.values()),
+                "by_type": {
+                    name: {
+                        "hits": self._hits.get(name, 0),
+                        "misses": self._misses.get(name, 0),
+                        "invalidations": self._invalidations.get(name, 0),
+                        "cached": any(_base_type(key) == name for key in self._entries),
+                    }
+                    for name in CACHED_TYPES
+                },
+            }
+
+    def _evict(self):
+        total = sum(len(objs) for _, objs in self._entries.values())
+        while total > self.max_objects and self._entries:
+            name, (_, objs) = self._entries.popitem(last=False)
+            total -= len(objs)
+            for key in [k for k in self._derived if k[0] == name]:
+                del self._derived[key]
+
+
+class CachedClient:
+    """
+    Wraps a FoundryClient so `client.ontology.objects.<Type>.iterate()` is served from
+    an ObjectCache and every action / batch action invalidates the type it writes.
+
+    Filtered reads (`where`, `order_by`, ...) are passed straight through. Reads
+    go through `transport` (retries, coalescing of identical in-flight reads).
+
+    `client` may also be a zero-argument function that builds the backend client;
+    it is then called on first use, so importing the app (and forking workers)
+    doesn't pay for SDK imports, authentication or connection setup.
+    """
+
+    def __init__(self, client, cache: ObjectCache, transport: Transport = None):
+        self._factory = None if hasattr(client, "ontology") else client
+        self._client = client if self._factory is None else None
+        self._ontology = None
+        self._lock = threading.Lock()
+        self.cache = cache
+        self.transport = transport or Transport()
+
+    def init_app(self, app):
+        app.extensions["ontology_client"] = self
+        # Workers that should fail fast on a bad token or hostname connect while the app is built
+        if app.config.get("ONTOLOGY_CONNECT_ON_START"):
+            self.backend
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    @property
+    def backend(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    @property
+    def ontology(self):
+        if self._ontology is None:
+            ontology = _CachedOntology(self.backend.ontology, self.cache, self.transport)
+            with self._lock:
+                if self._ontology is None:
+                    self._ontology = ontology
+        return self._ontology
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("backend", "ontology"):
+            # only reached when one of our own attributes failed; don't recurse into the backend
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+
+class _CachedOntology:
+    def __init__(self, ontology, cache, transport):
+        self._ontology = ontology
+        self.objects = _CachedObjects(ontology.objects, cache, transport)
+        self.actions = _InvalidatingActions(ontology.actions, cache)
+        self.batch_actions = _InvalidatingActions(ontology.batch_actions, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._ontology, name)
+
+
+class _CachedObjects:
+    def __init__(self, objects, cache, transport):
+        self._objects = objects
+        self._cache = cache
+        self._transport = transport
+
+    def __getattr__(self, type_name):
+        object_set = getattr(self._objects, type_name)
+        if type_name not in CACHED_TYPES:
+            return object_set
+        return _CachedObjectSet(type_name, object_set, self._cache, self._transport)
+
+
+class _CachedObjectSet:
+    def __init__(self, type_name, object_set, cache, transport):
+        self._type_name = type_name
+        self._object_set = object_set
+        self._cache = cache
+        self._transport = transport
+
+    def iterate(self):
+        return iter(self.snapshot())
+
+    def snapshot(self) -> tuple:
+        """The cached snapshot itself; the same tuple until the type changes or expires."""
+        return self._cache.get_or_load(self._type_name, self._load)
+
+    def derive(self, name: str, build, cached_only: bool = False):
+        """`build(objects)` over this type's cached snapshot; see ObjectCache.derive."""
+        return self._cache.derive(self._type_name, name, build, None if cached_only else self._load)
+
+    def partition(self, name: str, select) -> tuple:
+        """
+        Cached snapshot of the slice `select(object_set)` picks out (e.g. one ledger
+        group), stored as "<type>@<name>" and invalidated with the type. `select`
+        may also return a list of object sets, which are read one after another.
+        """
+        def fetch():
+            selected = select(self._object_set)
+            if not isinstance(selected, list):
+                return self._fetch(selected)
+            return [obj for object_set in selected for obj in self._fetch(object_set)]
+
+        def load():
+            key = ("partition", self._type_name, name, self._cache.version(self._type_name))
+            return self._transport.read(key, fetch)
+        return self._cache.get_or_load(f"{self._type_name}@{name}", load)
+
+    def _load(self):
+        # Concurrent misses for the same snapshot version share one load
+        key = ("all", self._type_name, self._cache.version(self._type_name))
+        return self._transport.read(key, self._fetch)
+
+    def _fetch(self, object_set=None):
+        started = time.perf_counter()
+        objects = to_records(self._type_name, (object_set or self._object_set).iterate())
+        _notify("read", self._type_name, len(objects), time.perf_counter() - started)
+        return objects
+
+    def __getattr__(self, name):
+        tracked = _TrackedObjectSet(self._type_name, self._object_set, self._cache, self._transport)
+        return getattr(tracked, name)
+
+
+# Argument types that describe themselves; expressions (where clauses, orderings,
+# groupings) are described by their `cache_key`.
+_PLAIN_ARGS = (str, int, float, bool, type(None), date, datetime)
+
+
+def _arg_key(value):
+    if isinstance(value, _PLAIN_ARGS):
+        return type(value).__name__, value
+    if isinstance(value, (tuple, list)):
+        return (type(value).__name__,) + tuple(_arg_key(v) for v in value)
+    key = getattr(value, "cache_key", None)
+    if key is None:
+        raise TypeError(f"no cache key for {type(value).__name__}")
+    return type(value).__name__, key
+
+
+def _call_key(name, args, kwargs):
+    """Hashable description of a call, or None when an argument can't be described."""
+    try:
+        return (name, tuple(_arg_key(a) for a in args),
+                tuple(sorted((k, _arg_key(v)) for k, v in kwargs.items())))
+    except TypeError:
+        return None
+
+
+# Calls on an object set that hit the backend; anything else (where, order_by,
+# group_by, ...) just builds a new object set.
+_TERMINAL_CALLS = ("get", "compute", "page")
+
+
+class _TrackedObjectSet:
+    """
+    Uncached object set whose backend calls are reported to the call listeners.
+    Terminal calls are retried and coalesced by the call chain that built them.
+    """
+
+    def __init__(self, type_name, object_set, cache, transport, path=()):
+        self._type_name = type_name
+        self._object_set = object_set
+        self._cache = cache
+        self._transport = transport
+        self._path = path  # call keys of the where/order_by/... chain, None if not describable
+
+    def iterate(self, *args, **kwargs):
+        started = time.perf_counter()
+        count = 0
+        try:
+            for obj in self._transport.iterate(lambda: self._object_set.iterate(*args, **kwargs)):
+                count += 1
+                yield to_record(self._type_name, obj)
+        finally:
+            _notify("read", self._type_name, count, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        attr = getattr(self._object_set, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            call_key = _call_key(name, args, kwargs)
+            path = None if self._path is None or call_key is None else self._path + (call_key,)
+            if name not in _TERMINAL_CALLS:
+                return _TrackedObjectSet(self._type_name, attr(*args, **kwargs), self._cache, self._transport, path)
+            started = time.perf_counter()
+            # the version keeps a read issued after a write from joining an older one
+            key = None if path is None else (self._type_name, self._cache.version(self._type_name), path)
+            result = self._transport.read(key, lambda: attr(*args, **kwargs))
+            data = getattr(result, "data", None)
+            count = len(data) if isinstance(data, list) else (0 if result is None else 1)
+            _notify("read", self._type_name, count, time.perf_counter() - started)
+            return to_record(self._type_name, result) if name == "get" else result
+
+        return call
+
+
+class _InvalidatingActions:
+    def __init__(self, actions, cache):
+        self._actions = actions
+        self._cache = cache
+
+    def __getattr__(self, name):
+        action = getattr(self._actions, name)
+        type_name = action_object_type(name)
+        if type_name is None or not callable(action):
+            return action
+
+        @functools.wraps(action)
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return action(*args, **kwargs)
+            finally:
+                # Invalidate even on failure: a batch may have partially applied.
+                self._cache.invalidate(type_name)
+                edits = len(kwargs["requests"]) if "requests" in kwargs else 1
+                _notify("action", type_name, edits, time.perf_counter() - started)
+
+        return run
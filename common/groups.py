@@ -0,0 +1,225 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import abort, g, has_app_context, request, session
+from common import object_types as ontology_objects
+from common.cache import add_call_listener
+from common.ids import _Transaction
+from app import client
+
+
+# Ledger groups (households, trip groups, ...). The ontology has no group
+# property, so membership lives in a small SQLite file next to the ID leases:
+# each user belongs to at most one group, and every other object follows a
+# user field. A debt lives in the group of the user it is owed to: items go
+# with their payer, mappings with their line's item and settlements with the
+# user they pay. Reads for a group filter on those fields server-side, so their
+# cost scales with the group rather than the deployment, and the groups'
+# balances add up to the deployment's.
+#
+# Groups and members are cached per process. Every change bumps a version
+# number in the same file, and each worker checks it at most every `recheck`
+# seconds, so a membership change made in one worker reaches the others
+# within that time (their cached group partitions are dropped with it).
+
+DEFAULT_GROUP_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "groups.sqlite3")
+
+# object type -> user field that places an object in its user's group
+# (ResponsibilityMapping has none; read_group places it by its line)
+PARTITION_FIELDS = {
+    "Users": "user_id",
+    "PurchasedItem": "paid_by",
+    "Settlements": "to_user_id",
+}
+
+GROUP_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+class GroupStore:
+    def __init__(self, path: str = DEFAULT_GROUP_DB, recheck: float = 5.0):
+        self.path = path
+        self.recheck = recheck
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._version = None   # membership version the caches below were read at
+        self._checked_at = 0.0
+        self._groups = None    # [(group_id, name), ...]
+        self._members = {}     # group_id -> tuple of user_ids
+
+    def groups(self) -> list:
+        version = self._current_version()
+        with self._lock:
+            groups = self._groups
+        if groups is None:
+            with self._connect() as conn:
+                groups = conn.execute("SELECT group_id, name FROM ledger_groups ORDER BY group_id").fetchall()
+            with self._lock:
+                if self._version == version:
+                    self._groups = groups
+        return groups
+
+    def exists(self, group_id: str) -> bool:
+        return any(gid == group_id for gid, _ in self.groups())
+
+    def create(self, group_id: str, name: str):
+        if not GROUP_ID_PATTERN.match(group_id or ""):
+            raise ValueError("Group IDs are lowercase letters, digits, '-' and '_'")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO ledger_groups (group_id, name) VALUES (?, ?)", (group_id, name or group_id))
+            version = self._bump(conn)
+        self._set_version(version)
+
+    def assign(self, user_id: int, group_id: str = None):
+        """Move a user into `group_id` (or out of every group with None)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if group_id is None:
+                conn.execute("DELETE FROM group_members WHERE user_id = ?", (user_id,))
+            else:
+                conn.execute("INSERT INTO group_members (user_id, group_id) VALUES (?, ?) "
+                             "ON CONFLICT(user_id) DO UPDATE SET group_id = excluded.group_id", (user_id, group_id))
+            version = self._bump(conn)
+        self._set_version(version)
+
+    def members(self, group_id: str) -> tuple:
+        version = self._current_version()
+        with self._lock:
+            members = self._members.get(group_id)
+        if members is None:
+            with self._connect() as conn:
+                members = tuple(row[0] for row in conn.execute(
+                    "SELECT user_id FROM group_members WHERE group_id = ? ORDER BY user_id", (group_id,)))
+            with self._lock:
+                # not kept if the membership changed while it was read
+                if self._version == version:
+                    self._members[group_id] = members
+        return members
+
+    def membership(self) -> dict:
+        """user_id -> group_id for every grouped user."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT user_id, group_id FROM group_members"))
+
+    def _current_version(self) -> int:
+        """The membership version, read from the file at most every `recheck` seconds."""
+        if time.monotonic() - self._checked_at >= self.recheck:
+            with self._connect() as conn:
+                version = conn.execute("SELECT version FROM group_version").fetchone()[0]
+            self._set_version(version)
+        return self._version
+
+    def _set_version(self, version: int):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            changed = self._version is not None and version != self._version
+            if version != self._version:
+                self._version = version
+                self._groups = None
+                self._members.clear()
+        if changed:
+            # cached partitions were built from the old membership
+            client.cache.invalidate()
+
+    @staticmethod
+    def _bump(conn) -> int:
+        conn.execute("UPDATE group_version SET version = version + 1")
+        return conn.execute("SELECT version FROM group_version").fetchone()[0]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None) if self._schema_ready else self._create_schema()
+        return _Transaction(conn)
+
+    def _create_schema(self):
+        # once per process; afterwards connections go straight to the queries
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS ledger_groups (group_id TEXT PRIMARY KEY, name TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS group_members (user_id INTEGER PRIMARY KEY, group_id TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS group_members_group ON group_members (group_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS group_version (version INTEGER NOT NULL)")
+        conn.execute("INSERT INTO group_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM group_version)")
+        self._schema_ready = True
+        return conn
+
+
+group_store = GroupStore(os.environ.get("MR_SPLIT_GROUP_DB", DEFAULT_GROUP_DB),
+                         recheck=float(os.environ.get("MR_SPLIT_GROUP_RECHECK", "5")))
+
+
+def current_group():
+    """The group this request works in, or None for the whole deployment."""
+    return g.get("ledger_group") if has_app_context() else None
+
+
+def any_member(prop, members):
+    """`prop` equals one of `members`, as a balanced OR tree (shallow even for big groups)."""
+    members = list(members)
+    if not members:
+        # an empty group matches nothing
+        return prop.is_null() & ~prop.is_null()
+    if len(members) == 1:
+        return prop == members[0]
+    mid = len(members) // 2
+    return any_member(prop, members[:mid]) | any_member(prop, members[mid:])
+
+
+def group_clause(type_name: str, group_id: str):
+    prop = getattr(getattr(ontology_objects, type_name).object_type, PARTITION_FIELDS[type_name])
+    return any_member(prop, group_store.members(group_id))
+
+
+def read_group(type_name: str, group_id: str) -> tuple:
+    """Every object of a type in one group, cached per group like full snapshots."""
+    if type_name == "ResponsibilityMapping":
+        return _read_group_mappings(group_id)
+    clause = group_clause(type_name, group_id)
+    return getattr(client.ontology.objects, type_name).partition(group_id, lambda objects: objects.where(clause))
+
+
+def _read_group_mappings(group_id: str) -> tuple:
+    # Every mapping of the group's lines, whoever it names, so a line's shares
+    # are never split between groups (and its share size stays the same).
+    from common.queries import MAX_FILTER_VALUES
+
+    line_ids = sorted({it.line_id for it in read_group("PurchasedItem", group_id) if it.line_id})
+    prop = ontology_objects.ResponsibilityMapping.object_type.line_id
+    return client.ontology.objects.ResponsibilityMapping.partition(group_id, lambda objects: [
+        objects.where(any_member(prop, line_ids[start:start + MAX_FILTER_VALUES]))
+        for start in range(0, len(line_ids), MAX_FILTER_VALUES)
+    ])
+
+
+def _drop_mapping_partitions(kind, type_name, objects, seconds):
+    # an item write can move a line (and so its mappings) to another group
+    if kind == "action" and type_name == "PurchasedItem" and group_store.groups():
+        client.cache.invalidate("ResponsibilityMapping")
+
+
+add_call_listener(_drop_mapping_partitions)
+
+
+def init_app(app):
+    # Workers can be limited to a set of groups (MR_SPLIT_SERVED_GROUPS) so a
+    # router can shard groups across them; empty serves every group.
+    served = {name for name in app.config.get("SERVED_GROUPS", "").split(",") if name}
+
+    @app.before_request
+    def select_group():
+        # ?group=<id> switches the session's group, ?group= goes back to everyone
+        if "group" in request.args:
+            session["ledger_group"] = request.args["group"] or None
+        group = session.get("ledger_group")
+        if group is not None and not group_store.exists(group):
+            session.pop("ledger_group", None)
+            group = None
+        if served and group is not None and group not in served:
+            abort(421)
+        g.ledger_group = group
+
+    @app.context_processor
+    def inject_groups():
+        return {"ledger_group": current_group(), "ledger_groups": group_store.groups()}
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+
+
+DEFAULT_ID_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "ids.sqlite3")
+
+
+class IdAllocator:
+    """
+    Hi/lo primary-key allocator.
+
+    Blocks of `block_size` IDs are leased per object type from a small SQLite file
+    (shared by every thread and gunicorn worker on the box) and then handed out
+    locally without any network round trip. The first lease for a type is seeded
+    from `seed()`, normally a max(id) + 1 query against the ontology.
+    """
+
+    def __init__(self, path: str = DEFAULT_ID_DB, block_size: int = 100):
+        self.path = path
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}  # key -> [next_id, end_exclusive]
+        self._pid = os.getpid()
+
+    def allocate(self, key: str, count: int = 1, seed=None) -> list:
+        ids = []
+        first = None
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Forked worker: never reuse the parent's in-memory block.
+                    self._blocks.clear()
+                    self._pid = os.getpid()
+                while len(ids) < count:
+                    block = self._blocks.get(key)
+                    if block is None or block[0] >= block[1]:
+                        leased = self._lease(key, max(self.block_size, count - len(ids)), first if seed else 1)
+                        if leased is None:
+                            break
+                        block = self._blocks[key] = list(leased)
+                    take = min(count - len(ids), block[1] - block[0])
+                    ids.extend(range(block[0], block[0] + take))
+                    block[0] += take
+                else:
+                    return ids
+            # The key has never been leased: its first block starts at seed(),
+            # normally an ontology query, so it runs outside both locks and the
+            # lease checks again (another worker may have seeded it meanwhile).
+            first = seed()
+
+    def reserve_through(self, key: str, max_id: int, seed=None):
+        """
+        Make sure future leases for `key` start above `max_id` (e.g. after an
+        import). The first lease for a type also respects `seed()`, so IDs already
+        in the ontology aren't handed out again.
+        """
+        first = None
+        while True:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT next_hi FROM id_leases WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if row[0] <= max_id:
+                        conn.execute("UPDATE id_leases SET next_hi = ? WHERE key = ?", (max_id + 1, key))
+                    break
+                if seed is None or first is not None:
+                    conn.execute("INSERT INTO id_leases (key, next_hi) VALUES (?, ?)",
+                                 (key, max(max_id + 1, first or 1)))
+                    break
+            # seeded outside the write lock, as in allocate()
+            first = seed()
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None and block[0] <= max_id:
+                self._blocks.pop(key)
+
+    def _lease(self, key, size, first):
+        """
+        A new (start, end) block, or None when the key has no lease yet and
+        `first` (where its IDs start) isn't known.
+        """
+        with self._connect() as conn:
+            # IMMEDIATE takes the write lock up front so two workers can't lease the same block.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT next_hi FROM id_leases WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                if first is None:
+                    return None
+                start = first
+                conn.execute("INSERT INTO id_leases (key, next_hi) VALUES (?, ?)", (key, start + size))
+            else:
+                start = row[0]
+                conn.execute("UPDATE id_leases SET next_hi = ? WHERE key = ?", (start + size, key))
+        return start, start + size
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS id_leases (key TEXT PRIMARY KEY, next_hi INTEGER NOT NULL)")
+        return _Transaction(conn)
+
+
+class _Transaction:
+    # sqlite3's own context manager doesn't close the connection; this commits
+    # (or rolls back) and closes.
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+id_allocator = IdAllocator(
+    path=os.environ.get("MR_SPLIT_ID_DB", DEFAULT_ID_DB),
+    block_size=int(os.environ.get("MR_SPLIT_ID_BLOCK_SIZE", "100")),
+)
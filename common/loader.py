@@ -0,0 +1,34 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from common.request_store import get_store
+
+
+# Shared by all requests; ontology reads are I/O bound, so threads are enough.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("MR_SPLIT_READ_THREADS", "8")),
+    thread_name_prefix="ontology-read",
+)
+
+
+def read_all(type_name: str):
+    """A read for `load_concurrently` that lists every object of one type (memoized per request)."""
+    return lambda: get_store().all(type_name)
+
+
+def load_concurrently(**reads) -> SimpleNamespace:
+    """
+    Run independent ontology reads at the same time and return their results as
+    one bundle, e.g. `load_concurrently(users=read_all("Users"), ...).users`.
+
+    Each read runs in a copy of the caller's context, so Flask's `g` and
+    `current_app` work inside it. Page latency becomes the slowest read instead
+    of the sum of all of them.
+    """
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, read)
+        for name, read in reads.items()
+    }
+    return SimpleNamespace(**{name: future.result() for name, future in futures.items()})
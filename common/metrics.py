@@ -0,0 +1,170 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response, g, has_app_context, request, before_render_template, template_rendered
+from common.cache import add_call_listener
+
+# Request latency histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Registry:
+    """Process-wide totals per route and span, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(lambda: [0, 0.0, [0] * len(BUCKETS)])  # route -> [count, seconds, buckets]
+        self.spans = defaultdict(lambda: [0, 0.0, 0])  # (route, span, object_type) -> [calls, seconds, objects]
+
+    def observe(self, route, seconds, spans):
+        with self._lock:
+            entry = self.requests[route]
+            entry[0] += 1
+            entry[1] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry[2][i] += 1
+            for (name, object_type), (calls, span_seconds, objects) in spans.items():
+                total = self.spans[(route, name, object_type)]
+                total[0] += calls
+                total[1] += span_seconds
+                total[2] += objects
+
+    def render(self) -> str:
+        lines = [
+            "# HELP mr_split_request_seconds Request latency by route.",
+            "# TYPE mr_split_request_seconds histogram",
+        ]
+        with self._lock:
+            for route, (count, seconds, buckets) in sorted(self.requests.items()):
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append(f'mr_split_request_seconds_bucket{{route="{route}",le="{bound}"}} {n}')
+                lines.append(f'mr_split_request_seconds_bucket{{route="{route}",le="+Inf"}} {count}')
+                lines.append(f'mr_split_request_seconds_sum{{route="{route}"}} {seconds:.6f}')
+                lines.append(f'mr_split_request_seconds_count{{route="{route}"}} {count}')
+
+            lines += [
+                "# HELP mr_split_span_seconds_total Time spent per span (ontology reads/actions, compute, render).",
+                "# TYPE mr_split_span_seconds_total counter",
+            ]
+            for (route, name, object_type), (_, seconds, _) in sorted(self.spans.items()):
+                lines.append(f'mr_split_span_seconds_total{{route="{route}",span="{name}",object_type="{object_type}"}} {seconds:.6f}')
+            lines += ["# HELP mr_split_span_calls_total Calls per span.", "# TYPE mr_split_span_calls_total counter"]
+            for (route, name, object_type), (calls, _, _) in sorted(self.spans.items()):
+                lines.append(f'mr_split_span_calls_total{{route="{route}",span="{name}",object_type="{object_type}"}} {calls}')
+            lines += ["# HELP mr_split_span_objects_total Objects fetched or edited per span.",
+                      "# TYPE mr_split_span_objects_total counter"]
+            for (route, name, object_type), (_, _, objects) in sorted(self.spans.items()):
+                lines.append(f'mr_split_span_objects_total{{route="{route}",span="{name}",object_type="{object_type}"}} {objects}')
+        return "\n".join(lines) + "\n"
+
+
+registry = _Registry()
+
+
+class _RequestSpans:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.spans = defaultdict(lambda: [0, 0.0, 0])  # (span, object_type) -> [calls, seconds, objects]
+
+    def add(self, name, object_type, seconds, objects=0):
+        with self.lock:
+            entry = self.spans[(name, object_type)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += objects
+
+
+@contextmanager
+def span(name: str, object_type: str = ""):
+    """Time a block as a named span of the current request (no-op when metrics are off)."""
+    spans = g.get("metric_spans") if has_app_context() else None
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.add(name, object_type, time.perf_counter() - started)
+
+
+def _on_backend_call(kind, type_name, objects, seconds):
+    spans = g.get("metric_spans") if has_app_context() else None
+    if spans is not None:
+        spans.add(f"ontology.{kind}", type_name, seconds, objects)
+
+
+# Registered once per process (not per app): it only records into the spans of
+# a request that has metrics on, so apps built with them off pay one lookup.
+add_call_listener(_on_backend_call)
+
+
+def init_app(app):
+    """
+    Register per-request timing when METRICS_ENABLED, and `?profile=1` cProfile
+    (or `?profile=pyinstrument`) dumps when PROFILING_ENABLED. With both off
+    no request hooks are registered, so there is no per-request overhead.
+    """
+    if app.config.get("METRICS_ENABLED"):
+        @app.before_request
+        def start_spans():
+            g.metric_spans = _RequestSpans()
+
+        def render_started(sender, template, context, **extra):
+            if has_app_context():
+                g.metric_render_started = time.perf_counter()
+
+        def render_finished(sender, template, context, **extra):
+            spans = g.get("metric_spans")
+            started = g.pop("metric_render_started", None)
+            if spans is not None and started is not None:
+                spans.add("template.render", "", time.perf_counter() - started)
+
+        # strong references: these receivers are closures that would otherwise be collected
+        before_render_template.connect(render_started, app, weak=False)
+        template_rendered.connect(render_finished, app, weak=False)
+
+        @app.teardown_request
+        def record_spans(exc):
+            spans = g.pop("metric_spans", None)
+            if spans is not None and request.endpoint and request.endpoint != "metrics":
+                registry.observe(request.endpoint, time.perf_counter() - spans.started, spans.spans)
+
+        @app.route("/metrics")
+        def metrics():
+            return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    if app.config.get("PROFILING_ENABLED"):
+        @app.before_request
+        def start_profile():
+            mode = request.args.get("profile")
+            if mode == "pyinstrument":
+                try:
+                    from pyinstrument import Profiler
+                except ImportError:
+                    return Response("pyinstrument is not installed\n", status=400, mimetype="text/plain")
+                g.profiler = Profiler()
+                g.profiler.start()
+            elif mode == "1":
+                g.profiler = cProfile.Profile()
+                g.profiler.enable()
+
+        @app.after_request
+        def dump_profile(response):
+            profiler = g.pop("profiler", None)
+            if profiler is None:
+                return response
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+                return Response(out.getvalue(), mimetype="text/plain")
+            profiler.stop()
+            return Response(profiler.output_html(), mimetype="text/html")
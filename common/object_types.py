@@ -0,0 +1,19 @@
+import importlib
+
+from app import BACKEND
+
+# Object types (and their `object_type.<property>` filter expressions) for the
+# configured backend. Use them as `object_types.<Type>` rather than importing
+# from mr_split_sdk so where/order_by clauses work against the local SQLite
+# backend too. They are resolved on first access, so importing a blueprint
+# doesn't import the SDK.
+_MODULE = "local_backend.objects" if BACKEND == "local" else "mr_split_sdk.ontology.objects"
+_NAMES = ("PurchasedItem", "ResponsibilityMapping", "Settlements", "Users")
+
+
+def __getattr__(name):
+    if name not in _NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_MODULE), name)
+    globals()[name] = value
+    return value
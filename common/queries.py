@@ -0,0 +1,144 @@
+import functools
+import operator
+
+from common import object_types as ontology_objects
+from common.records import to_records
+from common.groups import current_group, group_clause
+from app import client
+
+
+# Server-side reads, so page cost scales with what is selected rather than
+# with the whole dataset.
+
+def _any_of(prop, values):
+    return functools.reduce(operator.or_, (prop == v for v in values))
+
+
+def receipt_ids() -> list:
+    """Distinct receipt IDs (of the current ledger group), computed by a group-by aggregation on the ontology."""
+    clause = ~ontology_objects.PurchasedItem.object_type.receipt_id.is_null()
+    group = current_group()
+    if group is not None:
+        clause = clause & group_clause("PurchasedItem", group)
+    result = (
+        client.ontology.objects.PurchasedItem
+        .where(clause)
+        .group_by(ontology_objects.PurchasedItem.object_type.receipt_id.exact())
+        .count()
+        .compute()
+    )
+    return sorted({bucket.group["receipt_id"] for bucket in result.data if bucket.group.get("receipt_id")})
+
+
+def items_for_receipt(receipt_id: str) -> list:
+    return list(
+        client.ontology.objects.PurchasedItem
+        .where(ontology_objects.PurchasedItem.object_type.receipt_id == receipt_id)
+        .iterate()
+    )
+
+
+def get_item(line_id: int):
+    """Fetch a single PurchasedItem by its primary key, or None."""
+    return next(
+        client.ontology.objects.PurchasedItem
+        .where(ontology_objects.PurchasedItem.object_type.line_id == line_id)
+        .iterate(),
+        None
+    )
+
+
+def mappings_for_line(line_id: int) -> list:
+    return list(
+        client.ontology.objects.ResponsibilityMapping
+        .where(ontology_objects.ResponsibilityMapping.object_type.line_id == line_id)
+        .iterate()
+    )
+
+
+# Keeps OR filters to a size every backend accepts
+MAX_FILTER_VALUES = 100
+
+
+def mappings_for_lines(line_ids) -> list:
+    line_ids = list(dict.fromkeys(line_ids))
+    mappings = []
+    for start in range(0, len(line_ids), MAX_FILTER_VALUES):
+        chunk = line_ids[start:start + MAX_FILTER_VALUES]
+        mappings.extend(
+            client.ontology.objects.ResponsibilityMapping
+            .where(_any_of(ontology_objects.ResponsibilityMapping.object_type.line_id, chunk))
+            .iterate()
+        )
+    return mappings
+
+
+def settlements_between(a: int, b: int) -> list:
+    """Settlements in either direction between two users."""
+    st = ontology_objects.Settlements.object_type
+    return list(
+        client.ontology.objects.Settlements
+        .where(((st.from_user_id == a) & (st.to_user_id == b)) | ((st.from_user_id == b) & (st.to_user_id == a)))
+        .iterate()
+    )
+
+
+# ---- filtered, sorted, paged line item listing ----
+
+SORTABLE_ITEM_FIELDS = ("line_id", "receipt_id", "store_name", "purchase_date", "item_name", "price", "paid_by")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def parse_item_query(args) -> dict:
+    """Read listing parameters (filters, sort, page) from request args."""
+    sort = args.get("sort", "line_id")
+    if sort not in SORTABLE_ITEM_FIELDS:
+        sort = "line_id"
+    page_size = args.get("page_size", DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE
+    return {
+        "receipt_id": args.get("receipt_id") or None,
+        "store": args.get("store") or None,
+        "date_from": args.get("date_from") or None,
+        "date_to": args.get("date_to") or None,
+        "paid_by": args.get("paid_by", type=int),
+        "sort": sort,
+        "descending": args.get("order") == "desc",
+        "page_size": max(1, min(page_size, MAX_PAGE_SIZE)),
+        "page_token": args.get("page_token") or None,
+        "group": current_group(),
+    }
+
+
+def _filtered_items(query: dict):
+    props = ontology_objects.PurchasedItem.object_type
+    clauses = []
+    if query["receipt_id"]:
+        clauses.append(props.receipt_id == query["receipt_id"])
+    if query["store"]:
+        clauses.append(props.store_name == query["store"])
+    if query["date_from"]:
+        clauses.append(props.purchase_date >= query["date_from"])
+    if query["date_to"]:
+        clauses.append(props.purchase_date <= query["date_to"])
+    if query["paid_by"] is not None:
+        clauses.append(props.paid_by == query["paid_by"])
+    if query.get("group") is not None:
+        clauses.append(group_clause("PurchasedItem", query["group"]))
+
+    object_set = client.ontology.objects.PurchasedItem
+    if clauses:
+        object_set = object_set.where(functools.reduce(operator.and_, clauses))
+    sort_prop = getattr(props, query["sort"])
+    return object_set.order_by(sort_prop.desc() if query["descending"] else sort_prop.asc())
+
+
+def page_items(query: dict):
+    """One page of matching items plus the token for the next page (None on the last page)."""
+    page = _filtered_items(query).page(page_size=query["page_size"], page_token=query["page_token"])
+    return to_records("PurchasedItem", page.data), page.next_page_token
+
+
+def iter_items(query: dict):
+    """Every matching item, lazily, page by page as the SDK fetches them."""
+    return _filtered_items(query).iterate()
@@ -0,0 +1,97 @@
+import sys
+from decimal import Decimal
+
+
+# Compact in-memory form of ontology objects. Every read that goes through
+# `client` (cached snapshots, filtered iterates, pages) is converted here once,
+# so blueprints share one representation: slotted records with interned
+# repeated strings and prices held as integer cents.
+
+def dollars_to_cents(val) -> int:
+    if val is None: return 0
+    return int((Decimal(str(val)) * 100).quantize(Decimal("1")))
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Record:
+    __slots__ = ()
+
+    @classmethod
+    def from_object(cls, obj):
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, getattr(obj, name, None))
+        return record
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class UserRecord(Record):
+    __slots__ = ("user_id", "full_name", "email")
+
+
+class PurchasedItemRecord(Record):
+    __slots__ = ("line_id", "receipt_id", "store_name", "purchase_date", "item_name", "price_cents", "paid_by")
+
+    @classmethod
+    def from_object(cls, obj):
+        record = cls.__new__(cls)
+        record.line_id = obj.line_id
+        record.receipt_id = _intern(obj.receipt_id)
+        record.store_name = _intern(obj.store_name)
+        record.purchase_date = obj.purchase_date
+        record.item_name = obj.item_name
+        record.price_cents = None if obj.price is None else dollars_to_cents(obj.price)
+        record.paid_by = obj.paid_by
+        return record
+
+    @property
+    def price(self):
+        # dollars, as the SDK reports it
+        return None if self.price_cents is None else self.price_cents / 100
+
+
+class ResponsibilityMappingRecord(Record):
+    __slots__ = ("mapping_id", "line_id", "user_id", "status")
+
+    @classmethod
+    def from_object(cls, obj):
+        record = super().from_object(obj)
+        record.status = _intern(record.status)
+        return record
+
+
+class SettlementRecord(Record):
+    __slots__ = ("settlement_id", "from_user_id", "to_user_id", "amount_cents", "created_at", "note")
+
+
+RECORD_TYPES = {
+    "Users": UserRecord,
+    "PurchasedItem": PurchasedItemRecord,
+    "ResponsibilityMapping": ResponsibilityMappingRecord,
+    "Settlements": SettlementRecord,
+}
+
+
+def to_record(type_name: str, obj):
+    if obj is None or isinstance(obj, Record):
+        return obj
+    record_type = RECORD_TYPES.get(type_name)
+    return record_type.from_object(obj) if record_type else obj
+
+
+def to_records(type_name: str, objects) -> list:
+    record_type = RECORD_TYPES.get(type_name)
+    if record_type is None:
+        return list(objects)
+    return [obj if isinstance(obj, Record) else record_type.from_object(obj) for obj in objects]
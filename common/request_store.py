@@ -0,0 +1,119 @@
+import functools
+import operator
+import threading
+from concurrent.futures import Future
+
+from flask import g, has_app_context, request
+from common import object_types as ontology_objects
+from app import client
+from common.cache import add_call_listener
+from common.groups import current_group, read_group
+from common.queries import MAX_FILTER_VALUES
+
+
+class RequestStore:
+    """
+    Per-request memo of ontology reads, kept on Flask's `g`.
+
+    Identical reads within one request are issued once (concurrent callers wait
+    for the first), point lookups by primary key are batched into one filtered
+    read, and every backend call is counted for the end-of-request log line.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}  # key -> Future
+        self._by_pk = {}    # (type_name, pk_name) -> {pk: obj}
+        self.calls = 0
+        self.objects = 0
+
+    def query(self, key, read):
+        """Run `read()` once per request for a given hashable `key`."""
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+        if owner:
+            try:
+                future.set_result(read())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def all(self, type_name: str) -> list:
+        """Every object of a type, or only the current ledger group's when one is selected."""
+        group = current_group()
+        if group is not None:
+            return self.query(("group", type_name, group), lambda: list(read_group(type_name, group)))
+        return self.query(("all", type_name), lambda: list(getattr(client.ontology.objects, type_name).iterate()))
+
+    def get_many(self, type_name: str, pk_name: str, pks) -> dict:
+        """Objects by primary key; missing keys are fetched together (one read per MAX_FILTER_VALUES keys)."""
+        pks = set(pks)
+        with self._lock:
+            known = self._by_pk.setdefault((type_name, pk_name), {})
+            full = self._results.get(("all", type_name))
+        if full is not None:
+            # The whole object set is already in this request; index it instead of querying.
+            for obj in full.result():
+                known.setdefault(getattr(obj, pk_name, None), obj)
+        missing = [pk for pk in pks if pk not in known]
+        if missing:
+            prop = getattr(getattr(ontology_objects, type_name).object_type, pk_name)
+            fetched = []
+            for start in range(0, len(missing), MAX_FILTER_VALUES):
+                clause = functools.reduce(operator.or_, (prop == pk for pk in missing[start:start + MAX_FILTER_VALUES]))
+                fetched.extend(getattr(client.ontology.objects, type_name).where(clause).iterate())
+            with self._lock:
+                for obj in fetched:
+                    known[getattr(obj, pk_name, None)] = obj
+                for pk in missing:
+                    known.setdefault(pk, None)
+        return {pk: known[pk] for pk in pks if known.get(pk) is not None}
+
+    def get(self, type_name: str, pk_name: str, pk):
+        return self.get_many(type_name, pk_name, [pk]).get(pk)
+
+    def record(self, objects: int):
+        with self._lock:
+            self.calls += 1
+            self.objects += objects
+
+    def invalidate(self):
+        # After a write, later reads in the same request must see fresh data.
+        with self._lock:
+            self._results.clear()
+            self._by_pk.clear()
+
+
+def get_store() -> RequestStore:
+    if "ontology_store" not in g:
+        g.ontology_store = RequestStore()
+    return g.ontology_store
+
+
+def _on_backend_call(kind, type_name, objects, seconds):
+    if not has_app_context():
+        return
+    store = get_store()
+    store.record(objects if kind == "read" else 0)
+    if kind == "action":
+        store.invalidate()
+
+
+add_call_listener(_on_backend_call)
+
+
+def init_app(app):
+    @app.before_request
+    def create_ontology_store():
+        # Created up front so concurrent reads in loader threads share one store.
+        g.ontology_store = RequestStore()
+
+    @app.teardown_request
+    def log_ontology_calls(exc):
+        store = g.get("ontology_store")
+        if store is not None:
+            app.logger.info("%s %s: %d ontology calls, %d objects transferred",
+                            request.method, request.path, store.calls, store.objects)
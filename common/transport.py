@@ -0,0 +1,176 @@
+import importlib.util
+import inspect
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+
+# Read-path resilience for the ontology client: bounded retries with jittered
+# backoff on transient failures, and single-flight coalescing so identical reads
+# in flight on several threads share one backend call. Writes are never retried
+# (actions aren't idempotent).
+
+log = logging.getLogger(__name__)
+
+TRANSIENT_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Looked up once: is_transient runs on every failed read. httpx itself is only
+# imported once it's needed, to keep it out of worker startup.
+HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+
+class TransportSettings:
+    def __init__(self, retries: int = 3, backoff_base: float = 0.1, backoff_max: float = 2.0,
+                 coalesce: bool = True, pool_connections: int = 32, pool_keepalive: int = 16,
+                 keepalive_expiry: float = 30.0, http2: bool = True):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.coalesce = coalesce
+        self.pool_connections = pool_connections
+        self.pool_keepalive = pool_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            retries=int(os.environ.get("MR_SPLIT_HTTP_RETRIES", "3")),
+            backoff_base=float(os.environ.get("MR_SPLIT_HTTP_BACKOFF", "0.1")),
+            backoff_max=float(os.environ.get("MR_SPLIT_HTTP_BACKOFF_MAX", "2")),
+            coalesce=os.environ.get("MR_SPLIT_COALESCE_READS", "1") == "1",
+            pool_connections=int(os.environ.get("MR_SPLIT_HTTP_POOL", "32")),
+            pool_keepalive=int(os.environ.get("MR_SPLIT_HTTP_KEEPALIVE", "16")),
+            keepalive_expiry=float(os.environ.get("MR_SPLIT_HTTP_KEEPALIVE_EXPIRY", "30")),
+            http2=os.environ.get("MR_SPLIT_HTTP2", "1") == "1",
+        )
+
+
+def is_transient(exc) -> bool:
+    """Connection resets, timeouts and retryable HTTP statuses."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if HAS_HTTPX:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    return status in TRANSIENT_STATUS
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class Transport:
+    def __init__(self, settings: TransportSettings = None, sleep=time.sleep):
+        self.settings = settings or TransportSettings()
+        self._sleep = sleep
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.retries = 0
+
+    def _delays(self):
+        # "full jitter": uniform in [0, min(max, base * 2^attempt)]
+        s = self.settings
+        for attempt in range(s.retries):
+            yield random.uniform(0, min(s.backoff_max, s.backoff_base * 2 ** attempt))
+
+    def _backoff(self, delays, exc):
+        """Sleep before the next attempt, or return False when `exc` should propagate."""
+        delay = next(delays, None)
+        if delay is None or not is_transient(exc):
+            return False
+        with self._lock:
+            self.retries += 1
+        log.warning("transient ontology read failure (%s), retrying in %.2fs", exc, delay)
+        self._sleep(delay)
+        return True
+
+    def call(self, fn):
+        delays = self._delays()
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not self._backoff(delays, e):
+                    raise
+
+    def read(self, key, fn):
+        """`fn()` with retries; with a key, identical concurrent reads are coalesced."""
+        if key is None or not self.settings.coalesce:
+            return self.call(fn)
+        return self._flights.do(key, lambda: self.call(fn))
+
+    def iterate(self, make_iterator):
+        """Stream `make_iterator()`, retrying only while nothing has been yielded yet."""
+        delays = self._delays()
+        while True:
+            started = False
+            try:
+                for obj in make_iterator():
+                    started = True
+                    yield obj
+                return
+            except Exception as e:
+                if started or not self._backoff(delays, e):
+                    raise
+
+    def stats(self) -> dict:
+        return {"retries": self.retries, "coalesced_reads": self._flights.shared}
+
+
+def http_client(settings: TransportSettings):
+    """A pooled keep-alive httpx client (HTTP/2 when the `h2` package is installed)."""
+    import httpx
+    http2 = settings.http2 and importlib.util.find_spec("h2") is not None
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.pool_connections,
+            max_keepalive_connections=settings.pool_keepalive,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+    )
+
+
+def client_kwargs(client_class, settings: TransportSettings) -> dict:
+    """Extra constructor arguments that hand `client_class` our pooled HTTP client, if it takes one."""
+    try:
+        accepts = "http_client" in inspect.signature(client_class).parameters
+    except (TypeError, ValueError):
+        accepts = False
+    if not accepts or not HAS_HTTPX:
+        log.info("%s manages its own HTTP pool; transport pool settings not applied", client_class.__name__)
+        return {}
+    return {"http_client": http_client(settings)}
@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+from common.ids import _Transaction
+from common.transport import is_transient
+
+
+# Durable queue for ontology writes. A route validates an edit, appends it to a
+# SQLite file and returns right away; a background thread applies the queue in
+# order, in batches, with retries. Edits with the same key (e.g. one line's
+# assignment) replace each other while they wait, so only the last one is sent.
+# The file is shared by every worker on the box, and only one of them flushes
+# at a time, so the order entries were accepted in is the order they are applied.
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WRITE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "writes.sqlite3")
+
+
+class _Handler:
+    __slots__ = ("apply", "merge", "batch_size")
+
+    def __init__(self, apply, merge, batch_size):
+        self.apply = apply
+        self.merge = merge
+        self.batch_size = batch_size
+
+
+class WriteQueue:
+    def __init__(self, path: str = DEFAULT_WRITE_DB, batch_size: int = 200, interval: float = 1.0,
+                 max_attempts: int = 8, backoff_base: float = 1.0, backoff_max: float = 60.0, lease: float = 300.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease  # an in-flight batch older than this is assumed lost with its worker
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._pid = None
+        self.counts = {"enqueued": 0, "coalesced": 0, "applied": 0, "retried": 0, "failed": 0}
+
+    def register(self, kind: str, apply, merge=None, batch_size: int = None):
+        """
+        `apply(payloads)` writes a batch of payloads of one kind (oldest first) and
+        raises to have them retried. `merge(old, new)` combines two waiting edits
+        with the same key; by default the newer one wins.
+        """
+        self._handlers[kind] = _Handler(apply, merge, batch_size or self.batch_size)
+
+    def submit(self, kind: str, payload: dict, key=None):
+        """
+        Queue `payload`, or apply it before returning when the queue is disabled
+        (WRITE_QUEUE = False). Returns True when it was queued.
+        """
+        return self.submit_many(kind, [(key, payload)])
+
+    def submit_many(self, kind: str, entries) -> bool:
+        """`submit` for several (key, payload) pairs, queued together or applied as one batch."""
+        entries = list(entries)
+        if not entries:
+            return False
+        app = current_app._get_current_object()
+        if not app.config.get("WRITE_QUEUE", True):
+            self._handlers[kind].apply([payload for _, payload in entries])
+            return False
+        self.enqueue(kind, entries)
+        self._ensure_worker(app)
+        self._wake.set()
+        return True
+
+    def enqueue(self, kind: str, entries):
+        handler = self._handlers[kind]
+        coalesced = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for key, payload in entries:
+                key = None if key is None else str(key)
+                if key is not None:
+                    # waiting (or failed) edits for the same key are superseded; in-flight ones are left alone
+                    for seq, old in conn.execute(
+                            "SELECT seq, payload FROM pending_writes WHERE kind = ? AND key = ? "
+                            "AND state IN ('pending', 'failed') ORDER BY seq", (kind, key)).fetchall():
+                        if handler.merge is not None:
+                            payload = handler.merge(json.loads(old), payload)
+                        conn.execute("DELETE FROM pending_writes WHERE seq = ?", (seq,))
+                        coalesced += 1
+                conn.execute("INSERT INTO pending_writes (kind, key, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                             (kind, key, json.dumps(payload), time.time()))
+        with self._lock:
+            self.counts["enqueued"] += len(entries)
+            self.counts["coalesced"] += coalesced
+
+    def status(self, kind: str = None, keys=None) -> dict:
+        """
+        Counts of waiting and failed entries, and the state of each given key
+        ("pending", "inflight" or "failed"). Keys that aren't listed have been written.
+        """
+        where, params = "", []
+        if kind is not None:
+            where, params = "WHERE kind = ?", [kind]
+        with self._connect() as conn:
+            counts = dict(conn.execute(f"SELECT state, COUNT(*) FROM pending_writes {where} GROUP BY state", params))
+            oldest = conn.execute(f"SELECT MIN(enqueued_at) FROM pending_writes {where}", params).fetchone()[0]
+            entries = {}
+            keys = [str(k) for k in keys or ()]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, state, attempts, error FROM pending_writes "
+                    f"WHERE {'kind = ? AND ' if kind is not None else ''}key IN ({','.join('?' * len(chunk))}) ORDER BY seq",
+                    params + chunk)
+                for key, state, attempts, error in rows:
+                    # the latest entry for a key decides its state
+                    entries[key] = {"state": state, "attempts": attempts, "error": error}
+        return {
+            "pending": counts.get("pending", 0) + counts.get("inflight", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "entries": entries,
+        }
+
+    def payloads(self, kind: str) -> list:
+        """Payloads of a kind that are still waiting to be written (pending or in flight), oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT payload FROM pending_writes WHERE kind = ? AND state != 'failed' "
+                                "ORDER BY seq", (kind,)).fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def retry_failed(self, kind: str) -> int:
+        """Put failed entries of a kind back in the queue, at their original positions."""
+        with self._connect() as conn:
+            count = conn.execute("UPDATE pending_writes SET state = 'pending', attempts = 0, not_before = 0 "
+                                 "WHERE kind = ? AND state = 'failed'", (kind,)).rowcount
+        self._wake.set()
+        return count
+
+    def discard_failed(self, kind: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM pending_writes WHERE kind = ? AND state = 'failed'", (kind,)).rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def drain(self, app=None):
+        """Apply everything that is due now; returns the number of entries written."""
+        app = app or self._app
+        applied = 0
+        while True:
+            batch = self._claim()
+            if not batch:
+                return applied
+            with app.app_context():
+                applied += self._apply(batch)
+
+    def _claim(self) -> list:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # entries claimed by a worker that died are put back
+            conn.execute("UPDATE pending_writes SET state = 'pending' WHERE state = 'inflight' AND claimed_at < ?",
+                         (now - self.lease,))
+            if conn.execute("SELECT 1 FROM pending_writes WHERE state = 'inflight' LIMIT 1").fetchone():
+                return []  # another worker is flushing; the next round picks up after it
+            kinds = list(self._handlers)
+            if not kinds:
+                return []
+            # Kinds this build has no handler for (written by a newer build) are
+            # skipped and left for a worker that has one; if none has picked them
+            # up within a lease, they are failed so they show up as such.
+            known = f"kind IN ({', '.join('?' * len(kinds))})"
+            conn.execute(f"UPDATE pending_writes SET state = 'failed', error = ? "
+                         f"WHERE state = 'pending' AND NOT {known} AND enqueued_at < ?",
+                         ["no handler for this kind of write", *kinds, now - self.lease])
+            head = conn.execute(f"SELECT kind, not_before FROM pending_writes WHERE state = 'pending' AND {known} "
+                                f"ORDER BY seq LIMIT 1", kinds).fetchone()
+            if head is None or head[1] > now:
+                return []  # nothing waiting, or the oldest entry is backing off (later ones wait for it)
+            kind = head[0]
+            handler = self._handlers[kind]
+            batch = []
+            for seq, row_kind, payload, attempts, not_before in conn.execute(
+                    f"SELECT seq, kind, payload, attempts, not_before FROM pending_writes "
+                    f"WHERE state = 'pending' AND {known} ORDER BY seq LIMIT ?", [*kinds, handler.batch_size]):
+                if row_kind != kind or not_before > now:
+                    break
+                batch.append((seq, kind, json.loads(payload), attempts))
+            conn.executemany("UPDATE pending_writes SET state = 'inflight', claimed_at = ? WHERE seq = ?",
+                             [(now, seq) for seq, *_ in batch])
+        return batch
+
+    def _apply(self, batch) -> int:
+        handler = self._handlers[batch[0][1]]
+        try:
+            handler.apply([payload for _, _, payload, _ in batch])
+        except Exception as e:
+            if len(batch) > 1 and not is_transient(e):
+                # one bad entry shouldn't hold back the rest of the batch: retry them one at a time
+                return sum(self._apply([entry]) for entry in batch)
+            self._retry_or_fail(batch, e)
+            return 0
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM pending_writes WHERE seq = ?", [(seq,) for seq, *_ in batch])
+        with self._lock:
+            self.counts["applied"] += len(batch)
+        return len(batch)
+
+    def _retry_or_fail(self, batch, exc):
+        attempts = max(a for *_, a in batch) + 1
+        error = f"{type(exc).__name__}: {exc}"
+        with self._connect() as conn:
+            if is_transient(exc) and attempts < self.max_attempts:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempts))
+                log.warning("queued %s write failed (%s), retrying in %.1fs", batch[0][1], error, delay)
+                conn.executemany(
+                    "UPDATE pending_writes SET state = 'pending', attempts = ?, not_before = ?, error = ? WHERE seq = ?",
+                    [(attempts, time.time() + delay, error, seq) for seq, *_ in batch])
+                counter = "retried"
+            else:
+                log.error("queued %s write failed permanently: %s", batch[0][1], error)
+                conn.executemany("UPDATE pending_writes SET state = 'failed', attempts = ?, error = ? WHERE seq = ?",
+                                 [(attempts, error, seq) for seq, *_ in batch])
+                counter = "failed"
+        with self._lock:
+            self.counts[counter] += len(batch)
+
+    def _ensure_worker(self, app):
+        # started lazily, once per process, so forked workers each get their own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._app = app
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="write-queue", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception:
+                self._app.logger.exception("write queue flush failed")
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS pending_writes ("
+                     "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT, payload TEXT NOT NULL, "
+                     "state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                     "not_before REAL NOT NULL DEFAULT 0, claimed_at REAL, error TEXT, enqueued_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS pending_writes_key ON pending_writes (kind, key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS pending_writes_state ON pending_writes (state, seq)")
+        return _Transaction(conn)
+
+
+write_queue = WriteQueue(
+    path=os.environ.get("MR_SPLIT_WRITE_DB", DEFAULT_WRITE_DB),
+    batch_size=int(os.environ.get("MR_SPLIT_WRITE_BATCH", "200")),
+    max_attempts=int(os.environ.get("MR_SPLIT_WRITE_RETRIES", "8")),
+)
+
+
+def init_app(app):
+    # Entries left over from a previous run are flushed once the app serves a request
+    @app.before_request
+    def start_write_queue():
+        if app.config.get("WRITE_QUEUE", True):
+            write_queue._ensure_worker(app)
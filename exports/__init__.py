@@ -0,0 +1 @@
+#empty... makes the exports folder a package.
\ No newline at end of file
@@ -0,0 +1,66 @@
+from flask import Blueprint, Response, request, stream_with_context, jsonify
+from balances.history import load_history, parse_window
+from balances.snapshots import current_summary
+from common import queries
+from .utils import (FORMATS, WRITERS, LINE_ITEM_COLUMNS, SETTLEMENT_COLUMNS, UNPAID_SHARE_COLUMNS,
+                    BALANCE_COLUMNS, line_item_rows, settlement_rows)
+
+exports_bp = Blueprint('exports', __name__, url_prefix='/exports')
+
+
+def _stream(name, fmt, columns, rows):
+    # stream_with_context keeps `g` (ledger group, request store) alive while rows are produced
+    body = stream_with_context(WRITERS[fmt](columns, rows))
+    return Response(body, mimetype=FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'})
+
+
+def _unknown_format(fmt):
+    return jsonify({"status": "error", "message": f"format must be one of: {', '.join(FORMATS)}"}), 404
+
+
+@exports_bp.route("/line-items.<fmt>", methods=["GET"])
+def export_line_items(fmt):
+    if fmt not in FORMATS:
+        return _unknown_format(fmt)
+    query = queries.parse_item_query(request.args)
+    return _stream("line_items", fmt, LINE_ITEM_COLUMNS, line_item_rows(query))
+
+
+@exports_bp.route("/settlements.<fmt>", methods=["GET"])
+def export_settlements(fmt):
+    if fmt not in FORMATS:
+        return _unknown_format(fmt)
+    return _stream("settlements", fmt, SETTLEMENT_COLUMNS, settlement_rows())
+
+
+@exports_bp.route("/unpaid-shares.<fmt>", methods=["GET"])
+def export_unpaid_shares(fmt):
+    if fmt not in FORMATS:
+        return _unknown_format(fmt)
+    # the rows of the balances table, from the current snapshot when enabled
+    summary, _ = current_summary()
+    return _stream("unpaid_shares", fmt, UNPAID_SHARE_COLUMNS, iter(summary["mappings"]))
+
+
+@exports_bp.route("/balances.<fmt>", methods=["GET"])
+def export_balances(fmt):
+    """Pairwise balances, all time or for ?as_of= / ?from=&to= like /balances/api."""
+    if fmt not in FORMATS:
+        return _unknown_format(fmt)
+    try:
+        window = parse_window(request.args)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must be YYYY-MM-DD, with 'from' before 'to'."}), 400
+
+    if window is None:
+        summary, _ = current_summary()
+        rows = summary["pairwise"]
+    else:
+        data, history = load_history()
+        names = {u.user_id: u.full_name for u in data.users}
+        pairwise, _, _ = history.balances(*window)
+        rows = [{"from_id": frm, "to_id": to, "from": names.get(frm, f"User ID {frm}"),
+                 "to": names.get(to, f"User ID {to}"), "amount_cents": amt}
+                for frm, to, amt in pairwise]
+    return _stream("balances", fmt, BALANCE_COLUMNS, iter(rows))
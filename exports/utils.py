@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+
+from app import client
+from common import queries
+from common.groups import current_group, group_clause
+from common import object_types as ontology_objects
+
+# Rows are written out in small chunks so the first bytes go out right away
+# and nothing but the current chunk is held in memory.
+ROWS_PER_CHUNK = 100
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Column order matches raw_data/, so line item and settlement exports can be re-imported.
+LINE_ITEM_COLUMNS = ("line_id", "receipt_id", "store_name", "purchase_date", "item_name", "price", "paid_by")
+SETTLEMENT_COLUMNS = ("settlement_id", "from_user_id", "to_user_id", "amount_cents", "created_at", "note")
+UNPAID_SHARE_COLUMNS = ("line_id", "receipt_id", "item_name", "share", "remaining", "user_name", "status", "paid_by")
+BALANCE_COLUMNS = ("from_id", "to_id", "from", "to", "amount_cents")
+
+
+def _cell(value):
+    return "" if value is None else value
+
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_cell(row.get(col)) for col in columns])
+        if n % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(columns, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({col: row.get(col) for col in columns}, default=str))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+WRITERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+}
+
+
+def line_item_rows(query):
+    """Line items straight from paged ontology iteration (same filters as the listing)."""
+    for item in queries.iter_items(query):
+        yield {
+            "line_id": item.line_id,
+            "receipt_id": item.receipt_id,
+            "store_name": item.store_name,
+            "purchase_date": item.purchase_date,
+            "item_name": item.item_name,
+            "price": None if item.price is None else f"{item.price:.2f}",
+            "paid_by": item.paid_by,
+        }
+
+
+def settlement_rows():
+    """Settlements oldest first, streamed page by page."""
+    object_set = client.ontology.objects.Settlements
+    group = current_group()
+    if group is not None:
+        object_set = object_set.where(group_clause("Settlements", group))
+    for s in object_set.order_by(ontology_objects.Settlements.object_type.created_at.asc()).iterate():
+        yield {col: getattr(s, col, None) for col in SETTLEMENT_COLUMNS}
@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify
 from app import client
+from common.write_queue import write_queue
 
 
 home_bp = Blueprint('home', __name__, url_prefix='')
 
 @home_bp.route("/")
 def home():
-    return render_template("home.html")
\ No newline at end of file
+    return render_template("home.html")
+
+@home_bp.route("/cache-stats")
+def cache_stats():
+    return jsonify({**client.cache.stats(), "transport": client.transport.stats(), "write_queue": write_queue.stats()})
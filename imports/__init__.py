@@ -0,0 +1 @@
+#empty... makes the imports folder a package.
\ No newline at end of file
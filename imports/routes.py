@@ -0,0 +1,61 @@
+import io
+
+import click
+from flask import Blueprint, request, jsonify
+from .utils import KINDS, DEFAULT_CHUNK_SIZE, import_csv, kind_from_filename
+
+imports_bp = Blueprint('imports', __name__, url_prefix='/imports', cli_group='imports')
+
+@imports_bp.route("/upload", methods=["POST"])
+def upload_csv():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"status": "error", "message": "a CSV file is required"}), 400
+
+    kind = request.form.get("kind") or kind_from_filename(upload.filename)
+    if kind not in KINDS:
+        return jsonify({"status": "error",
+                        "message": f"kind must be one of: {', '.join(KINDS)}"}), 400
+
+    chunk_size = request.form.get("chunk_size", DEFAULT_CHUNK_SIZE, type=int)
+    if chunk_size < 1:
+        return jsonify({"status": "error", "message": "chunk_size must be at least 1"}), 400
+
+    # Werkzeug spools large uploads to disk; read it back as a text stream row by row.
+    text_stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    try:
+        report = import_csv(kind, text_stream, chunk_size=chunk_size)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Import failed: {e}"}), 500
+
+    return jsonify({"status": "success", "report": report})
+
+
+@imports_bp.cli.command("csv")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--kind", type=click.Choice(list(KINDS)), help="Override the kind inferred from the file name.")
+@click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True, type=click.IntRange(min=1),
+              help="Rows per batch action.")
+def import_csv_command(paths, kind, chunk_size):
+    """Import raw_data-style CSV files, e.g. `flask --app app imports csv raw_data/*.csv`."""
+    jobs = []
+    for path in paths:
+        path_kind = kind or kind_from_filename(path)
+        if path_kind is None:
+            raise click.BadParameter(f"can't tell what {path} contains; pass --kind", param_hint="paths")
+        jobs.append((list(KINDS).index(path_kind), path_kind, path))
+
+    # users and line items first, so mappings and settlements reference existing objects
+    for _, path_kind, path in sorted(jobs):
+        def progress(report):
+            click.echo(f"  {path_kind}: {report['imported']} rows in {report['chunks']} batches "
+                       f"({report['rows_per_s']:.0f} rows/s)")
+
+        click.echo(f"Importing {path} as {path_kind}...")
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            report = import_csv(path_kind, f, chunk_size=chunk_size, progress=progress)
+        click.echo(f"Done: {report['imported']} imported, {report['rejected']} rejected "
+                   f"out of {report['rows']} rows in {report['elapsed_s']:.2f}s "
+                   f"({report['rows_per_s']:.0f} rows/s)")
+        for err in report["errors"]:
+            click.echo(f"  {err}", err=True)
@@ -0,0 +1,195 @@
+import csv
+import os
+import time
+from datetime import date
+from decimal import InvalidOperation
+
+from app import client
+from annotate.utils import _next_mapping_id_from_ontology
+from balances.utils import _next_settlement_id_from_ontology, dollars_to_cents
+from common import action_types
+from common.ids import id_allocator
+from line_items.utils import _next_line_id_from_ontology
+from users.utils import _next_user_id_from_ontology
+
+DEFAULT_CHUNK_SIZE = 200
+MAX_REPORTED_ERRORS = 50
+
+
+def _int(row, field, required=True):
+    val = (row.get(field) or "").strip()
+    if not val:
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    try:
+        return int(val)
+    except ValueError:
+        raise ValueError(f"{field} must be an integer, got {val!r}")
+
+
+def _text(row, field):
+    val = (row.get(field) or "").strip()
+    if not val:
+        raise ValueError(f"{field} is required")
+    return val
+
+
+def _date(row, field):
+    val = _text(row, field)
+    try:
+        return date.fromisoformat(val)
+    except ValueError:
+        raise ValueError(f"{field} must be YYYY-MM-DD, got {val!r}")
+
+
+def _parse_user(row):
+    return {
+        "user_id": _int(row, "user_id", required=False),
+        "full_name": _text(row, "full_name"),
+        "email": _text(row, "email"),
+    }
+
+
+def _parse_purchased_item(row):
+    try:
+        price_cents = dollars_to_cents(_text(row, "price"))
+    except InvalidOperation:
+        raise ValueError(f"price must be a number, got {row.get('price')!r}")
+    if price_cents < 0:
+        raise ValueError("price must not be negative")
+    return {
+        "line_id": _int(row, "line_id", required=False),
+        "receipt_id": _text(row, "receipt_id"),
+        "store_name": _text(row, "store_name"),
+        "purchase_date": _date(row, "purchase_date").isoformat(),
+        "item_name": _text(row, "item_name"),
+        "price": price_cents / 100,  # dollars, validated to whole cents
+        "paid_by": _int(row, "paid_by"),
+    }
+
+
+def _parse_responsibility_mapping(row):
+    status = (row.get("status") or "unpaid").strip().lower()
+    if status not in ("paid", "unpaid"):
+        raise ValueError(f"status must be 'paid' or 'unpaid', got {status!r}")
+    return {
+        "mapping_id": _int(row, "mapping_id", required=False),
+        "line_id": _int(row, "line_id"),
+        "user_id": _int(row, "user_id"),
+        "status": status,
+    }
+
+
+def _parse_settlement(row):
+    amount_cents = _int(row, "amount_cents")
+    if amount_cents <= 0:
+        raise ValueError("amount_cents must be positive")
+    return {
+        "settlement_id": _int(row, "settlement_id", required=False),
+        "from_user_id": _int(row, "from_user_id"),
+        "to_user_id": _int(row, "to_user_id"),
+        "amount_cents": amount_cents,
+        "created_at": _date(row, "created_at"),
+        "note": (row.get("note") or "").strip(),
+    }
+
+
+# kind -> (object type, primary key, row parser, batch action, batch request type
+# in common.action_types (looked up when an import runs), ID seed)
+# Listed in dependency order: mappings reference users and lines.
+KINDS = {
+    "users": ("Users", "user_id", _parse_user, "create_users", "CreateUsersBatchRequest",
+              _next_user_id_from_ontology),
+    "purchased_item": ("PurchasedItem", "line_id", _parse_purchased_item,
+                       "create_purchased_item", "CreatePurchasedItemBatchRequest", _next_line_id_from_ontology),
+    "responsibility_mapping": ("ResponsibilityMapping", "mapping_id", _parse_responsibility_mapping,
+                               "create_responsibility_mapping", "CreateResponsibilityMappingBatchRequest",
+                               _next_mapping_id_from_ontology),
+    "settlements": ("Settlements", "settlement_id", _parse_settlement,
+                    "create_settlements", "CreateSettlementsBatchRequest", _next_settlement_id_from_ontology),
+}
+
+
+def kind_from_filename(filename: str):
+    stem = os.path.splitext(os.path.basename(filename or ""))[0].lower()
+    return stem if stem in KINDS else None
+
+
+def iter_rows(text_stream):
+    """Yield (line_number, row) pairs from a CSV text stream without loading it all."""
+    reader = csv.DictReader(text_stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def import_csv(kind: str, text_stream, chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None) -> dict:
+    """
+    Stream one CSV export into the ontology.
+
+    Rows are parsed and validated one at a time, missing primary keys are taken
+    from the ID allocator, and valid rows are submitted as fixed-size batch
+    actions, so memory stays bounded by `chunk_size`. A chunk the ontology
+    refuses is counted as rejected and the import carries on with the next one.
+    `progress(report)` is called after every submitted chunk.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown import kind {kind!r}; expected one of {', '.join(KINDS)}")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    object_type, pk, parse, action_name, request_type_name, seed = KINDS[kind]
+    request_type = getattr(action_types, request_type_name)
+    batch_action = getattr(client.ontology.batch_actions, action_name)
+
+    started = time.monotonic()
+    report = {"kind": kind, "rows": 0, "imported": 0, "rejected": 0, "chunks": 0,
+              "errors": [], "elapsed_s": 0.0, "rows_per_s": 0.0}
+
+    def flush(chunk, lines):
+        explicit = [fields[pk] for fields in chunk if fields[pk] is not None]
+        if explicit:
+            id_allocator.reserve_through(object_type, max(explicit), seed=seed)
+        missing = [fields for fields in chunk if fields[pk] is None]
+        for fields, new_id in zip(missing, id_allocator.allocate(object_type, len(missing), seed=seed)):
+            fields[pk] = new_id
+
+        try:
+            response = batch_action(
+                batch_action_config=action_types.BatchActionConfig(return_edits=action_types.ReturnEditsMode.NONE),
+                requests=[request_type(**fields) for fields in chunk]
+            )
+            validation = getattr(getattr(response, "validation", None), "result", "VALID")
+            if validation != "VALID":
+                raise ValueError(f"batch validation {validation}")
+        except Exception as e:
+            report["rejected"] += len(chunk)
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append(f"lines {lines[0]}-{lines[-1]}: {e}")
+        else:
+            report["imported"] += len(chunk)
+        report["chunks"] += 1
+        report["elapsed_s"] = time.monotonic() - started
+        report["rows_per_s"] = report["rows"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+        if progress:
+            progress(report)
+
+    chunk, lines = [], []
+    for line_num, row in iter_rows(text_stream):
+        report["rows"] += 1
+        try:
+            chunk.append(parse(row))
+        except ValueError as e:
+            report["rejected"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append(f"line {line_num}: {e}")
+            continue
+        lines.append(line_num)
+        if len(chunk) >= chunk_size:
+            flush(chunk, lines)
+            chunk, lines = [], []
+    if chunk:
+        flush(chunk, lines)
+
+    report["elapsed_s"] = time.monotonic() - started
+    report["rows_per_s"] = report["rows"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    return report
@@ -1,31 +1,28 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, stream_template, request, redirect, url_for, flash, abort
 from app import client
 from .utils import new_line_id
-from foundry_sdk_runtime.types import (
-    ActionConfig,
-    ActionMode,
-    ReturnEditsMode,
-    SyncApplyActionResponse
-)
+from common import action_types, queries
 
 line_items_bp = Blueprint('line_items', __name__, url_prefix='/line-items')
 
 @line_items_bp.route("/", methods=["GET"])
 def list_line_items():
-    items_iter = client.ontology.objects.PurchasedItem.iterate()
-    items = list(items_iter)
+    query = queries.parse_item_query(request.args)
+    filters = {k: v for k, v in request.args.items() if k not in ("page_token", "stream")}
 
-    items_dicts = [{
-        "line_id": item.line_id,
-        "receipt_id": item.receipt_id,
-        "store_name": item.store_name,
-        "purchase_date": item.purchase_date,
-        "item_name": item.item_name,
-        "price": item.price,  # price in dollars
-        "paid_by": item.paid_by
-    } for item in items]
+    if request.args.get("stream") == "1":
+        # Render rows as they arrive from the ontology; nothing is held in memory.
+        items = queries.iter_items(query)
+        return stream_template("line_items.html", items=items, filters=filters, next_url=None)
 
-    return render_template("line_items.html", items=items_dicts)
+    try:
+        items, next_token = queries.page_items(query)
+    except ValueError:
+        abort(400, "Invalid page_token")
+    next_url = url_for("line_items.list_line_items", **filters, page_token=next_token) if next_token else None
+
+    return render_template("line_items.html", items=items,
+                           filters=filters, next_url=next_url)
 
 @line_items_bp.route("/add", methods=["POST"])
 def add_line_item():
@@ -55,10 +52,10 @@ def add_line_item():
         return redirect(url_for("line_items.list_line_items"))
 
     # Create in ontology
-    response: SyncApplyActionResponse = client.ontology.actions.create_purchased_item(
-        action_config=ActionConfig(
-            mode=ActionMode.VALIDATE_AND_EXECUTE,
-            return_edits=ReturnEditsMode.ALL
+    response: action_types.SyncApplyActionResponse = client.ontology.actions.create_purchased_item(
+        action_config=action_types.ActionConfig(
+            mode=action_types.ActionMode.VALIDATE_AND_EXECUTE,
+            return_edits=action_types.ReturnEditsMode.ALL
         ),
         line_id=new_line_id(),
         receipt_id=receipt_id_str,
@@ -89,10 +86,10 @@ def delete_line_item():
         flash("Line ID must be an integer.", "error")
         return redirect(url_for("line_items.list_line_items"))
 
-    response: SyncApplyActionResponse = client.ontology.actions.delete_purchased_item(
-        action_config=ActionConfig(
-            mode=ActionMode.VALIDATE_AND_EXECUTE,
-            return_edits=ReturnEditsMode.ALL
+    response: action_types.SyncApplyActionResponse = client.ontology.actions.delete_purchased_item(
+        action_config=action_types.ActionConfig(
+            mode=action_types.ActionMode.VALIDATE_AND_EXECUTE,
+            return_edits=action_types.ReturnEditsMode.ALL
         ),
         purchased_item= line_id_int
     )
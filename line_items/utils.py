@@ -1,14 +1,15 @@
-from mr_split_sdk.ontology.objects import PurchasedItem
+from common import object_types as ontology_objects
 from app import client
+from common.ids import id_allocator
 
-def new_line_id() -> int:
+def _next_line_id_from_ontology() -> int:
     """
     Returns the next available line_id (int) by checking the current max.
     """
     highest_item = next(
         client.ontology.objects.PurchasedItem
-        .where(~PurchasedItem.object_type.item_name.is_null())
-        .order_by(PurchasedItem.object_type.line_id.desc())
+        .where(~ontology_objects.PurchasedItem.object_type.item_name.is_null())
+        .order_by(ontology_objects.PurchasedItem.object_type.line_id.desc())
         .iterate(),
         None
     )
@@ -17,3 +18,9 @@ def new_line_id() -> int:
         return 1
 
     return highest_item.line_id + 1
+
+def new_line_id() -> int:
+    """
+    Returns an unused line_id from the locally leased block (no round trip).
+    """
+    return id_allocator.allocate("PurchasedItem", seed=_next_line_id_from_ontology)[0]
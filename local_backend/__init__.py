@@ -0,0 +1 @@
+#empty... makes the local_backend folder a package.
\ No newline at end of file
@@ -0,0 +1,49 @@
+from enum import Enum
+from types import SimpleNamespace
+
+from .objects import ACTION_TARGETS
+
+
+# Stand-ins for the SDK's action configs and batch request types, so writes run
+# against the local backend without the SDK installed. The local client reads
+# requests by attribute, as it does the SDK's request models, and ignores the
+# configs (every action is validated and executed in one transaction).
+
+class ActionMode(str, Enum):
+    VALIDATE_ONLY = "VALIDATE_ONLY"
+    VALIDATE_AND_EXECUTE = "VALIDATE_AND_EXECUTE"
+
+
+class ReturnEditsMode(str, Enum):
+    ALL = "ALL"
+    NONE = "NONE"
+
+
+class ActionConfig(SimpleNamespace):
+    def __init__(self, mode=ActionMode.VALIDATE_AND_EXECUTE, return_edits=ReturnEditsMode.NONE):
+        super().__init__(mode=mode, return_edits=return_edits)
+
+
+class BatchActionConfig(SimpleNamespace):
+    def __init__(self, return_edits=ReturnEditsMode.NONE):
+        super().__init__(return_edits=return_edits)
+
+
+# what actions return: .validation.result and .edits
+SyncApplyActionResponse = SimpleNamespace
+
+
+class BatchRequest(SimpleNamespace):
+    """One entry of a batch action; its fields are the action's parameters."""
+
+
+def _type_name(suffix: str) -> str:
+    # responsibility_mapping -> ResponsibilityMapping
+    return "".join(part.capitalize() for part in suffix.split("_"))
+
+
+# CreateUsersBatchRequest, EditResponsibilityMappingBatchRequest, DeleteSettlementsBatchRequest, ...
+for _suffix in ACTION_TARGETS:
+    for _verb in ("Create", "Edit", "Delete"):
+        _name = f"{_verb}{_type_name(_suffix)}BatchRequest"
+        globals()[_name] = type(_name, (BatchRequest,), {"__module__": __name__})
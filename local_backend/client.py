@@ -0,0 +1,256 @@
+import csv
+import os
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+from .objects import ACTION_TARGETS, OBJECT_TYPES, Clause
+
+_SQL_TYPES = {"int": "INTEGER", "float": "REAL", "text": "TEXT", "date": "TEXT"}
+_FETCH_SIZE = 1000
+_VALID = SimpleNamespace(validation=SimpleNamespace(result="VALID"), edits=None)
+_INVALID = SimpleNamespace(validation=SimpleNamespace(result="INVALID"), edits=None)
+
+
+class ActionValidationError(ValueError):
+    """A batch action the backend refused; nothing in the batch was applied (the SDK raises too)."""
+
+
+class LocalClient:
+    """
+    SQLite stand-in for `mr_split_sdk.FoundryClient`.
+
+    Exposes the part of the client the app uses: `ontology.objects.<Type>`
+    (iterate / where / order_by / page / group_by / get), `ontology.actions.*`
+    and `ontology.batch_actions.*`. On first use of an empty database it is
+    seeded from the CSV files in `seed_dir` (e.g. raw_data/).
+    """
+
+    def __init__(self, path: str, seed_dir: str = None):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self.connection()
+        create_schema(conn)
+        if seed_dir and _is_empty(conn):
+            seed_from_csv(conn, seed_dir)
+        self.ontology = SimpleNamespace(
+            objects=SimpleNamespace(**{name: LocalObjectSet(self, t) for name, t in OBJECT_TYPES.items()}),
+            actions=_Actions(self, batch=False),
+            batch_actions=_Actions(self, batch=True),
+        )
+
+    def connection(self):
+        # one connection per thread; SQLite serializes writers across threads and processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+
+def create_schema(conn):
+    for t in OBJECT_TYPES.values():
+        columns = ", ".join(
+            f"{name} {_SQL_TYPES[kind]}{' PRIMARY KEY' if name == t.primary_key else ''}"
+            for name, kind in t.properties.items()
+        )
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {t.table} ({columns})")
+        for column in t.indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{t.table}_{column} ON {t.table} ({column})")
+    conn.commit()
+
+
+def _is_empty(conn):
+    return all(
+        conn.execute(f"SELECT 1 FROM {t.table} LIMIT 1").fetchone() is None
+        for t in OBJECT_TYPES.values()
+    )
+
+
+def seed_from_csv(conn, seed_dir: str):
+    """Load `<table>.csv` files (the raw_data/ export layout) into empty tables."""
+    for t in OBJECT_TYPES.values():
+        path = os.path.join(seed_dir, f"{t.table}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = (
+                tuple(_from_csv(row.get(name), kind) for name, kind in t.properties.items())
+                for row in csv.DictReader(f)
+            )
+            insert_rows(conn, t, rows)
+    conn.commit()
+
+
+def insert_rows(conn, object_type, rows):
+    names = list(object_type.properties)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {object_type.table} ({', '.join(names)}) "
+        f"VALUES ({', '.join('?' for _ in names)})",
+        rows,
+    )
+
+
+def _from_csv(value, kind):
+    if value is None or value == "":
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    return value
+
+
+class LocalObjectSet:
+    def __init__(self, client, object_type, where=None, order=()):
+        self._client = client
+        self._type = object_type
+        self._where = where
+        self._order = tuple(order)
+
+    def where(self, clause: Clause):
+        combined = clause if self._where is None else self._where & clause
+        return LocalObjectSet(self._client, self._type, combined, self._order)
+
+    def order_by(self, *orderings):
+        return LocalObjectSet(self._client, self._type, self._where, self._order + orderings)
+
+    def _select(self, columns="*", limit=None, offset=None):
+        sql = f"SELECT {columns} FROM {self._type.table}"
+        params = ()
+        if self._where is not None:
+            sql += f" WHERE {self._where.sql}"
+            params = self._where.params
+        # primary key as the final tie-breaker keeps paging stable
+        order = [o.sql for o in self._order] + [self._type.primary_key]
+        sql += " ORDER BY " + ", ".join(order)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)} OFFSET {int(offset or 0)}"
+        return sql, params
+
+    def iterate(self):
+        sql, params = self._select(", ".join(self._type.properties))
+        cursor = self._client.connection().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(_FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield self._type.from_row(row)
+
+    def page(self, page_size: int = 100, page_token: str = None):
+        try:
+            offset = int(page_token or 0)
+        except ValueError:
+            raise ValueError(f"Invalid page_token {page_token!r}") from None
+        if offset < 0:
+            raise ValueError(f"Invalid page_token {page_token!r}")
+        sql, params = self._select(", ".join(self._type.properties), limit=page_size + 1, offset=offset)
+        rows = self._client.connection().execute(sql, params).fetchall()
+        has_more = len(rows) > page_size
+        return SimpleNamespace(
+            data=[self._type.from_row(row) for row in rows[:page_size]],
+            next_page_token=str(offset + page_size) if has_more else None,
+        )
+
+    def get(self, primary_key):
+        obj = next(self.where(getattr(self._type.object_type, self._type.primary_key) == primary_key).iterate(), None)
+        if obj is None:
+            raise KeyError(f"{self._type.api_name} {primary_key!r} not found")
+        return obj
+
+    def group_by(self, grouping):
+        return _GroupBy(self, grouping.column)
+
+
+class _GroupBy:
+    def __init__(self, object_set, column):
+        self._object_set = object_set
+        self._column = column
+
+    def count(self):
+        return self
+
+    def compute(self):
+        object_set = self._object_set
+        sql = f"SELECT {self._column}, COUNT(*) FROM {object_set._type.table}"
+        params = ()
+        if object_set._where is not None:
+            sql += f" WHERE {object_set._where.sql}"
+            params = object_set._where.params
+        sql += f" GROUP BY {self._column}"
+        rows = object_set._client.connection().execute(sql, params).fetchall()
+        return SimpleNamespace(data=[
+            SimpleNamespace(group={self._column: key}, metrics=[SimpleNamespace(name="count", value=count)])
+            for key, count in rows
+        ])
+
+
+def _db_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class _Actions:
+    """create_* / edit_* / delete_* actions, single or batched, applied in one transaction."""
+
+    def __init__(self, client, batch: bool):
+        self._client = client
+        self._batch = batch
+
+    def __getattr__(self, name):
+        verb, _, suffix = name.partition("_")
+        object_type = ACTION_TARGETS.get(suffix)
+        if verb not in ("create", "edit", "delete") or object_type is None:
+            raise AttributeError(name)
+
+        def fields_of(request):
+            if isinstance(request, dict):
+                return request
+            return {k: getattr(request, k) for k in (*object_type.properties, suffix) if hasattr(request, k)}
+
+        def run(*args, action_config=None, batch_action_config=None, requests=None, **kwargs):
+            params = [fields_of(r) for r in requests] if self._batch else [kwargs]
+            conn = self._client.connection()
+            try:
+                with conn:
+                    for p in params:
+                        _apply(conn, verb, suffix, object_type, p)
+            except (sqlite3.IntegrityError, KeyError) as e:
+                # single actions report validation like the SDK; batches raise
+                if self._batch:
+                    raise ActionValidationError(f"{name}: {e}") from e
+                return _INVALID
+            return _VALID
+
+        return run
+
+
+def _apply(conn, verb, suffix, object_type, params):
+    pk = object_type.primary_key
+    if verb == "create":
+        names = [n for n in object_type.properties if n in params]
+        conn.execute(
+            f"INSERT INTO {object_type.table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+            [_db_value(params[n]) for n in names],
+        )
+        return
+
+    # edit / delete identify the object by a parameter named after the type
+    key = params[suffix] if suffix in params else params[pk]
+    if verb == "delete":
+        cursor = conn.execute(f"DELETE FROM {object_type.table} WHERE {pk} = ?", (key,))
+    else:
+        names = [n for n in object_type.properties if n in params and n != pk]
+        if not names:
+            cursor = conn.execute(f"SELECT 1 FROM {object_type.table} WHERE {pk} = ?", (key,))
+            if cursor.fetchone() is None:
+                raise KeyError(f"{object_type.api_name} {key!r} not found")
+            return
+        cursor = conn.execute(
+            f"UPDATE {object_type.table} SET {', '.join(f'{n} = ?' for n in names)} WHERE {pk} = ?",
+            [_db_value(params[n]) for n in names] + [key],
+        )
+    if cursor.rowcount == 0:
+        raise KeyError(f"{object_type.api_name} {key!r} not found")
@@ -0,0 +1,143 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+
+# Filter / ordering expressions with the same operators the blueprints use on
+# `mr_split_sdk` object types (==, ~, &, |, comparisons, is_null, asc/desc),
+# compiled to SQL for the local backend.
+
+class Clause:
+    def __init__(self, sql: str, params=()):
+        self.sql = sql
+        self.params = tuple(params)
+
+    def __and__(self, other):
+        return Clause(f"({self.sql}) AND ({other.sql})", self.params + other.params)
+
+    def __or__(self, other):
+        return Clause(f"({self.sql}) OR ({other.sql})", self.params + other.params)
+
+    def __invert__(self):
+        return Clause(f"NOT ({self.sql})", self.params)
+
+    @property
+    def cache_key(self):
+        return self.sql, self.params
+
+    def __repr__(self):
+        return f"Clause({self.sql!r}, {self.params!r})"
+
+
+class Ordering:
+    def __init__(self, column: str, descending: bool):
+        self.column = column
+        self.descending = descending
+
+    @property
+    def sql(self):
+        return f"{self.column} {'DESC' if self.descending else 'ASC'}"
+
+    @property
+    def cache_key(self):
+        return self.column, self.descending
+
+    def __repr__(self):
+        return f"Ordering({self.sql!r})"
+
+
+class Grouping:
+    def __init__(self, column: str):
+        self.column = column
+
+    @property
+    def cache_key(self):
+        return self.column
+
+    def __repr__(self):
+        return f"Grouping({self.column!r})"
+
+
+def _to_db(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class Property:
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind  # "int", "float", "text" or "date"
+
+    def _compare(self, op, value):
+        if value is None:
+            return Clause(f"{self.name} IS {'NOT ' if op == '!=' else ''}NULL")
+        return Clause(f"{self.name} {op} ?", (_to_db(value),))
+
+    def __eq__(self, value): return self._compare("=", value)
+    def __ne__(self, value): return self._compare("!=", value)
+    def __lt__(self, value): return self._compare("<", value)
+    def __le__(self, value): return self._compare("<=", value)
+    def __gt__(self, value): return self._compare(">", value)
+    def __ge__(self, value): return self._compare(">=", value)
+    __hash__ = object.__hash__
+
+    def is_null(self):
+        return Clause(f"{self.name} IS NULL")
+
+    def asc(self):
+        return Ordering(self.name, False)
+
+    def desc(self):
+        return Ordering(self.name, True)
+
+    def exact(self):
+        return Grouping(self.name)
+
+
+class ObjectType:
+    """Schema of one ontology object type plus its `object_type.<property>` expressions."""
+
+    def __init__(self, api_name: str, table: str, primary_key: str, properties, indexes=()):
+        self.api_name = api_name
+        self.table = table
+        self.primary_key = primary_key
+        self.properties = dict(properties)  # name -> kind
+        self.indexes = tuple(indexes)
+        self.object_type = SimpleNamespace(**{name: Property(name, kind) for name, kind in self.properties.items()})
+
+    def from_row(self, row):
+        values = {}
+        for name, value in zip(self.properties, row):
+            if value is not None and self.properties[name] == "date":
+                value = date.fromisoformat(value)
+            values[name] = value
+        return SimpleNamespace(**values)
+
+
+Users = ObjectType("Users", "users", "user_id", [
+    ("user_id", "int"), ("full_name", "text"), ("email", "text"),
+], indexes=["full_name"])
+
+PurchasedItem = ObjectType("PurchasedItem", "purchased_item", "line_id", [
+    ("line_id", "int"), ("receipt_id", "text"), ("store_name", "text"), ("purchase_date", "date"),
+    ("item_name", "text"), ("price", "float"), ("paid_by", "int"),
+], indexes=["receipt_id", "paid_by", "store_name", "purchase_date"])
+
+ResponsibilityMapping = ObjectType("ResponsibilityMapping", "responsibility_mapping", "mapping_id", [
+    ("mapping_id", "int"), ("line_id", "int"), ("user_id", "int"), ("status", "text"),
+], indexes=["line_id", "user_id"])
+
+Settlements = ObjectType("Settlements", "settlements", "settlement_id", [
+    ("settlement_id", "int"), ("from_user_id", "int"), ("to_user_id", "int"), ("amount_cents", "int"),
+    ("created_at", "date"), ("note", "text"),
+], indexes=["from_user_id", "to_user_id", "created_at"])
+
+OBJECT_TYPES = {t.api_name: t for t in (Users, PurchasedItem, ResponsibilityMapping, Settlements)}
+
+# Action name suffix (create_users, delete_purchased_item, ...) -> object type.
+ACTION_TARGETS = {
+    "users": Users,
+    "purchased_item": PurchasedItem,
+    "responsibility_mapping": ResponsibilityMapping,
+    "settlements": Settlements,
+}
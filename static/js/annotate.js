@@ -16,63 +16,257 @@ document.addEventListener('DOMContentLoaded', function () {
 
     // Read Flask-rendered data from data-attributes
     const body = document.body;
-    const activeLineId = JSON.parse(body.getAttribute('data-active-line-id'));
     const receiptId = body.getAttribute('data-selected-receipt');
+    const nextPageUrl = body.getAttribute('data-next-page-url');
 
     // Collect line_ids from table rows dynamically (safer than template array)
     const lineIds = Array.from(document.querySelectorAll('tbody tr')).map(tr =>
         parseInt(tr.querySelector('td').textContent)
     );
 
-    function goToNextLine() {
-        if (!activeLineId || lineIds.length === 0) return;
+    // Streamed pages don't pick an active line server-side; default to the first row.
+    const activeLineId = JSON.parse(body.getAttribute('data-active-line-id')) ?? lineIds[0] ?? null;
 
-        const selectedUsers = choices.getValue(true);
+    // Edits are saved through the server's write queue: a save is accepted right
+    // away and written in the background. Each edit is kept in sessionStorage
+    // (it survives the page loads between lines) until /annotate/save-status says
+    // it has been written, so the table can show it optimistically meanwhile.
+    // state: "unsent" (not accepted yet), "sent" (queued on the server) or "failed"
+    //
+    // Unsent edits are sent together: once FLUSH_AT of them are waiting, at the
+    // end of the last page, once the oldest has waited FLUSH_MS, or when the
+    // page is left for anything but the next line.
+    const EDITS_KEY = 'annotate-edits';
+    const POLL_MS = 1500;
+    const FLUSH_AT = 25;
+    const FLUSH_MS = 30000;
+    const retryFailedBtn = document.getElementById('retry-failed-btn');
+    const saveSummary = document.getElementById('save-summary');
+    const savedHere = {};  // line_id -> names written while this page was open
+    let polling = false;
+    let toNextLine = false;  // set when Next leaves the page without sending
 
-        nextBtn.disabled = true;
-        nextBtn.textContent = "Saving...";
+    function readEdits() {
+        return JSON.parse(sessionStorage.getItem(EDITS_KEY) || '{}');
+    }
+
+    function writeEdits(edits) {
+        sessionStorage.setItem(EDITS_KEY, JSON.stringify(edits));
+        render(edits);
+    }
 
-        fetch('/annotate/save-responsibility', {
+    function render(edits) {
+        document.querySelectorAll('tbody tr').forEach(tr => {
+            const lineId = parseInt(tr.querySelector('td').textContent);
+            const cell = tr.querySelector('.save-state');
+            const edit = edits[lineId];
+            if (edit) {
+                const label = edit.state === 'failed' ? `failed: ${edit.error || 'not saved'}` : 'saving…';
+                cell.textContent = `${edit.names.join(', ')} (${label})`;
+                cell.className = `save-state ${edit.state === 'failed' ? 'failed' : 'saving'}`;
+            } else if (savedHere[lineId]) {
+                cell.textContent = `${savedHere[lineId].join(', ')} (saved)`;
+                cell.className = 'save-state saved';
+            }
+        });
+        const all = Object.values(edits);
+        const failed = all.filter(e => e.state === 'failed').length;
+        const saving = all.length - failed;
+        saveSummary.textContent = [saving && `${saving} saving`, failed && `${failed} failed`].filter(Boolean).join(', ');
+        retryFailedBtn.disabled = failed === 0;
+    }
+
+    function postBulk(payload) {
+        return fetch('/annotate/save-responsibility/bulk', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ line_id: activeLineId, user_names: selectedUsers })
+            body: JSON.stringify(payload)
         })
         .then(response => response.json())
         .then(data => {
-            if (data.status === "success") {
-                // move to next item as before
-                const currentIndex = lineIds.indexOf(activeLineId);
-                let nextIndex = currentIndex + 1;
-
-                if (nextIndex >= lineIds.length) {
-                    alert('Reached the last item!');
-                    nextBtn.disabled = false;
-                    nextBtn.textContent = "Next Item";
-                    return;
+            if (data.status !== "queued" && data.status !== "success") throw new Error(data.message || 'save failed');
+            return data;
+        });
+    }
+
+    function markSent(lineIds) {
+        const edits = readEdits();
+        lineIds.forEach(lineId => { if (edits[lineId]) edits[lineId].state = 'sent'; });
+        writeEdits(edits);
+        pollStatus();
+    }
+
+    function unsentEdits() {
+        return Object.entries(readEdits()).filter(([, e]) => e.state === 'unsent');
+    }
+
+    function toAssignments(edits) {
+        return edits.map(([lineId, e]) => ({ line_id: parseInt(lineId), user_names: e.names }));
+    }
+
+    // Send the edits the server hasn't accepted yet; they stay "unsent" (and are
+    // sent again later) if this fails.
+    function sendUnsent() {
+        const unsent = unsentEdits();
+        if (unsent.length === 0) return Promise.resolve(null);
+        return postBulk({ assignments: toAssignments(unsent) })
+            .then(data => { markSent(unsent.map(([lineId]) => lineId)); return data; });
+    }
+
+    function flushDue() {
+        const unsent = unsentEdits();
+        return unsent.length >= FLUSH_AT
+            || unsent.some(([, e]) => Date.now() - (e.queuedAt || 0) >= FLUSH_MS);
+    }
+
+    function sendIfDue() {
+        if (flushDue()) sendUnsent().catch(err => console.error(err));
+    }
+
+    function pollStatus() {
+        if (polling) return;
+        const sent = Object.entries(readEdits()).filter(([, e]) => e.state === 'sent').map(([lineId]) => lineId);
+        if (sent.length === 0) return;
+        polling = true;
+        fetch(`/annotate/save-status?line_ids=${sent.join(',')}`)
+            .then(response => response.json())
+            .then(status => {
+                const edits = readEdits();
+                for (const lineId of sent) {
+                    const edit = edits[lineId];
+                    if (!edit || edit.state !== 'sent') continue;  // edited again meanwhile
+                    const entry = status.lines[lineId];
+                    if (!entry) {
+                        savedHere[lineId] = edit.names;
+                        delete edits[lineId];
+                    } else if (entry.state === 'failed') {
+                        edit.state = 'failed';
+                        edit.error = entry.error;
+                    }
+                }
+                writeEdits(edits);
+            })
+            .catch(err => console.error(err))
+            .finally(() => {
+                polling = false;
+                if (Object.values(readEdits()).some(e => e.state === 'sent')) {
+                    setTimeout(pollStatus, POLL_MS);
                 }
+            });
+    }
+
+    function goToNextLine() {
+        if (!activeLineId || lineIds.length === 0) return;
+
+        const selectedUsers = choices.getValue(true);
+        if (selectedUsers.length > 0) {
+            const edits = readEdits();
+            edits[activeLineId] = { names: selectedUsers, state: 'unsent', queuedAt: Date.now() };
+            writeEdits(edits);
+        }
+
+        const currentIndex = lineIds.indexOf(activeLineId);
+        const nextIndex = currentIndex + 1;
 
-                const nextLineId = lineIds[nextIndex];
-                const url = new URL(window.location.href);
-                url.searchParams.set('active_line_id', nextLineId);
-                if (receiptId) {
-                    url.searchParams.set('receipt_id', receiptId);
+        let target = null;
+        if (nextIndex < lineIds.length) {
+            const url = new URL(window.location.href);
+            url.searchParams.set('active_line_id', lineIds[nextIndex]);
+            if (receiptId) {
+                url.searchParams.set('receipt_id', receiptId);
+            }
+            target = url.toString();
+        } else if (nextPageUrl) {
+            // continue on the next page; its first line becomes active
+            target = nextPageUrl;
+        }
+
+        // Within the listing the edit just waits with the others
+        if (target && !flushDue()) {
+            toNextLine = true;
+            window.location.href = target;
+            return;
+        }
+
+        // The server only queues the edits, so this returns quickly; if it fails
+        // they stay unsent and are sent again later.
+        nextBtn.disabled = true;
+        sendUnsent()
+            .catch(err => console.error(err))
+            .finally(() => {
+                if (target) {
+                    window.location.href = target;
+                    return;
                 }
-                window.location.href = url.toString();
-            } else {
-                alert('Failed to save responsibility mapping. Please try again.');
                 nextBtn.disabled = false;
-                nextBtn.textContent = "Next Item";
-            }
-        })
-        .catch(err => {
-            alert('Error saving responsibility mapping. Please try again.');
+                alert('Reached the last item!');
+            });
+    }
+
+    function applyToLines(apply, description) {
+        const selectedUsers = choices.getValue(true);
+        if (selectedUsers.length === 0) {
+            alert('Select at least one responsible user first.');
+            return;
+        }
+        if (!confirm(`Assign ${selectedUsers.join(', ')} to ${description}?`)) return;
+
+        // unsent per-line edits go in the same request and take precedence
+        const unsent = unsentEdits();
+        postBulk({ assignments: toAssignments(unsent), apply: { ...apply, user_names: selectedUsers } })
+            .then(data => {
+                markSent(unsent.map(([lineId]) => lineId));
+                alert(`Saving ${data.lines} line(s).`);
+                window.location.reload();
+            })
+            .catch(err => {
+                alert(`Error saving: ${err.message}`);
+                console.error(err);
+            });
+    }
+
+    const splitReceiptBtn = document.getElementById('split-receipt-btn');
+    if (splitReceiptBtn) {
+        splitReceiptBtn.addEventListener('click', () =>
+            applyToLines({ receipt_id: receiptId }, `every line of receipt ${receiptId}`)
+        );
+    }
+    document.getElementById('apply-unassigned-btn').addEventListener('click', () =>
+        applyToLines(
+            receiptId ? { receipt_id: receiptId, only_unassigned: true } : { only_unassigned: true },
+            receiptId ? `the unassigned lines of receipt ${receiptId}` : 'every unassigned line'
+        )
+    );
+
+    retryFailedBtn.addEventListener('click', () => {
+        const edits = readEdits();
+        Object.values(edits).forEach(e => { if (e.state === 'failed') e.state = 'unsent'; });
+        writeEdits(edits);
+        sendUnsent().catch(err => {
+            alert('Error saving responsibility mappings. Please try again.');
             console.error(err);
-            nextBtn.disabled = false;
-            nextBtn.textContent = "Next Item";
         });
-    }
+    });
 
+    // Leaving the listing (another page, or closing the tab): send what is
+    // waiting. keepalive lets the request outlive the page; the edits stay
+    // "unsent", so coming back sends them again (a repeat save is harmless).
+    window.addEventListener('pagehide', () => {
+        const unsent = unsentEdits();
+        if (toNextLine || unsent.length === 0) return;
+        fetch('/annotate/save-responsibility/bulk', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ assignments: toAssignments(unsent) }),
+            keepalive: true
+        }).catch(err => console.error(err));
+    });
 
+    // pick up where the previous page left off
+    render(readEdits());
+    sendIfDue();
+    setInterval(sendIfDue, FLUSH_MS / 6);
+    pollStatus();
 
     nextBtn.addEventListener('click', goToNextLine);
 });
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# The tests run against the local SQLite backend (seeded from raw_data/), with
+# every SQLite file in a scratch directory instead of instance/.
+_scratch = tempfile.mkdtemp(prefix="mr-split-tests-")
+os.environ.setdefault("MR_SPLIT_BACKEND", "local")
+for _name, _file in (("MR_SPLIT_LOCAL_DB", "local_ontology.sqlite3"), ("MR_SPLIT_ID_DB", "ids.sqlite3"),
+                     ("MR_SPLIT_GROUP_DB", "groups.sqlite3"), ("MR_SPLIT_WRITE_DB", "writes.sqlite3")):
+    os.environ.setdefault(_name, os.path.join(_scratch, _file))
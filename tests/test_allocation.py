@@ -0,0 +1,75 @@
+import random
+import unittest
+from collections import defaultdict
+from datetime import date
+from types import SimpleNamespace
+
+from balances.allocation import ShareIndex, allocate, allocate_pair
+from balances.utils import compute_balances
+from tests.test_ledger import History
+
+
+def _item(line_id, paid_by, price, day):
+    return SimpleNamespace(line_id=line_id, receipt_id="R1", store_name="Store", purchase_date=date(2024, 1, day),
+                           item_name=f"item {line_id}", price=price, paid_by=paid_by)
+
+
+def _mapping(mapping_id, line_id, user_id):
+    return SimpleNamespace(mapping_id=mapping_id, line_id=line_id, user_id=user_id, status="unpaid")
+
+
+def _settlement(from_user_id, to_user_id, amount_cents):
+    return SimpleNamespace(settlement_id=None, from_user_id=from_user_id, to_user_id=to_user_id,
+                           amount_cents=amount_cents, created_at=None, note=None)
+
+
+class AllocationTest(unittest.TestCase):
+    def setUp(self):
+        # user 1 owes user 2 for three lines, bought newest first; user 2 owes user 1 for one
+        items = [_item(10, 2, 30.00, 3), _item(11, 2, 10.00, 1), _item(12, 2, 20.00, 2), _item(13, 1, 5.00, 1)]
+        mappings = [_mapping(100, 10, 1), _mapping(101, 11, 1), _mapping(102, 12, 1), _mapping(103, 13, 2)]
+        self.shares = ShareIndex(mappings, items)
+
+    def test_oldest_share_is_covered_first(self):
+        self.assertEqual([s.mapping_id for s in self.shares.shares(1, 2)], [101, 102, 100])
+        remaining = allocate_pair(self.shares, 1, 2, [_settlement(1, 2, 1500)])
+        self.assertEqual(remaining, {101: 0, 102: 1500, 100: 3000})
+
+    def test_partial_coverage_carries_over(self):
+        settlements = [_settlement(1, 2, 700), _settlement(1, 2, 2500)]
+        self.assertEqual(allocate_pair(self.shares, 1, 2, settlements), {101: 0, 102: 0, 100: 2800})
+        # more than is owed covers everything and no more
+        self.assertEqual(allocate_pair(self.shares, 1, 2, [_settlement(1, 2, 10 ** 6)]), {101: 0, 102: 0, 100: 0})
+
+    def test_settlement_only_covers_its_own_direction(self):
+        # debts the other way don't cover anything either
+        self.assertEqual(allocate(self.shares, []), {101: 1000, 102: 2000, 100: 3000, 103: 500})
+        remaining = allocate(self.shares, [_settlement(1, 2, 6000)])
+        self.assertEqual(remaining[103], 500)
+        remaining = allocate(self.shares, [_settlement(2, 1, 500)])
+        self.assertEqual(remaining, {101: 1000, 102: 2000, 100: 3000, 103: 0})
+
+    def test_remaining_nets_to_compute_balances(self):
+        for seed in range(200):
+            rng = random.Random(seed)
+            history = History(rng)
+            for _ in range(rng.randint(0, 40)):
+                history.step()
+            mappings, items, settlements = history.objects()
+            shares = ShareIndex(mappings, items)
+            remaining = allocate(shares, settlements)
+            owed = defaultdict(int)
+            for (debtor, creditor), pair_shares in shares.by_pair.items():
+                owed[(debtor, creditor)] += sum(remaining[s.mapping_id] for s in pair_shares)
+            net = {}
+            for (debtor, creditor), cents in owed.items():
+                signed = cents - owed.get((creditor, debtor), 0)
+                if signed > 0:
+                    net[(debtor, creditor)] = signed
+            pairwise, _ = compute_balances(mappings, items, settlements)
+            with self.subTest(seed=seed):
+                self.assertEqual(net, {(frm, to): cents for frm, to, cents in pairwise})
+
+
+if __name__ == "__main__":
+    unittest.main()
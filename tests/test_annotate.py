@@ -0,0 +1,39 @@
+import unittest
+
+from app import create_app
+
+
+class SaveValidationTest(unittest.TestCase):
+    """Malformed saves are refused with a 400 before anything is queued."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        cls.app.config.update(TESTING=True, WRITE_QUEUE=False)
+        cls.http = cls.app.test_client()
+
+    def assertRefused(self, url, payload):
+        response = self.http.post(url, json=payload)
+        self.assertEqual(response.status_code, 400, response.json)
+        self.assertEqual(response.json["status"], "error")
+
+    def test_user_names_must_be_a_list_of_strings(self):
+        for names in ([[1]], "Brianna Zhang", [None], {"Brianna Zhang": 1}):
+            with self.subTest(user_names=names):
+                self.assertRefused("/annotate/save-responsibility", {"line_id": 1, "user_names": names})
+                self.assertRefused("/annotate/save-responsibility/bulk",
+                                   {"assignments": [{"line_id": 1, "user_names": names}]})
+                self.assertRefused("/annotate/save-responsibility/bulk",
+                                   {"apply": {"only_unassigned": True, "user_names": names}})
+
+    def test_mode_must_be_delta_or_replace(self):
+        for mode in ("merge", None, 1, ["delta"]):
+            with self.subTest(mode=mode):
+                self.assertRefused("/annotate/save-responsibility",
+                                   {"line_id": 1, "user_names": ["Brianna Zhang"], "mode": mode})
+                self.assertRefused("/annotate/save-responsibility/bulk",
+                                   {"assignments": [{"line_id": 1, "user_names": ["Brianna Zhang"]}], "mode": mode})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from common.cache import CachedClient, ObjectCache, _call_key
+from local_backend.client import LocalClient
+from local_backend.objects import Property
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ObjectCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("common.cache.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = ObjectCache(ttl=30.0, max_objects=10)
+        self.loads = 0
+
+    def loader(self, *objects):
+        def load():
+            self.loads += 1
+            return objects
+        return load
+
+    def test_served_until_the_ttl_expires(self):
+        first = self.cache.get_or_load("Users", self.loader(1, 2))
+        self.clock.now += 29
+        self.assertIs(self.cache.get_or_load("Users", self.loader(3)), first)
+        self.assertIs(self.cache.peek("Users"), first)
+        self.clock.now += 2
+        self.assertIsNone(self.cache.peek("Users"))
+        self.assertEqual(self.cache.get_or_load("Users", self.loader(3)), (3,))
+        self.assertEqual(self.loads, 2)
+
+    def test_invalidate_drops_the_type_and_its_partitions(self):
+        self.cache.get_or_load("Users", self.loader(1))
+        self.cache.get_or_load("Users@home", self.loader(1))
+        self.cache.get_or_load("Settlements", self.loader(9))
+        self.cache.invalidate("Users")
+        self.assertIsNone(self.cache.peek("Users"))
+        self.assertIsNone(self.cache.peek("Users@home"))
+        self.assertEqual(self.cache.peek("Settlements"), (9,))
+        self.assertEqual(self.cache.version("Users"), 1)
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.peek("Settlements"))
+
+    def test_load_overtaken_by_a_write_is_not_kept(self):
+        def load():
+            self.cache.invalidate("Users")  # a write lands while the snapshot is read
+            return (1,)
+        self.assertEqual(self.cache.get_or_load("Users", load), (1,))
+        self.assertIsNone(self.cache.peek("Users"))
+
+    def test_least_recently_used_snapshots_are_evicted(self):
+        self.cache.get_or_load("Users", self.loader(*range(4)))
+        self.cache.get_or_load("PurchasedItem", self.loader(*range(4)))
+        self.cache.get_or_load("Users", self.loader())  # hit: Users becomes the most recent
+        self.cache.get_or_load("Settlements", self.loader(*range(4)))
+        self.assertIsNone(self.cache.peek("PurchasedItem"))
+        self.assertIsNotNone(self.cache.peek("Users"))
+        self.assertIsNotNone(self.cache.peek("Settlements"))
+
+    def test_derived_value_follows_its_snapshot(self):
+        build = mock.Mock(side_effect=lambda objects: sum(objects))
+        self.assertEqual(self.cache.derive("Users", "total", build, self.loader(1, 2)), 3)
+        self.assertEqual(self.cache.derive("Users", "total", build, self.loader(5)), 3)
+        self.assertEqual(build.call_count, 1)
+        self.cache.invalidate("Users")
+        self.assertIsNone(self.cache.derive("Users", "total", build))
+        self.assertEqual(self.cache.derive("Users", "total", build, self.loader(5)), 5)
+        self.assertEqual(build.call_count, 2)
+
+
+class CachedClientTest(unittest.TestCase):
+    """Snapshots are read once and dropped by actions on their type."""
+
+    def setUp(self):
+        path = os.path.join(tempfile.mkdtemp(prefix="mr-split-cache-"), "ontology.sqlite3")
+        self.backend = LocalClient(path)
+        self.client = CachedClient(self.backend, ObjectCache(ttl=60.0))
+
+    def users(self):
+        return sorted(u.user_id for u in self.client.ontology.objects.Users.iterate())
+
+    def test_action_invalidates_the_type_it_writes(self):
+        self.assertEqual(self.users(), [])
+        self.backend.ontology.actions.create_users(user_id=1, full_name="A", email=None)
+        self.assertEqual(self.users(), [])  # written behind the cache's back: still cached
+        self.client.ontology.objects.Settlements.iterate()
+
+        self.client.ontology.actions.create_users(user_id=2, full_name="B", email=None)
+        self.assertEqual(self.users(), [1, 2])
+        stats = self.client.cache.stats()["by_type"]
+        self.assertEqual(stats["Users"]["invalidations"], 1)
+        self.assertEqual(stats["Settlements"]["invalidations"], 0)
+        self.assertTrue(stats["Settlements"]["cached"])
+
+
+class CallKeyTest(unittest.TestCase):
+    """Reads are coalesced on a description of the call chain, not on reprs."""
+
+    def test_equal_expressions_share_a_key(self):
+        paid_by = Property("paid_by", "int")
+        key = _call_key("where", ((paid_by == 3) & ~paid_by.is_null(),), {})
+        self.assertEqual(_call_key("where", ((paid_by == 3) & ~paid_by.is_null(),), {}), key)
+        self.assertNotEqual(_call_key("where", ((paid_by == 4) & ~paid_by.is_null(),), {}), key)
+        self.assertEqual(_call_key("order_by", (paid_by.desc(),), {}), _call_key("order_by", (paid_by.desc(),), {}))
+        self.assertNotEqual(_call_key("order_by", (paid_by.asc(),), {}), _call_key("order_by", (paid_by.desc(),), {}))
+        self.assertEqual(_call_key("page", (), {"page_size": 10, "page_token": None}),
+                         _call_key("page", (), {"page_token": None, "page_size": 10}))
+        self.assertNotEqual(_call_key("get", (1,), {}), _call_key("get", ("1",), {}))
+        hash(key)
+
+    def test_undescribable_arguments_are_not_coalesced(self):
+        self.assertIsNone(_call_key("where", (Property("paid_by", "int"),), {}))
+        self.assertIsNone(_call_key("get", (object(),), {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from collections import Counter
+from datetime import date
+
+from app import client, create_app
+from common import action_types
+from common.groups import group_store
+
+
+class GroupBalancesTest(unittest.TestCase):
+    """Splitting the users into ledger groups splits the balances without changing them."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        cls.app.config.update(TESTING=True, WRITE_QUEUE=False, BALANCE_SNAPSHOTS=False)
+        cls.http = cls.app.test_client()
+        with cls.app.app_context():
+            user_ids = sorted(u.user_id for u in client.ontology.objects.Users.iterate())
+        # alternate users, so plenty of lines have participants in both groups
+        cls.groups = {"odd": user_ids[0::2], "even": user_ids[1::2]}
+        for group_id, members in cls.groups.items():
+            group_store.create(group_id, group_id)
+            for user_id in members:
+                group_store.assign(user_id, group_id)
+
+    @classmethod
+    def tearDownClass(cls):
+        for members in cls.groups.values():
+            for user_id in members:
+                group_store.assign(user_id, None)
+
+    def balances(self, group=""):
+        response = self.http.get(f"/balances/api?group={group}")
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_group_totals_add_up_to_global(self):
+        overall = self.balances()
+        per_user = Counter()
+        for group_id in self.groups:
+            for row in self.balances(group_id)["per_user"]:
+                per_user[row["user_id"]] += row["net_cents"]
+        self.assertTrue(overall["per_user"])
+        self.assertEqual({uid: cents for uid, cents in per_user.items() if cents},
+                         {row["user_id"]: row["net_cents"] for row in overall["per_user"]})
+
+    def test_pairs_within_a_group_match_global(self):
+        overall = {(r["from_id"], r["to_id"]): r["amount_cents"] for r in self.balances()["pairwise"]}
+        for group_id, members in self.groups.items():
+            members = set(members)
+            inside = {(r["from_id"], r["to_id"]): r["amount_cents"] for r in self.balances(group_id)["pairwise"]
+                      if r["from_id"] in members and r["to_id"] in members}
+            self.assertEqual(inside, {pair: cents for pair, cents in overall.items() if set(pair) <= members})
+
+    def test_settle_debt_owed_across_groups(self):
+        # the settle check sees the debt as the group's page shows it, not netted with the other group's
+        odd = set(self.groups["odd"])
+        debt = next(r for r in self.balances("odd")["pairwise"] if r["from_id"] not in odd)
+        # a smaller debt the other way, owed in the other group
+        config = action_types.ActionConfig(mode=action_types.ActionMode.VALIDATE_AND_EXECUTE,
+                                           return_edits=action_types.ReturnEditsMode.NONE)
+        with self.app.app_context():
+            client.ontology.actions.create_purchased_item(
+                action_config=config, line_id=10 ** 6, receipt_id="GROUPS", store_name="Test",
+                purchase_date=date(2024, 1, 1), item_name="Reverse", price=debt["amount_cents"] / 200,
+                paid_by=debt["from_id"])
+            client.ontology.actions.create_responsibility_mapping(
+                action_config=config, mapping_id=10 ** 6, line_id=10 ** 6, user_id=debt["to_id"], status="unpaid")
+        overall = {(r["from_id"], r["to_id"]): r["amount_cents"] for r in self.balances()["pairwise"]}
+        self.assertEqual(overall.get((debt["from_id"], debt["to_id"])), debt["amount_cents"] // 2)
+
+        response = self.http.post("/balances/settle?group=odd", data={
+            "confirm_text": "CONFIRM", "from_user_id": debt["from_id"], "to_user_id": debt["to_id"],
+            "amount_cents": debt["amount_cents"]})
+        self.assertNotIn("error=", response.location)
+        pairs = {(r["from_id"], r["to_id"]) for r in self.balances("odd")["pairwise"]}
+        self.assertNotIn((debt["from_id"], debt["to_id"]), pairs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import random
+import unittest
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from balances.history import BalanceHistory, to_day
+from balances.utils import compute_balances
+from tests.test_ledger import History
+
+FIRST_DAY = date(2024, 1, 1)
+
+
+def _day(object_id):
+    # stable per object, spread over about five months; a few are undated
+    if object_id % 17 == 0:
+        return None
+    return FIRST_DAY + timedelta(days=object_id * 37 % 150)
+
+
+def _dated(history):
+    mappings, items, settlements = history.objects()
+    items = [SimpleNamespace(**{**vars(it), "purchase_date": _day(it.line_id)}) for it in items]
+    settlements = [SimpleNamespace(**{**vars(s), "created_at": _day(s.settlement_id)}) for s in settlements]
+    return mappings, items, settlements
+
+
+def _windows(rng):
+    yield None, None
+    for _ in range(4):
+        a, b = sorted(FIRST_DAY + timedelta(days=rng.randint(-10, 160)) for _ in range(2))
+        yield a, b
+        yield None, b
+        yield a, None
+
+
+def _in_window(value, start, end):
+    day = to_day(value)
+    return (start is None or day >= start) and (end is None or day <= end)
+
+
+class WindowMatchesComputeBalancesTest(unittest.TestCase):
+    """A window's balances equal compute_balances over just the objects dated in it."""
+
+    histories = 100
+    steps = 60
+
+    def assertWindowsMatch(self, balance_history, mappings, items, settlements, rng):
+        for start, end in _windows(rng):
+            with self.subTest(start=start, end=end):
+                pairwise, per_user, _ = balance_history.balances(start, end)
+                expected_pairwise, expected_per_user = compute_balances(
+                    mappings,
+                    [it for it in items if _in_window(it.purchase_date, start, end)],
+                    [s for s in settlements if _in_window(s.created_at, start, end)],
+                )
+                self.assertEqual(pairwise, sorted(expected_pairwise))
+                self.assertEqual({k: v for k, v in per_user.items() if v},
+                                 {k: v for k, v in expected_per_user.items() if v})
+
+    def test_from_objects(self):
+        for seed in range(self.histories):
+            rng = random.Random(seed)
+            history = History(rng)
+            for _ in range(rng.randint(0, self.steps)):
+                history.step()
+            mappings, items, settlements = _dated(history)
+            with self.subTest(seed=seed):
+                self.assertWindowsMatch(BalanceHistory(mappings, items, settlements), mappings, items, settlements,
+                                        rng)
+
+    def test_rebuilt_from_previous(self):
+        for seed in range(self.histories // 4):
+            rng = random.Random(seed)
+            history = History(rng)
+            balance_history = None
+            for step in range(self.steps // 4):
+                for _ in range(rng.randint(1, 4)):
+                    history.step()
+                mappings, items, settlements = _dated(history)
+                balance_history = BalanceHistory(mappings, items, settlements, previous=balance_history)
+                with self.subTest(seed=seed, step=step):
+                    self.assertWindowsMatch(balance_history, mappings, items, settlements, rng)
+
+
+if __name__ == "__main__":
+    unittest.main()
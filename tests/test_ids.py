@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from common.ids import IdAllocator
+
+
+class IdAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="mr-split-ids-"), "ids.sqlite3")
+        self.seeds = 0
+
+    def allocator(self, block_size=10):
+        return IdAllocator(self.path, block_size=block_size)
+
+    def seed(self, value=500):
+        def seed():
+            self.seeds += 1
+            return value
+        return seed
+
+    def test_ids_come_from_leased_blocks(self):
+        ids = self.allocator()
+        self.assertEqual(ids.allocate("Users", seed=self.seed()), [500])
+        self.assertEqual(ids.allocate("Users", 3, seed=self.seed()), [501, 502, 503])
+        # more than a block at once is one larger lease
+        self.assertEqual(ids.allocate("Users", 25, seed=self.seed()), list(range(504, 529)))
+        self.assertEqual(self.seeds, 1)
+        self.assertEqual(ids.allocate("Settlements"), [1])
+
+    def test_workers_sharing_the_file_never_overlap(self):
+        workers = [self.allocator(block_size=7) for _ in range(3)]
+        handed_out = []
+        lock = threading.Lock()
+
+        def run(worker):
+            for n in range(40):
+                got = worker.allocate("PurchasedItem", 1 + n % 3, seed=self.seed(1))
+                with lock:
+                    handed_out.extend(got)
+
+        threads = [threading.Thread(target=run, args=(w,)) for w in workers for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(handed_out), len(set(handed_out)))
+        self.assertEqual(min(handed_out), 1)
+
+    def test_seed_runs_outside_the_locks(self):
+        ids = self.allocator()
+
+        def seed():
+            # neither this allocator's lock nor the file's write lock is held
+            self.assertTrue(ids._lock.acquire(blocking=False))
+            ids._lock.release()
+            conn = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("ROLLBACK")
+            finally:
+                conn.close()
+            self.seeds += 1
+            return 42
+
+        self.assertEqual(ids.allocate("Users", seed=seed), [42])
+        ids.reserve_through("PurchasedItem", 10, seed=seed)
+        self.assertEqual(ids.allocate("PurchasedItem", seed=seed), [42])
+        self.assertEqual(self.seeds, 2)
+
+    def test_first_seed_wins_when_workers_race(self):
+        first, second = self.allocator(), self.allocator()
+
+        def slow_seed():
+            # another worker leases the key while this one is querying the ontology
+            second.allocate("Users", seed=self.seed(100))
+            return 7
+
+        self.assertEqual(first.allocate("Users", seed=slow_seed), [110])
+
+    def test_reserve_through_skips_imported_ids(self):
+        ids = self.allocator()
+        self.assertEqual(ids.allocate("Users", seed=self.seed(1)), [1])
+        ids.reserve_through("Users", 250)
+        self.assertEqual(ids.allocate("Users"), [251])
+        ids.reserve_through("Users", 100)  # never moves backwards
+        self.assertEqual(ids.allocate("Users"), [252])
+
+
+if __name__ == "__main__":
+    unittest.main()
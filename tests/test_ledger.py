@@ -0,0 +1,111 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from balances.ledger import Ledger
+from balances.utils import compute_balances
+
+
+# Ledger applies deltas; compute_balances recomputes from scratch. On any
+# history of edits both must report the same cents.
+
+USERS = range(1, 7)
+
+
+def _item(line_id, rng):
+    price = None if rng.random() < 0.05 else round(rng.uniform(0, 80), 2)
+    paid_by = None if rng.random() < 0.05 else rng.choice(USERS)
+    return SimpleNamespace(line_id=line_id, receipt_id="R1", store_name="Store", purchase_date=None,
+                           item_name=f"item {line_id}", price=price, paid_by=paid_by)
+
+
+def _mapping(mapping_id, line_id, user_id):
+    return SimpleNamespace(mapping_id=mapping_id, line_id=line_id, user_id=user_id, status="unpaid")
+
+
+def _settlement(settlement_id, rng):
+    frm, to = rng.sample(USERS, 2)
+    return SimpleNamespace(settlement_id=settlement_id, from_user_id=frm, to_user_id=to,
+                           amount_cents=rng.randint(1, 5000), created_at=None, note=None)
+
+
+class History:
+    """Random ontology contents, edited one step at a time."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.items, self.mappings, self.settlements = {}, {}, {}
+        self.next_id = 1
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def step(self):
+        rng = self.rng
+        action = rng.random()
+        if action < 0.25 or not self.items:
+            line_id = self._new_id()
+            self.items[line_id] = _item(line_id, rng)
+        elif action < 0.35:
+            line_id = rng.choice(list(self.items))
+            self.items[line_id] = _item(line_id, rng)  # new payer and/or price
+        elif action < 0.40:
+            del self.items[rng.choice(list(self.items))]
+        elif action < 0.65:
+            line_id = rng.choice(list(self.items) + [self._new_id()])  # sometimes a line with no item
+            mapping_id = self._new_id()
+            self.mappings[mapping_id] = _mapping(mapping_id, line_id, rng.choice(USERS))
+        elif action < 0.72 and self.mappings:
+            mapping_id = rng.choice(list(self.mappings))
+            old = self.mappings[mapping_id]
+            self.mappings[mapping_id] = _mapping(mapping_id, old.line_id, rng.choice(USERS))
+        elif action < 0.80 and self.mappings:
+            del self.mappings[rng.choice(list(self.mappings))]
+        elif action < 0.95:
+            settlement_id = self._new_id()
+            self.settlements[settlement_id] = _settlement(settlement_id, rng)
+        elif self.settlements:
+            del self.settlements[rng.choice(list(self.settlements))]
+
+    def objects(self):
+        return list(self.mappings.values()), list(self.items.values()), list(self.settlements.values())
+
+
+def _normalized(balances):
+    pairwise, per_user = balances
+    return sorted(pairwise), dict(per_user)
+
+
+class LedgerMatchesComputeBalancesTest(unittest.TestCase):
+    histories = 200
+    steps = 40
+
+    def test_from_objects(self):
+        for seed in range(self.histories):
+            rng = random.Random(seed)
+            history = History(rng)
+            for _ in range(rng.randint(0, self.steps)):
+                history.step()
+            mappings, items, settlements = history.objects()
+            with self.subTest(seed=seed):
+                self.assertEqual(
+                    _normalized(Ledger.from_objects(mappings, items, settlements).balances()),
+                    _normalized(compute_balances(mappings, items, settlements)))
+
+    def test_repeated_sync(self):
+        for seed in range(self.histories):
+            rng = random.Random(seed)
+            history = History(rng)
+            ledger = Ledger()
+            for step in range(self.steps):
+                for _ in range(rng.randint(1, 3)):
+                    history.step()
+                mappings, items, settlements = history.objects()
+                with self.subTest(seed=seed, step=step):
+                    self.assertEqual(_normalized(ledger.sync(mappings, items, settlements)),
+                                     _normalized(compute_balances(mappings, items, settlements)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import unittest
+
+from app import client, create_app
+from common import action_types, queries
+from local_backend.client import ActionValidationError
+
+
+class LocalWritesTest(unittest.TestCase):
+    """Writes go through the local backend end to end, with no SDK installed or imported."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+        cls.app.config.update(TESTING=True, WRITE_QUEUE=False, BALANCE_SNAPSHOTS=False)
+        cls.http = cls.app.test_client()
+
+    def tearDown(self):
+        self.assertNotIn("mr_split_sdk", sys.modules)
+        self.assertNotIn("foundry_sdk_runtime", sys.modules)
+
+    def test_save_responsibility(self):
+        response = self.http.post("/annotate/save-responsibility",
+                                  json={"line_id": 2, "user_names": ["Brianna Zhang", "Roshan Saigal"]})
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(sorted(m.user_id for m in queries.mappings_for_line(2)), [1, 2])
+
+    def test_settle_debt(self):
+        debt = self.http.get("/balances/api").json["pairwise"][0]
+        response = self.http.post("/balances/settle", data={
+            "confirm_text": "CONFIRM", "from_user_id": debt["from_id"], "to_user_id": debt["to_id"],
+            "amount_cents": debt["amount_cents"]})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("error=", response.location)
+        with self.app.app_context():
+            settled = [s for s in queries.settlements_between(debt["from_id"], debt["to_id"])
+                       if s.from_user_id == debt["from_id"] and s.amount_cents == debt["amount_cents"]]
+        self.assertTrue(settled)
+
+    def test_refused_batch_raises(self):
+        with self.app.app_context():
+            with self.assertRaises(ActionValidationError):
+                client.ontology.batch_actions.delete_settlements(
+                    batch_action_config=action_types.BatchActionConfig(return_edits=action_types.ReturnEditsMode.NONE),
+                    requests=[action_types.DeleteSettlementsBatchRequest(settlements=10 ** 9)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+from collections import defaultdict
+
+from balances.planner import EXACT_LIMIT, plan_settlements
+
+
+def _random_nets(rng, n_users):
+    """Per-user nets that sum to zero, with some users settled and some equal amounts."""
+    amounts = [rng.choice((0, rng.randint(-5000, 5000), rng.choice((-1000, 1000)))) for _ in range(n_users - 1)]
+    amounts.append(-sum(amounts))
+    return {uid: cents for uid, cents in enumerate(amounts, 1)}
+
+
+def _max_zero_sum_groups(values):
+    # brute force: the lowest member goes with every zero-sum subset of the rest
+    if not values:
+        return 0
+    first, rest = values[0], values[1:]
+    best = 0
+    for mask in range(1 << len(rest)):
+        chosen = [v for i, v in enumerate(rest) if mask >> i & 1]
+        if first + sum(chosen) == 0:
+            left = [v for i, v in enumerate(rest) if not mask >> i & 1]
+            best = max(best, 1 + _max_zero_sum_groups(left))
+    return best
+
+
+class PlannerTest(unittest.TestCase):
+    def assertSettlesEveryone(self, per_user, plan):
+        after = defaultdict(int, per_user)
+        for frm, to, cents in plan:
+            self.assertGreater(cents, 0)
+            self.assertNotEqual(frm, to)
+            after[frm] += cents
+            after[to] -= cents
+        self.assertFalse([uid for uid, cents in after.items() if cents])
+
+    def test_plan_is_zero_sum(self):
+        for seed in range(300):
+            rng = random.Random(seed)
+            per_user = _random_nets(rng, rng.randint(1, EXACT_LIMIT + 10))
+            with self.subTest(seed=seed):
+                plan = plan_settlements(per_user)
+                self.assertSettlesEveryone(per_user, plan)
+                self.assertLessEqual(len(plan), max(len([c for c in per_user.values() if c]) - 1, 0))
+
+    def test_small_groups_get_the_fewest_transfers(self):
+        for seed in range(200):
+            rng = random.Random(seed)
+            per_user = _random_nets(rng, rng.randint(1, 9))
+            nonzero = [cents for _, cents in sorted(per_user.items()) if cents]
+            with self.subTest(seed=seed):
+                self.assertEqual(len(plan_settlements(per_user)), len(nonzero) - _max_zero_sum_groups(nonzero))
+
+    def test_independent_subgroups_settle_separately(self):
+        per_user = {1: -500, 2: 500, 3: -700, 4: 300, 5: 400}
+        self.assertEqual(len(plan_settlements(per_user)), 3)
+        # greedy matching crosses the two subgroups and needs one more
+        self.assertEqual(len(plan_settlements(per_user, exact_limit=0)), 4)
+        per_user = {1: -300, 2: -700, 3: 300, 4: 700}
+        self.assertEqual(sorted(plan_settlements(per_user)), [(1, 3, 300), (2, 4, 700)])
+
+    def test_cached_plan_is_not_shared(self):
+        per_user = {1: -500, 2: 500}
+        plan = plan_settlements(per_user)
+        plan.append((9, 9, 9))
+        self.assertEqual(plan_settlements(per_user), [(1, 2, 500)])
+
+    def test_unbalanced_nets_are_refused(self):
+        with self.assertRaises(ValueError):
+            plan_settlements({1: -500, 2: 400})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import http.server
+import threading
+import time
+import unittest
+
+import httpx
+
+from common.transport import Transport, TransportSettings, http_client
+
+
+class _StubOntology(http.server.BaseHTTPRequestHandler):
+    """
+    /flaky    503 for the first `flaky_failures` requests, then 200
+    /missing  404
+    /slow     200 after a pause, so concurrent reads overlap
+    /stream   a few NDJSON rows, then the connection drops mid-body
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hit = server.hits[self.path]
+        if self.path == "/flaky" and hit <= server.flaky_failures:
+            return self._send(503, b"unavailable")
+        if self.path == "/missing":
+            return self._send(404, b"not found")
+        if self.path == "/slow":
+            time.sleep(0.3)
+        if self.path == "/stream":
+            self.send_response(200)
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            self.wfile.write(b'{"n": 1}\n{"n": 2}\n')
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._send(200, b"ok")
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StubOntology)
+        self.server.lock = threading.Lock()
+        self.server.hits = {}
+        self.server.flaky_failures = 2
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.transport = Transport(TransportSettings(retries=3, backoff_base=0.01), sleep=lambda _: None)
+        self.http = http_client(self.transport.settings)
+
+    def tearDown(self):
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get(self, path):
+        response = self.http.get(self.base + path)
+        response.raise_for_status()
+        return response.text
+
+    def test_retries_on_503(self):
+        self.assertEqual(self.transport.call(lambda: self.get("/flaky")), "ok")
+        self.assertEqual(self.server.hits["/flaky"], 3)
+        self.assertEqual(self.transport.stats()["retries"], 2)
+
+    def test_gives_up_after_retries(self):
+        self.server.flaky_failures = 10
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.transport.call(lambda: self.get("/flaky"))
+        self.assertEqual(self.server.hits["/flaky"], 4)
+
+    def test_no_retry_on_404(self):
+        with self.assertRaises(httpx.HTTPStatusError) as caught:
+            self.transport.call(lambda: self.get("/missing"))
+        self.assertEqual(caught.exception.response.status_code, 404)
+        self.assertEqual(self.server.hits["/missing"], 1)
+        self.assertEqual(self.transport.stats()["retries"], 0)
+
+    def test_concurrent_identical_reads_share_one_call(self):
+        start = threading.Barrier(10)
+        results = []
+
+        def read():
+            start.wait()
+            results.append(self.transport.read(("PurchasedItem", "iterate"), lambda: self.get("/slow")))
+
+        threads = [threading.Thread(target=read) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["ok"] * 10)
+        self.assertEqual(self.server.hits["/slow"], 1)
+        self.assertEqual(self.transport.stats()["coalesced_reads"], 9)
+
+    def test_mid_stream_failure_propagates(self):
+        def rows():
+            with self.http.stream("GET", self.base + "/stream") as response:
+                response.raise_for_status()
+                yield from response.iter_lines()
+
+        received = []
+        with self.assertRaises(httpx.TransportError):
+            for row in self.transport.iterate(rows):
+                received.append(row)
+        self.assertEqual(received, ['{"n": 1}', '{"n": 2}'])
+        self.assertEqual(self.server.hits["/stream"], 1)  # rows already yielded: not retried
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import importlib.util
+import random
+import unittest
+
+from balances.utils import compute_balances
+from tests.test_ledger import History
+
+HAS_PANDAS = importlib.util.find_spec("pandas") is not None
+
+
+@unittest.skipUnless(HAS_PANDAS, "pandas is not installed")
+class VectorizedMatchesComputeBalancesTest(unittest.TestCase):
+    """The columnar engine returns exactly what compute_balances does, in the same order."""
+
+    histories = 200
+    steps = 40
+
+    def test_random_histories(self):
+        from balances.vectorized import compute_balances_vectorized
+
+        for seed in range(self.histories):
+            rng = random.Random(seed)
+            history = History(rng)
+            for _ in range(rng.randint(0, self.steps)):
+                history.step()
+            mappings, items, settlements = history.objects()
+            with self.subTest(seed=seed):
+                pairwise, per_user = compute_balances(mappings, items, settlements)
+                v_pairwise, v_per_user = compute_balances_vectorized(mappings, items, settlements)
+                self.assertEqual(v_pairwise, pairwise)
+                self.assertEqual(dict(v_per_user), dict(per_user))
+                # plain ints, not numpy scalars, so the results serialize the same way
+                self.assertTrue(all(type(v) is int for row in v_pairwise for v in row))
+                self.assertTrue(all(type(k) is int and type(v) is int for k, v in v_per_user.items()))
+
+    def test_empty(self):
+        from balances.vectorized import compute_balances_vectorized
+
+        self.assertEqual(compute_balances_vectorized([], [], []), compute_balances([], [], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from common.write_queue import WriteQueue
+
+
+class WriteQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.path = os.path.join(tempfile.mkdtemp(prefix="mr-split-queue-"), "writes.sqlite3")
+        self.queue = self.make_queue()
+        self.written = []
+        self.errors = []  # raised by the next apply calls, one each
+
+        def apply(payloads):
+            if self.errors:
+                raise self.errors.pop(0)
+            self.written.append(payloads)
+
+        self.queue.register("edit", apply, merge=lambda old, new: {"n": old["n"] + new["n"]})
+
+    def make_queue(self, **kwargs):
+        return WriteQueue(self.path, batch_size=10, backoff_base=0.0, **kwargs)
+
+    def rows(self):
+        with self.queue._connect() as conn:
+            return conn.execute("SELECT kind, key, state, attempts FROM pending_writes ORDER BY seq").fetchall()
+
+    def test_same_key_is_coalesced(self):
+        self.queue.enqueue("edit", [("a", {"n": 1}), ("b", {"n": 10})])
+        self.queue.enqueue("edit", [("a", {"n": 2})])
+        self.assertEqual(self.queue.stats()["coalesced"], 1)
+        self.assertEqual(self.queue.drain(self.app), 2)
+        self.assertEqual(self.written, [[{"n": 10}, {"n": 3}]])
+
+    def test_transient_failure_is_retried_with_backoff(self):
+        self.queue.enqueue("edit", [(None, {"n": 1})])
+        self.errors.append(ConnectionError("reset"))
+        with mock.patch("common.write_queue.random.uniform", return_value=30.0):
+            self.assertEqual(self.queue.drain(self.app), 0)
+        self.assertEqual(self.rows(), [("edit", None, "pending", 1)])
+
+        # while an entry backs off, nothing behind it is written either
+        self.queue.enqueue("edit", [(None, {"n": 2})])
+        self.assertEqual(self.queue.drain(self.app), 0)
+        with self.queue._connect() as conn:
+            conn.execute("UPDATE pending_writes SET not_before = 0")
+        self.assertEqual(self.queue.drain(self.app), 2)
+        self.assertEqual(self.written, [[{"n": 1}, {"n": 2}]])
+        self.assertEqual(self.queue.stats()["retried"], 1)
+
+    def test_permanent_failure_and_exhausted_retries_fail(self):
+        self.queue.enqueue("edit", [(None, {"n": 1})])
+        self.errors.append(ValueError("refused"))
+        self.queue.drain(self.app)
+        self.assertEqual(self.rows(), [("edit", None, "failed", 1)])
+
+        queue = self.make_queue(max_attempts=2)
+        queue._handlers = self.queue._handlers
+        queue.retry_failed("edit")
+        self.errors.extend([ConnectionError("reset"), ConnectionError("reset")])
+        queue.drain(self.app)
+        queue.drain(self.app)
+        self.assertEqual(self.rows(), [("edit", None, "failed", 2)])
+        self.assertEqual(self.written, [])
+
+    def test_lost_batch_is_claimed_again_after_its_lease(self):
+        self.queue.enqueue("edit", [(None, {"n": 1})])
+        claimed = self.queue._claim()  # the worker holding this batch dies
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(self.queue._claim(), [])
+        self.assertEqual(self.queue.drain(self.app), 0)
+
+        self.queue.lease = 0.0
+        self.assertEqual(self.queue.drain(self.app), 1)
+        self.assertEqual(self.written, [[{"n": 1}]])
+
+    def test_unknown_kind_does_not_block_the_queue(self):
+        newer = self.make_queue()
+        newer.register("future", lambda payloads: None)
+        newer.enqueue("future", [(None, {"x": 1})])
+        self.queue.enqueue("edit", [(None, {"n": 1})])
+
+        self.assertEqual(self.queue.drain(self.app), 1)
+        self.assertEqual(self.rows(), [("future", None, "pending", 0)])
+
+        # left for a worker that knows the kind, and failed once none has taken it within a lease
+        self.queue.lease = 0.0
+        self.queue.drain(self.app)
+        self.assertEqual(self.rows(), [("future", None, "failed", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
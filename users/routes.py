@@ -1,27 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app import client
+from common import action_types
 from .utils import *
-
-from foundry_sdk_runtime.types import (
-    ActionConfig,
-    ActionMode,
-    ReturnEditsMode,
-    SyncApplyActionResponse
-)
+from common.groups import current_group, group_store
+from common.request_store import get_store
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
 @users_bp.route("/", methods=["GET"])
 def list_users():
-    users_iterator = client.ontology.objects.Users.iterate()
-    users = list(users_iterator)
-    users_dicts = [{
-        "user_id": user.user_id,
-        "full_name": user.full_name,
-        "email": user.email
-    } for user in users]
+    # compact records from the cached snapshot (the selected group's only, if any)
+    users = get_store().all("Users")
 
-    return render_template("users.html", users=users_dicts)
+    return render_template("users.html", users=users, membership=group_store.membership())
 
 @users_bp.route("/add", methods=["POST"])
 def add_users():
@@ -32,15 +23,19 @@ def add_users():
         flash("Full name and email are required.", "error")
     else:
         # Create new user in ontology
-        response: SyncApplyActionResponse = client.ontology.actions.create_users(
-            action_config=ActionConfig(
-                mode=ActionMode.VALIDATE_AND_EXECUTE,
-                return_edits=ReturnEditsMode.ALL),
-            user_id=new_user_id(),
+        user_id = new_user_id()
+        response: action_types.SyncApplyActionResponse = client.ontology.actions.create_users(
+            action_config=action_types.ActionConfig(
+                mode=action_types.ActionMode.VALIDATE_AND_EXECUTE,
+                return_edits=action_types.ReturnEditsMode.ALL),
+            user_id=user_id,
             full_name=form_full_name,
             email=form_email
         )
         if response.validation.result == "VALID":
+            # new users join the ledger group being worked in
+            if current_group() is not None:
+                group_store.assign(user_id, current_group())
             flash(f"User '{form_full_name}' added successfully!", "success")
         else:
             flash(f"Something went wrong :()", "error")
@@ -62,10 +57,10 @@ def delete_user():
         return redirect(url_for("users.list_users"))
 
     # Call the ontology delete action or delete method (replace with your actual method)
-    response: SyncApplyActionResponse = client.ontology.actions.delete_users(
-        action_config=ActionConfig(
-            mode=ActionMode.VALIDATE_AND_EXECUTE,
-            return_edits=ReturnEditsMode.ALL),
+    response: action_types.SyncApplyActionResponse = client.ontology.actions.delete_users(
+        action_config=action_types.ActionConfig(
+            mode=action_types.ActionMode.VALIDATE_AND_EXECUTE,
+            return_edits=action_types.ReturnEditsMode.ALL),
         users=user_id_int
     )
 
@@ -77,3 +72,30 @@ def delete_user():
 
     return redirect(url_for("users.list_users"))
 
+
+
+@users_bp.route("/groups", methods=["POST"])
+def create_group():
+    group_id = (request.form.get("group_id") or "").strip().lower()
+    try:
+        group_store.create(group_id, (request.form.get("name") or "").strip())
+        flash(f"Group '{group_id}' created.", "success")
+    except ValueError as e:
+        flash(str(e), "error")
+    return redirect(url_for("users.list_users"))
+
+@users_bp.route("/assign-group", methods=["POST"])
+def assign_group():
+    try:
+        user_id = int(request.form.get("user_id", ""))
+    except ValueError:
+        flash("User ID must be an integer.", "error")
+        return redirect(url_for("users.list_users"))
+
+    group_id = request.form.get("group_id") or None
+    if group_id is not None and not group_store.exists(group_id):
+        flash(f"No group '{group_id}'.", "error")
+    else:
+        group_store.assign(user_id, group_id)
+        flash(f"User {user_id} moved to {group_id or 'no group'}.", "success")
+    return redirect(url_for("users.list_users"))
@@ -1,12 +1,13 @@
-from mr_split_sdk.ontology.objects import Users
+from common import object_types as ontology_objects
 from app import client
+from common.ids import id_allocator
 
-def new_user_id() -> int:
+def _next_user_id_from_ontology() -> int:
     # Query for the user with the highest user_id
     highest_user = next(
         client.ontology.objects.Users
-        .where(~Users.object_type.full_name.is_null())
-        .order_by(Users.object_type.user_id.desc())
+        .where(~ontology_objects.Users.object_type.full_name.is_null())
+        .order_by(ontology_objects.Users.object_type.user_id.desc())
         .iterate(),
         None  # default if none found
     )
@@ -14,4 +15,8 @@ def new_user_id() -> int:
     if highest_user is None or highest_user.user_id is None:
         return 1  # no users, start at 1
 
-    return highest_user.user_id + 1
\ No newline at end of file
+    return highest_user.user_id + 1
+
+def new_user_id() -> int:
+    # Handed out from a locally leased block; only the first lease queries the ontology.
+    return id_allocator.allocate("Users", seed=_next_user_id_from_ontology)[0]